@@ -0,0 +1,159 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+from __future__ import print_function
+
+import json
+import os
+import time
+from base64 import b64decode
+from multiprocessing import Pool
+
+from modules.config import keys_path
+from modules.address import Address
+from modules.hashblock_zksnark import zksnark_verify, zksnark_verify_compact
+from shared.exchange import PROOF_SCHEMES
+from shared.rest_client import RestClient
+from protobuf.exchange_pb2 import ExchangePayload
+
+EXCHANGE_FAMILY = Address.exchange_mtxq_addresser().family_ns_name
+PAYLOAD_SCHEMES = {v: k for k, v in PROOF_SCHEMES.items()}
+CHECKPOINT_INTERVAL = 100
+
+
+def add_audit_parser(subparsers, parent_parser):
+    parser = subparsers.add_parser(
+        'audit-proofs',
+        help='Re-verifies the proofs of committed exchange transactions',
+        description='Streams the committed exchange transactions and '
+        'verifies each matching proof again, for example after a key '
+        'rotation. Progress is checkpointed so a run can be resumed.',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        '--url',
+        default="http://rest-api:8008",
+        help='The sawtooth rest url. Default is http://rest-api:8008')
+
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=os.cpu_count(),
+        help='number of verifier processes (default: cpu count)')
+
+    parser.add_argument(
+        '-c', '--checkpoint',
+        default='audit-proofs.json',
+        help='checkpoint file, resumed if it exists '
+        '(default: audit-proofs.json)')
+
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='ignore an existing checkpoint')
+
+
+def __load_checkpoint(args, client):
+    """Resume from the checkpoint or start at the current chain head
+
+    The head is pinned so the transaction order is the same on resume
+    """
+    if not args.restart and os.path.exists(args.checkpoint):
+        with open(args.checkpoint, 'r') as f:
+            return json.load(f)
+    head = next(client.list_blocks(limit=1))['header_signature']
+    return {'head': head, 'position': 0, 'verified': 0, 'failures': []}
+
+
+def __save_checkpoint(args, checkpoint):
+    temp = args.checkpoint + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp, args.checkpoint)
+
+
+def __proof_items(transactions, file_path):
+    """Yields (txn id, verify args) for each transaction, verify args
+    are None for transactions without a proof"""
+    for txn in transactions:
+        txn_id = txn['header_signature']
+        if txn['header']['family_name'] != EXCHANGE_FAMILY:
+            yield (txn_id, None)
+            continue
+        payload = ExchangePayload()
+        payload.ParseFromString(b64decode(txn['payload']))
+        if payload.type == ExchangePayload.UTXQ:
+            yield (txn_id, None)
+            continue
+        yield (txn_id, (
+            file_path,
+            PAYLOAD_SCHEMES.get(payload.scheme),
+            payload.batch_size,
+            payload.compact_proof,
+            payload.proof.decode(),
+            payload.pairings.decode()))
+
+
+def __verify(item):
+    """Pool worker, returns (txn id, has proof, failure reason or None)"""
+    txn_id, proof = item
+    if proof is None:
+        return (txn_id, False, None)
+    file_path, scheme, batch_size, compact, proof_str, pairing_str = proof
+    if scheme is None:
+        return (txn_id, True, 'unknown scheme')
+    if compact:
+        valid = zksnark_verify_compact(file_path, compact, scheme)
+    else:
+        valid = zksnark_verify(
+            file_path, proof_str, pairing_str, scheme, batch_size)
+    return (txn_id, True, None if valid else 'invalid proof')
+
+
+def do_audit(args, config):
+    client = RestClient(args.url)
+    checkpoint = __load_checkpoint(args, client)
+    transactions = client.list_transactions(head=checkpoint['head'])
+    for _ in range(checkpoint['position']):
+        next(transactions, None)
+
+    start = time.perf_counter()
+    proofs = 0
+    with Pool(max(1, args.workers)) as pool:
+        results = pool.imap(
+            __verify, __proof_items(transactions, keys_path()),
+            chunksize=4)
+        for txn_id, has_proof, failure in results:
+            checkpoint['position'] += 1
+            if has_proof:
+                proofs += 1
+            if failure:
+                checkpoint['failures'].append(
+                    {'transaction': txn_id, 'reason': failure})
+            elif has_proof:
+                checkpoint['verified'] += 1
+            if checkpoint['position'] % CHECKPOINT_INTERVAL == 0:
+                __save_checkpoint(args, checkpoint)
+    __save_checkpoint(args, checkpoint)
+    elapsed = time.perf_counter() - start
+
+    print("Transactions scanned {}".format(checkpoint['position']))
+    print("Proofs verified {}, failed {}".format(
+        checkpoint['verified'], len(checkpoint['failures'])))
+    print("Elapsed {:.1f}s, {:.1f} proofs/s this run".format(
+        elapsed, proofs / elapsed if elapsed else 0.0))
+    for failure in checkpoint['failures']:
+        print("FAILED {transaction}: {reason}".format(**failure))
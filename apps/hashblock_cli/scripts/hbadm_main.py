@@ -34,6 +34,8 @@ from scripts.genesis import add_genesis_parser
 from scripts.genesis import do_genesis
 from scripts.batch import add_batch_parser
 from scripts.batch import do_batch
+from scripts.audit import add_audit_parser
+from scripts.audit import do_audit
 
 
 DISTRIBUTION_NAME = 'hashblock-hbadm'
@@ -108,6 +110,7 @@ def create_parser(prog_name):
     add_keygen_parser(subparsers, parent_parser)
     add_genesis_parser(subparsers, parent_parser)
     add_batch_parser(subparsers, parent_parser)
+    add_audit_parser(subparsers, parent_parser)
     return parser
 
 
@@ -134,6 +137,8 @@ def main(prog_name=os.path.basename(sys.argv[0]), args=None,
         do_genesis(args, r_config)
     elif args.command == 'batch':
         do_batch(args, r_config)
+    elif args.command == 'audit-proofs':
+        do_audit(args, r_config)
     else:
         raise CliException("invalid command: {}".format(args.command))
 
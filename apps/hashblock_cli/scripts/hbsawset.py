@@ -142,8 +142,9 @@ def gensawset(signer):
         unit_addresser,
         utxq_addresser]
     families = [
-        {"family": a.family_ns_name, "version": a.family_current_version}
-        for a in flist]
+        {"family": a.family_ns_name, "version": version}
+        for a in flist
+        for version in a.family_versions]
     authtps = compose_builder(
         create_transaction,
         _create_auth_inputs_outputs,
@@ -15,26 +15,37 @@
 # ------------------------------------------------------------------------------
 
 import os
+import json
+import hashlib
 import logging
 
-from flask import Flask, request, url_for
-from flask_restplus import Resource, Api, fields
+from flask import Flask, Response, request, url_for
+from flask_restplus import Resource, Api, fields, inputs
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 from modules.exceptions import DataException, AuthException, NotPrimeException
-from modules.config import load_hashblock_config
+from modules.config import (
+    load_hashblock_config, sawtooth_rest_host, bulk_max_items)
 from modules.address import Address
+from modules.hashblock_zksnark import BATCH_SIZES
 from modules.decode import (
+    utxq_addresser, mtxq_addresser,
     decode_exchange_initiate,
-    decode_exchange_initiate_list,
+    iter_exchange_initiate_list,
     decode_exchange_reciprocate,
-    decode_exchange_reciprocate_list,
+    iter_exchange_reciprocate_list,
     decode_asset, decode_unit,
-    decode_asset_list, decode_unit_list,
-    decode_proposals, decode_settings)
+    iter_asset_list, iter_unit_list,
+    decode_proposals, decode_settings,
+    lookup_addresses, LOOKUP_MAX)
+from modules.query import ExchangeQuery
+from shared.rest_client import RestClient
 import shared.asset as asset
 import shared.exchange as exchange
+from shared.matched_set import start_matched_set
+from shared.order_book import start_order_book
+from shared.reconcile_jobs import reconcile_jobs
 
 LOGGER = logging.getLogger(__name__)
 
@@ -43,6 +54,15 @@ LOGGER = logging.getLogger(__name__)
 load_hashblock_config()
 print("Succesfully loaded hasblock-rest configuration")
 
+# Matched UTXQ screen and order book, scanned from the chain now and
+# kept current
+start_matched_set()
+start_order_book()
+
+# Streamed list bodies are written in pieces of about this size
+STREAM_CHUNK_BYTES = 64 * 1024
+LINK_ADDRESS = '__link_address__'
+
 # Setup upload location for batch submissions
 UPLOAD_FOLDER = '/uploads/files/'
 ALLOWED_EXTENSIONS = set(['json'])
@@ -66,12 +86,136 @@ ns = api.namespace('hashblock', description='hashblock operations')
 # Utility functions
 
 
-def assetlinks(data):
-    for element in data:
-        addr = element['link']
-        baseref = 'asset_' + element['type']
-        element['link'] = url_for(baseref, address=addr, _external=True)
-    return data
+def bulk_items(body):
+    """Returns the items of a bulk request body
+
+    The body must be a list of at most bulk_max_items objects
+    """
+    if not isinstance(body, list) \
+            or not all(isinstance(item, dict) for item in body):
+        raise DataException('Bulk request body must be a list of objects')
+    if len(body) > bulk_max_items():
+        raise DataException(
+            'Bulk request of {} items exceeds {}'.format(
+                len(body), bulk_max_items()))
+    return body
+
+
+def batch_items(body):
+    """Returns the items of a batch request body
+
+    The body must be a bulk request body that one of the BATCH_SIZES
+    circuits holds
+    """
+    items = bulk_items(body)
+    if not items or len(items) > BATCH_SIZES[-1]:
+        raise DataException(
+            'Batch requires 1 to {} items, got {}'.format(
+                BATCH_SIZES[-1], len(items)))
+    return items
+
+
+def lookup_addresses_of(body):
+    """Returns the addresses of a lookup request body
+
+    The body must be an object whose addresses are a list of at most
+    LOOKUP_MAX strings
+    """
+    addresses = body.get('addresses') if isinstance(body, dict) else None
+    if not isinstance(addresses, list) \
+            or not all(isinstance(address, str) for address in addresses):
+        raise DataException('Lookup addresses must be a list of strings')
+    if len(addresses) > LOOKUP_MAX:
+        raise DataException(
+            'Lookup of {} addresses exceeds {}'.format(
+                len(addresses), LOOKUP_MAX))
+    return addresses
+
+
+def link_template(endpoint, **values):
+    """(prefix, suffix) of the endpoint's URLs around the address"""
+    url = url_for(endpoint, address=LINK_ADDRESS, _external=True, **values)
+    prefix, _, suffix = url.partition(LINK_ADDRESS)
+    return (prefix, suffix)
+
+
+def assetlinks(endpoint):
+    """Sets an element's link from the address it holds
+
+    The link function returns the address
+    """
+    prefix, suffix = link_template(endpoint)
+
+    def link(element):
+        address = element['link']
+        element['link'] = prefix + address + suffix
+        return address
+    return link
+
+
+def stream_list(head, rows, link, limit=None):
+    """Streams head as a JSON object with rows as its data array
+
+    Rows are linked and serialized as they are produced, so memory does
+    not grow with the list. With a limit, at most limit rows are
+    written and a paging cursor, the last address, is added when rows
+    remain. The first row is read before the response starts, so a
+    failed listing is still reported as an error
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+
+    def generate():
+        pending = [json.dumps(head)[:-1] + ', "data": [']
+        size = 0
+        count = 0
+        row = first
+        while row is not None:
+            cursor = link(row)
+            piece = json.dumps(row)
+            pending.append(piece)
+            size += len(piece)
+            count += 1
+            row = next(rows, None)
+            if row is not None and count == limit:
+                break
+            if row is not None:
+                pending.append(',')
+            if size >= STREAM_CHUNK_BYTES:
+                yield ''.join(pending)
+                pending = []
+                size = 0
+        pending.append(']')
+        if limit is not None:
+            paging = {'limit': limit}
+            if row is not None:
+                paging['cursor'] = cursor
+            pending.append(', "paging": ' + json.dumps(paging))
+        pending.append('}')
+        yield ''.join(pending)
+    return Response(generate(), mimetype='application/json')
+
+
+def conditional_list(build):
+    """Answers a conditional GET of a listing, or streams build(head)
+
+    The ETag is a digest of the chain head block and the request path
+    and filters, so while the chain has not moved a matching
+    If-None-Match is answered 304 without listing anything. build lists
+    at the head block the ETag was made from
+    """
+    head = RestClient(sawtooth_rest_host()).get_head()
+    etag = hashlib.sha256('\n'.join(
+        [head, request.path] + [
+            '{}={}'.format(key, value)
+            for key, value in sorted(request.args.items(multi=True))]
+    ).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build(head)
+    response.set_etag(etag)
+    return response
 
 
 def assetunitlinks(data, asset_type):
@@ -130,6 +274,14 @@ unit_vote_fields = ns.model('unit-vote', {
         required=True, description='The authorized voter')})
 
 
+list_parser = ns.parser()
+list_parser.add_argument(
+    'limit', location='args', type=inputs.positive,
+    help='Most entries to return, paging.cursor is set when more remain')
+list_parser.add_argument(
+    'cursor', location='args',
+    help='The paging.cursor of the previous page, its last address')
+
 batch_propose_upload_parser = ns.parser()
 batch_propose_upload_parser.add_argument(
     'file', location='files',
@@ -177,11 +329,18 @@ class ASSetDecode(Resource):
 
 @ns.route('/assets')
 class ASDecode(Resource):
+    @ns.expect(list_parser)
     def get(self):
-        """Returns list of all assets"""
-        result = decode_asset_list()
-        result['data'] = assetlinks(result['data'])
-        return result, 200
+        """Returns list of all assets, a page at a time with a limit"""
+        args = list_parser.parse_args()
+        try:
+            return conditional_list(lambda head: stream_list(
+                {'family': 'asset'},
+                iter_asset_list(head=head, cursor=args['cursor']),
+                assetlinks('asset_asset'),
+                args['limit']))
+        except DataException as e:
+            return {"DataException": str(e)}, 400
 
 
 @ns.route('/asset-create')
@@ -199,6 +358,18 @@ class CreateASIngest(Resource):
                 "AuthException": "not authorized to create asset"}, 405
 
 
+@ns.route('/asset-create-bulk')
+class CreateASBulkIngest(Resource):
+    @ns.expect([asset_fields])
+    def post(self):
+        """Create many assets, with a result per asset"""
+        try:
+            return {"data": asset.create_direct_asset_bulk(
+                bulk_items(request.json))}, 200
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+
+
 @ns.route('/asset-propose')
 class PropASIngest(Resource):
     @ns.expect(asset_fields)
@@ -235,6 +406,18 @@ class VoteASIngest(Resource):
             return {
                 "AuthException": "not authorized to vote"}, 405
 
+
+@ns.route('/asset-vote-bulk')
+class VoteASBulkIngest(Resource):
+    @ns.expect([asset_vote_fields])
+    def post(self):
+        """Vote on many asset proposals, with a result per vote"""
+        try:
+            return {"data": asset.create_asset_vote_bulk(
+                bulk_items(request.json))}, 200
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+
 #
 #   Unit management
 #
@@ -249,11 +432,18 @@ class UNSetDecode(Resource):
 
 @ns.route('/units')
 class UNDecode(Resource):
+    @ns.expect(list_parser)
     def get(self):
-        """Returns list of all units"""
-        result = decode_unit_list()
-        result['data'] = assetlinks(result['data'])
-        return result, 200
+        """Returns list of all units, a page at a time with a limit"""
+        args = list_parser.parse_args()
+        try:
+            return conditional_list(lambda head: stream_list(
+                {'family': 'unit'},
+                iter_unit_list(head=head, cursor=args['cursor']),
+                assetlinks('asset_unit'),
+                args['limit']))
+        except DataException as e:
+            return {"DataException": str(e)}, 400
 
 
 @ns.route('/unit-create')
@@ -308,6 +498,18 @@ class VoteUNIngest(Resource):
                 "AuthException": "not authorized to vote"}, 405
 
 
+@ns.route('/unit-vote-bulk')
+class VoteUNBulkIngest(Resource):
+    @ns.expect([unit_vote_fields])
+    def post(self):
+        """Vote on many unit proposals, with a result per vote"""
+        try:
+            return {"data": asset.create_unit_vote_bulk(
+                bulk_items(request.json))}, 200
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+
+
 @ns.route('/unit/<string:address>', endpoint='asset_unit')
 @ns.route('/asset/<string:address>', endpoint='asset_asset')
 @ns.param('address', 'The address to decode')
@@ -361,14 +563,22 @@ mtxq_fields = ns.inherit("mtxq_fields", utxq_fields, {
 #
 
 
+def exchangelink(agreement, eprefix):
+    """Sets an element's endpoint link in place of its address"""
+    prefix, suffix = link_template(eprefix, agreement=agreement)
+
+    def link(element):
+        address = element.pop("address")
+        element["link"] = prefix + address + suffix
+        return address
+    return link
+
+
 def exchangeprep(result, agreement, eprefix):
     """Sets endpoint link in results"""
+    link = exchangelink(agreement, eprefix)
     for element in result["data"]:
-        element["link"] = url_for(
-            eprefix,
-            agreement=agreement,
-            address=element.pop("address"),
-            _external=True)
+        link(element)
 
 
 #
@@ -386,14 +596,47 @@ class UTXQDecode(Resource):
         return result, 200
 
 
+exchange_query_parser = list_parser.copy()
+exchange_query_parser.add_argument(
+    'namespace', location='args', help='Duality namespace, e.g. demo')
+exchange_query_parser.add_argument(
+    'verb', location='args', help='Operation verb, e.g. ask')
+
+utxq_query_parser = exchange_query_parser.copy()
+utxq_query_parser.add_argument(
+    'matched', location='args', choices=('true', 'false'),
+    help='Only matched or only unmatched UTXQs')
+
+
+def exchange_query(addresser, agreement, args):
+    """Listing plan from the filter query parameters"""
+    matched = args.get('matched')
+    return ExchangeQuery(
+        addresser,
+        agreement,
+        namespace=args.get('namespace'),
+        verb=args.get('verb'),
+        matched=None if matched is None else matched == 'true')
+
+
 @ns.route('/utxqs/<string:agreement>')
 @ns.param('agreement', 'The trading agreement')
 class UTXQSDecode(Resource):
+    @ns.expect(utxq_query_parser)
     def get(self, agreement):
-        """Returns all UTXQs"""
-        result = decode_exchange_initiate_list(agreement)
-        exchangeprep(result, agreement, 'utxq')
-        return result, 200
+        """Returns all UTXQs, or those matching the filters"""
+        args = utxq_query_parser.parse_args()
+        try:
+            query = exchange_query(utxq_addresser, agreement, args)
+            return conditional_list(lambda head: stream_list(
+                {'family': 'match', 'dimension': 'utxq'},
+                iter_exchange_initiate_list(
+                    agreement, query,
+                    head=head, cursor=args['cursor'], limit=args['limit']),
+                exchangelink(agreement, 'utxq'),
+                args['limit']))
+        except DataException as e:
+            return {"DataException": str(e)}, 400
 
 
 @ns.route('/utxq-create')
@@ -404,6 +647,18 @@ class UTXQ_Ingest(Resource):
         return {"status": "OK"}, 200
 
 
+@ns.route('/utxq-create-bulk')
+class UTXQ_Bulk_Ingest(Resource):
+    @ns.expect([utxq_fields])
+    def post(self):
+        """Create many initiates, with a result per utxq"""
+        try:
+            return {"data": exchange.create_utxq_bulk(
+                bulk_items(request.json))}, 200
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+
+
 #
 #   MTXQ management
 #
@@ -422,11 +677,21 @@ class MTXQDecode(Resource):
 @ns.route('/mtxqs/<string:agreement>')
 @ns.param('agreement', 'The trading agreement')
 class MTXQSDecode(Resource):
+    @ns.expect(exchange_query_parser)
     def get(self, agreement):
-        """Returns all match response transactions"""
-        result = decode_exchange_reciprocate_list(agreement)
-        exchangeprep(result, agreement, 'mtxq')
-        return result, 200
+        """Returns all match response transactions, or those filtered"""
+        args = exchange_query_parser.parse_args()
+        try:
+            query = exchange_query(mtxq_addresser, agreement, args)
+            return conditional_list(lambda head: stream_list(
+                {'family': 'match', 'dimension': 'mtxq'},
+                iter_exchange_reciprocate_list(
+                    agreement, query,
+                    head=head, cursor=args['cursor'], limit=args['limit']),
+                exchangelink(agreement, 'mtxq'),
+                args['limit']))
+        except DataException as e:
+            return {"DataException": str(e)}, 400
 
 
 @ns.route('/mtxq-create')
@@ -441,5 +706,109 @@ class MTXQ_Ingest(Resource):
             return {"DataException": str(e)}, 400
 
 
+@ns.route('/mtxq-create-batch')
+class MTXQ_Batch_Ingest(Resource):
+    @ns.expect([mtxq_fields])
+    def post(self):
+        """Create one transaction matching many, with a single proof"""
+        try:
+            exchange.create_mtxq_batch(batch_items(request.json))
+            return {"status": "OK"}, 200
+        except (DataException, ValueError) as e:
+            return {"DataException": str(e)}, 400
+
+
+@ns.route('/mtxq-create-bulk')
+class MTXQ_Bulk_Ingest(Resource):
+    @ns.expect([mtxq_fields])
+    def post(self):
+        """Create many matching transactions, with a result per mtxq"""
+        try:
+            return {"data": exchange.create_mtxq_bulk(
+                bulk_items(request.json))}, 200
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+
+
+mtxq_proposal_fields = ns.inherit("mtxq_proposal_fields", utxq_fields, {
+    'ratio': fields.Nested(ratio_fields, required=True),
+    'limit': fields.Integer(required=False)
+})
+
+
+@ns.route('/match-candidates')
+class MatchCandidates(Resource):
+    @ns.expect(mtxq_proposal_fields)
+    def post(self):
+        """Returns open UTXQs that a proposed reciprocate could match"""
+        try:
+            body = dict(request.json)
+            limit = body.pop('limit', None) or 10
+            result = exchange.match_candidates(body, limit)
+            exchangeprep(result, result['agreement'], 'utxq')
+            return result, 200
+        except (DataException, ValueError) as e:
+            return {"DataException": str(e)}, 400
+
+
+#
+#   Bulk lookup
+#
+
+
+lookup_fields = ns.model('lookup_fields', {
+    'addresses': fields.List(fields.String, required=True),
+    'agreement': fields.String(
+        required=False, description='Decrypts exchange addresses'),
+    'head': fields.String(
+        required=False, description='Block id to read at, default current')
+})
+
+
+@ns.route('/lookup')
+class Lookup(Resource):
+    @ns.expect(lookup_fields)
+    def post(self):
+        """Returns the decoded data of many addresses, by address"""
+        try:
+            addresses = lookup_addresses_of(request.json)
+            return {"data": lookup_addresses(
+                addresses,
+                request.json.get('agreement'),
+                request.json.get('head'))}, 200
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+        except AuthException as e:
+            return {"AuthException": str(e)}, 405
+
+
+#
+#   Reconciliation
+#
+
+
+@ns.route('/reconcile/<string:agreement>')
+@ns.param('agreement', 'The trading agreement')
+class Reconcile(Resource):
+    def get(self, agreement):
+        """Returns the last reconciliation, with its violations and net
+        positions once done"""
+        try:
+            return reconcile_jobs().status(agreement), 200
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+        except AuthException as e:
+            return {"AuthException": str(e)}, 405
+
+    def post(self, agreement):
+        """Starts re-checking all matches in the background"""
+        try:
+            return reconcile_jobs().submit(agreement), 202
+        except DataException as e:
+            return {"DataException": str(e)}, 400
+        except AuthException as e:
+            return {"AuthException": str(e)}, 405
+
+
 if __name__ == '__main__':
     application.run(debug=True)
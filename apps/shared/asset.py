@@ -22,10 +22,12 @@ import datetime
 import json
 from functools import partial
 from shared.transactions import (
-    create_batch, submit_batch,
+    create_batch, submit_batch, create_bulk,
     submit_single_txn, create_transaction, compose_builder)
 
-from modules.exceptions import DataException
+from modules.exceptions import (
+    DataException, AuthException, NotPrimeException, AssetIdRange,
+    RestException)
 from modules.hashblock_zksnark import prime_gen
 from modules.config import valid_signer
 from modules.decode import (
@@ -44,6 +46,11 @@ VOTE_KEY_SET = {'signer', 'proposal_id', 'vote'}
 VOTE_SET = {'accept', 'reject', 'rescind'}
 VOTE_ITEMS = ['rescind', 'accept', 'reject']
 
+# Reported per item by the bulk endpoints
+BULK_FAILURES = (
+    DataException, AuthException, NotPrimeException, AssetIdRange,
+    RestException, ValueError, KeyError)
+
 
 ASSET_ADDRESSER = asset_addresser
 UNIT_ADDRESSER = unit_addresser
@@ -111,8 +118,11 @@ def __validate_unit_proposal(data, ignoreAddress=False):
         decode_unit_list)
 
 
-def __validate_vote(addr, data, ignoreAddress=False):
-    """Validate the vote attempt"""
+def __validate_vote(addr, data, ignoreAddress=False, proposals=None):
+    """Validate the vote attempt
+
+    proposals is a snapshot of the candidates, fetched if None
+    """
     if set(data.keys()) != VOTE_KEY_SET:
         raise DataException(
             "Keys mismatch {} {}".format(data.keys, VOTE_KEY_SET))
@@ -122,7 +132,8 @@ def __validate_vote(addr, data, ignoreAddress=False):
             "Vote not regognized {} {}".format(data['vote'], VOTE_SET))
     # Check proposal id exists
     proposal_id = data['proposal_id']
-    result = decode_proposals(addr.candidate_address)['data']
+    result = proposals if proposals is not None \
+        else decode_proposals(addr.candidate_address)['data']
     if result:
         proposal_match = []
         for x in result:
@@ -137,14 +148,14 @@ def __validate_vote(addr, data, ignoreAddress=False):
         pass
 
 
-def __validate_asset_vote(data, ignoreAddress=False):
+def __validate_asset_vote(data, ignoreAddress=False, proposals=None):
     """Validate an asset vote"""
-    return __validate_vote(ASSET_ADDRESSER, data, ignoreAddress)
+    return __validate_vote(ASSET_ADDRESSER, data, ignoreAddress, proposals)
 
 
-def __validate_unit_vote(data, ignoreAddress=False):
+def __validate_unit_vote(data, ignoreAddress=False, proposals=None):
     """Validate a unit vote"""
-    return __validate_vote(UNIT_ADDRESSER, data, ignoreAddress)
+    return __validate_vote(UNIT_ADDRESSER, data, ignoreAddress, proposals)
 
 
 def property_list_generalize(intake):
@@ -411,6 +422,80 @@ def create_direct_unit(data):
     return prime_id
 
 
+def __create_vote_bulk(addresser, validate, build, votes):
+    """Vote on many proposals against one snapshot of the candidates"""
+    proposals = decode_proposals(addresser.candidate_address)['data']
+    cast = set()
+
+    def validate_vote(data):
+        validate(data, proposals=proposals)
+        ballot = (data['signer'], data['proposal_id'])
+        if ballot in cast:
+            raise DataException(
+                "Duplicate vote by {} on {}".format(*ballot))
+        cast.add(ballot)
+        return (
+            (data['signer'], addresser, data),
+            {"proposal_id": data['proposal_id']})
+    return create_bulk(votes, validate_vote, build, BULK_FAILURES)
+
+
+def create_asset_vote_bulk(votes):
+    """Vote on many asset proposals, returns a result per vote"""
+    return __create_vote_bulk(
+        ASSET_ADDRESSER,
+        __validate_asset_vote,
+        compose_builder(
+            create_transaction, __create_vote_inputs_outputs,
+            __create_asset_vote_payload, __create_asset_vote),
+        votes)
+
+
+def create_unit_vote_bulk(votes):
+    """Vote on many unit proposals, returns a result per vote"""
+    return __create_vote_bulk(
+        UNIT_ADDRESSER,
+        __validate_unit_vote,
+        compose_builder(
+            create_transaction, __create_vote_inputs_outputs,
+            __create_unit_vote_payload, __create_unit_vote),
+        votes)
+
+
+def create_direct_asset_bulk(assets):
+    """Create many assets, returns a result per asset
+
+    References resolve an asset by system and key, so one that is
+    already on chain, or earlier in the request, is rejected
+    """
+    existing = {
+        (element['system'], element['name'])
+        for element in decode_asset_list()['data']}
+
+    def validate_asset(data):
+        prime_id = __validate_element(ASSET_KEY_SET, data, True)
+        syskey = (data['system'], data['key'])
+        if syskey in existing:
+            raise DataException(
+                "Asset {}.{} already exists".format(*syskey))
+        existing.add(syskey)
+        return (
+            (
+                data['signer'],
+                ASSET_ADDRESSER.asset_address(
+                    data['system'], data['key'], prime_id),
+                ASSET_ADDRESSER,
+                data),
+            {"Asset ID": prime_id})
+    return create_bulk(
+        assets,
+        validate_asset,
+        compose_builder(
+            create_transaction, __create_inputs_outputs,
+            __create_asset_direct_payload, __create_asset),
+        BULK_FAILURES)
+
+
 def create_unit_genesis(signer, unit_list):
     """Generate the transaction batch for genesis block units of measure"""
     txns = []
@@ -19,18 +19,26 @@
 This module is referenced when posting utxq and mtxq exchanges
 """
 import uuid
-import binascii
+from fractions import Fraction
 
-from shared.transactions import (
-    submit_single_txn, create_transaction, compose_builder)
+import numpy as np
 
-from modules.hashblock_zksnark import zksnark_genproof
+from shared.transactions import (
+    submit_single_txn, create_transaction, compose_builder, create_bulk)
+from shared.proof_cache import cached_proof
+from shared.order_book import OrderBook, order_book
+from shared.matched_set import matched_set
+
+from modules.hashblock_zksnark import (
+    zksnark_genproof, zksnark_genproof_compact, batch_size_for,
+    SCHEME_PPZKSNARK, SCHEME_GG_PPZKSNARK)
 from modules.dualities import Duality
 from modules.config import (
-    public_key, private_key,
+    public_key,
     keys_path,
+    zksnark_scheme,
     HB_OPERATOR,
-    valid_partnership, partnership_secret)
+    valid_partnership, partnership_secret, partnership_agreement)
 from modules.decode import (
     asset_addresser,
     unit_addresser,
@@ -40,12 +48,66 @@ from modules.decode import (
     decode_unit_list,
     decode_asset_list,
     STATE_CRYPTO,
-    get_utxq_obj_json)
+    get_utxq_obj_json,
+    catalog_primes)
 from modules.exceptions import (
     AuthException, RestException, DataException,
     AssetNotExistException, UnitNotExistException)
 from protobuf.exchange_pb2 import (
-    ExchangePayload, UTXQ, MTXQ, Quantity, Ratio)
+    ExchangePayload, ExchangeMatch, UTXQ, MTXQ, Quantity, Ratio)
+
+PROOF_SCHEMES = {
+    SCHEME_PPZKSNARK: ExchangePayload.PPZKSNARK,
+    SCHEME_GG_PPZKSNARK: ExchangePayload.GG_PPZKSNARK}
+
+# Reported per item by the bulk endpoints
+BULK_FAILURES = (
+    DataException, AuthException, RestException, ValueError, KeyError,
+    AssetNotExistException, UnitNotExistException)
+
+# The three balancing equations of the 12 prover values, each is
+# initiate * numerator / denominator == reciprocate
+BALANCE_EQUATIONS = ('quantity', 'unit', 'asset')
+
+
+def balance_errors(values):
+    """Checks the balancing equations of 12 prover values exactly
+
+    Returns a list of error strings, empty when all three balance
+    """
+    errors = []
+    for index, name in enumerate(BALANCE_EQUATIONS):
+        initiate, numerator, denominator, reciprocate = \
+            [int(x) for x in values[index * 4:index * 4 + 4]]
+        if denominator == 0:
+            errors.append('{} ratio has a zero denominator'.format(name))
+            continue
+        expected = initiate * Fraction(numerator, denominator)
+        if expected != reciprocate:
+            errors.append(
+                '{} equation {} * {}/{} = {} does not equal {}'.format(
+                    name, initiate, numerator, denominator,
+                    expected, reciprocate))
+    return errors
+
+
+def check_balances(candidates):
+    """Screens many candidate matches at once
+
+    candidates is a sequence of 12 value rows in prover order. The
+    values are laid out as object array columns (the primes are 172
+    bits) and each equation is checked for all rows at once by cross
+    multiplication. Returns the indexes of the rows that do not balance
+    """
+    if not len(candidates):
+        return []
+    columns = np.array(
+        [[int(x) for x in row] for row in candidates], dtype=object).T
+    balanced = np.ones(columns.shape[1], dtype=bool)
+    for index in range(len(BALANCE_EQUATIONS)):
+        i, n, d, r = columns[index * 4:index * 4 + 4]
+        balanced &= ((d != 0) & (i * n == d * r)).astype(bool)
+    return np.flatnonzero(~balanced).tolist()
 
 
 def __validate_partners(plus, minus):
@@ -66,8 +128,11 @@ def __validate_operation(request):
             "Verb {} not found in duality configuration".format(ops))
 
 
-def __validate_references(value, unit, asset):
-    """Validate and return addresses that are reachable"""
+def __validate_references(value, unit, asset, snapshot=None):
+    """Validate and return addresses that are reachable
+
+    snapshot, when given, keeps the lookups shared by a bulk request
+    """
     unit_result = None
     asset_result = None
     int(value)
@@ -86,11 +151,19 @@ def __validate_references(value, unit, asset):
                 break
         return result
 
-    unit_result = in_list(unit, decode_unit_list(unit_add))
+    def lookup(ent, decoder, address):
+        if snapshot is None:
+            return in_list(ent, decoder(address))
+        key = (address, ent['system'], ent['key'])
+        if key not in snapshot:
+            snapshot[key] = in_list(ent, decoder(address))
+        return snapshot[key]
+
+    unit_result = lookup(unit, decode_unit_list, unit_add)
     if not unit_result:
         raise UnitNotExistException(
             "Unit {} does not exist".format(unit_add))
-    asset_result = in_list(asset, decode_asset_list(asset_add))
+    asset_result = lookup(asset, decode_asset_list, asset_add)
     if not asset_result:
         raise AssetNotExistException(
             "Asset {} does not exist".format(asset_add))
@@ -98,13 +171,13 @@ def __validate_references(value, unit, asset):
     return (unit_result, asset_result)
 
 
-def __get_and_validate_utxq(address, secret):
+def __get_and_validate_utxq(address, secret, agreement):
     """Check that the utxq exists to recipricate on"""
     print("Address to check utxq {}".format(address))
     if utxq_addresser.is_matched(address):
         raise DataException(
             'Attempt to match using already matched utxq address')
-    else:
+    elif matched_set().might_contain(address):
         try:
             get_node(mtxq_addresser.set_utxq_matched(address))
             raise DataException(
@@ -112,27 +185,29 @@ def __get_and_validate_utxq(address, secret):
         except RestException:
             pass
     try:
-        return get_utxq_obj_json(address, secret)
+        return get_utxq_obj_json(address, secret, agreement)
     except RestException:
         raise DataException('Invalid initiate (utxq) address')
 
 
-def __validate_utxq(request):
+def __validate_utxq(request, snapshot=None):
     """Validate the content for utxq"""
     __validate_partners(request["plus"], request["minus"])
     quantity_assets = __validate_references(
         request['quantity']['value'],
         request['quantity']['unit'],
-        request['quantity']['asset'])
+        request['quantity']['asset'],
+        snapshot)
     return (quantity_assets)
 
 
-def __validate_mtxq(operation, request):
-    """Validate the content for mtxq"""
+def __validate_mtxq_data(operation, request, snapshot=None):
+    """Validate the content for mtxq and build the equation data"""
     __validate_partners(request["plus"], request["minus"])
     utxq, ujson = __get_and_validate_utxq(
         request["utxq_address"],
-        partnership_secret(request["plus"], request["minus"]))
+        partnership_secret(request["plus"], request["minus"]),
+        partnership_agreement(request["plus"], request["minus"]))
     rdo = Duality.reciprocate_depends_on(operation)
     if rdo == utxq.operation:
         pass
@@ -144,15 +219,18 @@ def __validate_mtxq(operation, request):
     quantity_assets = __validate_references(
         request['quantity']['value'],
         request['quantity']['unit'],
-        request['quantity']['asset'])
+        request['quantity']['asset'],
+        snapshot)
     numerator_assets = __validate_references(
         request['ratio']['numerator']['value'],
         request['ratio']['numerator']['unit'],
-        request['ratio']['numerator']['asset'])
+        request['ratio']['numerator']['asset'],
+        snapshot)
     denominator_assets = __validate_references(
         request['ratio']['denominator']['value'],
         request['ratio']['denominator']['unit'],
-        request['ratio']['denominator']['asset'])
+        request['ratio']['denominator']['asset'],
+        snapshot)
     data_tuple = []
 
     data_tuple.append(str(utxq_qblock['value']))
@@ -169,26 +247,106 @@ def __validate_mtxq(operation, request):
     data_tuple.append(numerator_assets[1]['value'])
     data_tuple.append(denominator_assets[1]['value'])
     data_tuple.append(quantity_assets[1]['value'])
-    data_str = ",".join(data_tuple)
-    prf_pair = zksnark_genproof(keys_path(), data_str)
+    errors = balance_errors(data_tuple)
+    if errors:
+        raise DataException(
+            'Reciprocate does not balance initiate: {}'.format(
+                '; '.join(errors)))
     return (
         utxq,
         request["utxq_address"],
         quantity_assets,
         numerator_assets,
         denominator_assets,
-        prf_pair)
+        ",".join(data_tuple))
+
 
+def __legacy(uaddr):
+    """True for a 0.3.0 utxq, its match carries the text proof"""
+    return utxq_addresser.layout_version(uaddr) == \
+        utxq_addresser.LEGACY_VERSION
 
-def __create_quantity(value, quantity):
-    """Converts a quantity type into byte string from prime number"""
+
+def __proof_fields(request, data_str):
+    """Prove the match, returns the ExchangePayload proof fields
+
+    0.3.0 verifies the ppzksnark text 'proof' and 'pairings', later
+    versions the compact proof of the configured scheme
+    """
+    if __legacy(request["utxq_address"]):
+        proof, pairing = zksnark_genproof(keys_path(), data_str)
+        return {'proof': proof.encode(), 'pairings': pairing.encode()}
+    return {
+        'compact_proof': cached_proof(
+            request["plus"], request["minus"], data_str,
+            lambda equation: zksnark_genproof_compact(
+                keys_path(), equation, zksnark_scheme())),
+        'scheme': PROOF_SCHEMES[zksnark_scheme()]}
+
+
+def __validate_mtxq(operation, request, snapshot=None):
+    """Validate the content for mtxq and prove the match"""
+    qnd = __validate_mtxq_data(operation, request, snapshot)
+    return qnd[:-1] + (__proof_fields(request, qnd[-1]),)
+
+
+def __validate_mtxq_batch(requests):
+    """Validate each mtxq of a batch and prove all matches at once"""
+    if not requests:
+        raise DataException('Batch requires at least one mtxq')
+    try:
+        batch_size = batch_size_for(len(requests))
+    except ValueError as e:
+        raise DataException(str(e))
+    uaddrs = [request["utxq_address"] for request in requests]
+    if len(set(uaddrs)) != len(uaddrs):
+        raise DataException('Batch matches the same utxq more than once')
+    if len(set(utxq_addresser.layout_version(u) for u in uaddrs)) > 1:
+        raise DataException(
+            'Batch mixes utxqs of different exchange family versions')
+    if __legacy(uaddrs[0]):
+        raise DataException(
+            'Batches require utxqs of exchange family {} or later'.format(
+                utxq_addresser.AGREEMENT_VERSION))
+    validated = []
+    for request in requests:
+        operation = __validate_operation(request)
+        validated.append(
+            (operation, __validate_mtxq_data(operation, request), request))
+    compact = zksnark_genproof_compact(
+        keys_path(),
+        ",".join(qnd[-1] for _, qnd, _ in validated),
+        zksnark_scheme(),
+        batch_size)
+    return (batch_size, compact, [
+        (operation, qnd[:-1] + (None,), request)
+        for operation, qnd, request in validated])
+
+
+def __int_bytes(value):
+    """Fewest little endian bytes of a non negative integer"""
+    return value.to_bytes(
+        max(1, (value.bit_length() + 7) // 8), byteorder='little')
+
+
+def __create_quantity(value, quantity, request):
+    """Converts a quantity type into compact bytes from prime numbers
+
+    Units and assets in the partners' agreement catalog are carried as
+    their catalog index
+    """
     unit_data, asset_data = quantity
+    units, assets = catalog_primes(
+        partnership_agreement(request['plus'], request['minus']))
+    unit = int(unit_data['value'])
+    asset = int(asset_data['value'])
     return Quantity(
-        value=int(value).to_bytes(len(value), byteorder='little'),
-        unit=int(unit_data['value']).to_bytes(
-            len(unit_data['value']), byteorder='little'),
-        asset=int(asset_data['value']).to_bytes(
-            len(asset_data['value']), byteorder='little'))
+        encoding=Quantity.COMPACT,
+        value=__int_bytes(int(value)),
+        unit=b'' if unit in units else __int_bytes(unit),
+        unit_index=units.index(unit) + 1 if unit in units else 0,
+        asset=b'' if asset in assets else __int_bytes(asset),
+        asset_index=assets.index(asset) + 1 if asset in assets else 0)
 
 
 def __create_utxq(ingest):
@@ -197,22 +355,21 @@ def __create_utxq(ingest):
     return (operation, request, UTXQ(
         plus=public_key(request['plus']).encode(),
         minus=public_key(request['minus']).encode(),
-        quantity=__create_quantity(request['quantity']['value'], quantity),
+        quantity=__create_quantity(
+            request['quantity']['value'], quantity, request),
         operation=operation))
 
 
 def __create_initiate_payload(ingest):
     """Create the utxq payload"""
     operation, request, data = ingest
-    encrypted = binascii.hexlify(
-        STATE_CRYPTO.encrypt_from(
-            data.SerializeToString(),
-            private_key(request['plus']),
-            public_key(request['minus'])))
     return (HB_OPERATOR, ExchangePayload(
-        udata=encrypted,
+        udata=__encrypt_exchange(request, data),
         ukey=utxq_addresser.utxq_unmatched(
-            Duality.breakqname(operation), str(uuid.uuid4())),
+            Duality.breakqname(operation),
+            str(uuid.uuid4()),
+            utxq_addresser.agreement_hash(
+                public_key(request['plus']), public_key(request['minus']))),
         type=ExchangePayload.UTXQ))
 
 
@@ -231,55 +388,115 @@ def __create_initiate_inputs_outputs(ingest):
 def __create_mtxq(ingest):
     """Create the mtxq object"""
     operation, qassets, data = ingest
-    utxq, uaddr, quantity, numerator, denominator, prf_pair = qassets
+    utxq, uaddr, quantity, numerator, denominator, proof = qassets
     matched_uaddr = mtxq_addresser.set_utxq_matched(uaddr)
-    return (operation, utxq, matched_uaddr, prf_pair, data, MTXQ(
+    # Tombstoned matches reference the UTXQ at its original address
+    utxq_addr = uaddr if __tombstones(uaddr) else matched_uaddr
+    return (operation, utxq, matched_uaddr, proof, data, MTXQ(
         plus=public_key(data['plus']).encode(),
         minus=public_key(data['minus']).encode(),
-        quantity=__create_quantity(data['quantity']['value'], quantity),
+        quantity=__create_quantity(
+            data['quantity']['value'], quantity, data),
         ratio=Ratio(
             numerator=__create_quantity(
-                data['ratio']['numerator']['value'], numerator),
+                data['ratio']['numerator']['value'], numerator, data),
             denominator=__create_quantity(
-                data['ratio']['denominator']['value'], denominator)),
-        utxq_addr=matched_uaddr.encode(),
+                data['ratio']['denominator']['value'], denominator, data)),
+        utxq_addr=utxq_addr.encode(),
         operation=operation))
 
 
+def __tombstones(uaddr):
+    """True when matching uaddr writes a tombstone, not a UTXQ copy"""
+    return mtxq_addresser.layout_version(uaddr) == \
+        mtxq_addresser.TOMBSTONE_VERSION
+
+
+def __encrypt_exchange(request, data):
+    """Encrypt an exchange object into an envelope for the partners"""
+    return STATE_CRYPTO.seal_with(
+        data.SerializeToString(),
+        partnership_secret(request['plus'], request['minus']))
+
+
 def __create_reciprocate_payload(ingest):
     """Create the mtxq payload"""
-    operation, utxq, matched_uaddr, prf_pair, request, payload = ingest
-    proof, pairing = prf_pair
-    e_utxq = binascii.hexlify(
-        STATE_CRYPTO.encrypt_from(
-            utxq.SerializeToString(),
-            private_key(request['plus']),
-            public_key(request['minus'])))
-    e_mtxq = binascii.hexlify(
-        STATE_CRYPTO.encrypt_from(
-            payload.SerializeToString(),
-            private_key(request['plus']),
-            public_key(request['minus'])))
+    operation, utxq, matched_uaddr, proof, request, payload = ingest
+    e_utxq = b'' if __tombstones(matched_uaddr) \
+        else __encrypt_exchange(request, utxq)
+    e_mtxq = __encrypt_exchange(request, payload)
     return (HB_OPERATOR, ExchangePayload(
         type=ExchangePayload.MTXQ,
         ukey=matched_uaddr,
         mkey=mtxq_addresser.mtxq_address(
-            Duality.breakqname(operation), str(uuid.uuid4())),
+            Duality.breakqname(operation),
+            str(uuid.uuid4()),
+            mtxq_addresser.agreement_segment(matched_uaddr)),
         mdata=e_mtxq,
         udata=e_utxq,
-        pairings=pairing.encode(),
-        proof=proof.encode()))
+        **proof))
 
 
 def __create_reciprocate_inputs_outputs(ingest):
     """Create mtxq address (state) authorizations"""
     signer, payload = ingest
     inputs = [payload.ukey]
+    if __tombstones(payload.ukey):
+        inputs.append(mtxq_addresser.set_utxq_unmatched(payload.ukey))
     outputs = [payload.ukey, payload.mkey]
     return (
         signer,
         mtxq_addresser,
-        {"inputs": inputs, "outputs": outputs},
+        {
+            "inputs": inputs,
+            "outputs": outputs,
+            "family_version": mtxq_addresser.layout_version(payload.ukey)},
+        payload)
+
+
+def __create_batch_mtxqs(ingest):
+    """Create the mtxq object of each match in a batch"""
+    batch_size, compact, validated = ingest
+    return (batch_size, compact, [__create_mtxq(v) for v in validated])
+
+
+def __create_batch_payload(ingest):
+    """Create the mtxq batch payload"""
+    batch_size, compact, mtxqs = ingest
+    matches = []
+    for operation, utxq, matched_uaddr, _, request, mtxq in mtxqs:
+        matches.append(ExchangeMatch(
+            ukey=matched_uaddr,
+            mkey=mtxq_addresser.mtxq_address(
+                Duality.breakqname(operation),
+                str(uuid.uuid4()),
+                mtxq_addresser.agreement_segment(matched_uaddr)),
+            mdata=__encrypt_exchange(request, mtxq),
+            udata=b'' if __tombstones(matched_uaddr)
+            else __encrypt_exchange(request, utxq)))
+    return (HB_OPERATOR, ExchangePayload(
+        type=ExchangePayload.MTXQ_BATCH,
+        matches=matches,
+        batch_size=batch_size,
+        compact_proof=compact,
+        scheme=PROOF_SCHEMES[zksnark_scheme()]))
+
+
+def __create_batch_inputs_outputs(ingest):
+    """Create mtxq batch address (state) authorizations"""
+    signer, payload = ingest
+    ukeys = [match.ukey for match in payload.matches]
+    outputs = ukeys + [match.mkey for match in payload.matches]
+    inputs = list(ukeys)
+    if __tombstones(ukeys[0]):
+        inputs.extend(mtxq_addresser.set_utxq_unmatched(u) for u in ukeys)
+    return (
+        signer,
+        mtxq_addresser,
+        {
+            "inputs": inputs,
+            "outputs": outputs,
+            "family_version": mtxq_addresser.layout_version(ukeys[0])},
         payload)
 
 
@@ -304,3 +521,137 @@ def create_mtxq(request):
         __create_reciprocate_inputs_outputs, __create_reciprocate_payload,
         __create_mtxq)
     mtxq_build((operation, qnd, request))
+    order_book().remove(request["utxq_address"])
+    matched_set().add(request["utxq_address"])
+
+
+def create_mtxq_batch(requests):
+    """Create one mtxq transaction proving many matches"""
+    batch = __validate_mtxq_batch(requests)
+    batch_build = compose_builder(
+        submit_single_txn, create_transaction,
+        __create_batch_inputs_outputs, __create_batch_payload,
+        __create_batch_mtxqs)
+    batch_build(batch)
+    for request in requests:
+        order_book().remove(request["utxq_address"])
+        matched_set().add(request["utxq_address"])
+
+
+def create_utxq_bulk(requests):
+    """Create a utxq transaction for each request
+
+    Unit and asset references are looked up once for the request.
+    Returns a result per utxq
+    """
+    snapshot = {}
+
+    def validate(request):
+        operation = __validate_operation(request)
+        return ((operation, __validate_utxq(request, snapshot), request), {})
+    return create_bulk(
+        requests,
+        validate,
+        compose_builder(
+            create_transaction, __create_initiate_inputs_outputs,
+            __create_initiate_payload, __create_utxq),
+        BULK_FAILURES)
+
+
+def create_mtxq_bulk(requests):
+    """Create a mtxq transaction, with its own proof, for each request
+
+    Unit and asset references are looked up once for the request, and
+    a utxq may only be matched once in it. Returns a result per mtxq
+    """
+    snapshot = {}
+    claimed = set()
+
+    def validate(request):
+        uaddr = request["utxq_address"]
+        if mtxq_addresser.set_utxq_matched(uaddr) in claimed:
+            raise DataException(
+                'UTXQ {} is matched earlier in the request'.format(uaddr))
+        operation = __validate_operation(request)
+        qnd = __validate_mtxq(operation, request, snapshot)
+        claimed.add(mtxq_addresser.set_utxq_matched(uaddr))
+        return ((operation, qnd, request), {"utxq_address": uaddr})
+    results = create_bulk(
+        requests,
+        validate,
+        compose_builder(
+            create_transaction, __create_reciprocate_inputs_outputs,
+            __create_reciprocate_payload, __create_mtxq),
+        BULK_FAILURES)
+    for result in results:
+        if result["status"] == "OK":
+            order_book().remove(result["utxq_address"])
+            matched_set().add(result["utxq_address"])
+    return results
+
+
+def match_candidates(request, limit=10):
+    """Open UTXQs a proposed reciprocate could match, best first
+
+    The balancing initiate is d * r / n for the quantity value, unit
+    and asset. Unit and asset select the book, UTXQs with exactly that
+    value come first followed by the nearest quantities. The candidates
+    are screened together with check_balances, exact ones balance
+    """
+    operation = __validate_operation(request)
+    __validate_partners(request["plus"], request["minus"])
+    agreement = partnership_agreement(request["plus"], request["minus"])
+    quantity_assets = __validate_references(
+        request['quantity']['value'],
+        request['quantity']['unit'],
+        request['quantity']['asset'])
+    numerator_assets = __validate_references(
+        request['ratio']['numerator']['value'],
+        request['ratio']['numerator']['unit'],
+        request['ratio']['numerator']['asset'])
+    denominator_assets = __validate_references(
+        request['ratio']['denominator']['value'],
+        request['ratio']['denominator']['unit'],
+        request['ratio']['denominator']['asset'])
+    terms = [(
+        request['ratio']['numerator']['value'],
+        request['ratio']['denominator']['value'],
+        request['quantity']['value'])]
+    for index in (0, 1):
+        terms.append((
+            numerator_assets[index]['value'],
+            denominator_assets[index]['value'],
+            quantity_assets[index]['value']))
+    required = []
+    for numerator, denominator, reciprocate in terms:
+        if int(numerator) == 0:
+            raise DataException('Ratio numerator must not be zero')
+        required.append(
+            Fraction(int(denominator) * int(reciprocate), int(numerator)))
+    value, unit, asset = required
+    if unit.denominator != 1 or asset.denominator != 1:
+        raise DataException(
+            'Ratio unit and asset primes can not balance any initiate')
+
+    key = OrderBook.book_key(
+        agreement,
+        Duality.reciprocate_depends_on(operation),
+        int(asset),
+        int(unit))
+    candidates = order_book().candidates(key, value, limit)
+    unbalanced = set(check_balances([
+        (quantity,) + terms[0] + (int(unit),) + terms[1]
+        + (int(asset),) + terms[2]
+        for quantity, _ in candidates]))
+    return {
+        'agreement': agreement,
+        'required': {
+            'value': str(value),
+            'unit': str(unit),
+            'asset': str(asset)},
+        'data': [
+            {
+                'address': address,
+                'quantity': str(quantity),
+                'exact': row not in unbalanced}
+            for row, (quantity, address) in enumerate(candidates)]}
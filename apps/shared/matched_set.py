@@ -0,0 +1,157 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""matched_set - Local screen of matched UTXQ addresses
+
+Holds the matched form of every UTXQ address seen, as an exact set or
+as a Bloom filter. A miss means the UTXQ was not matched at the last
+scan of the chain or through this instance, so no network probe is
+made. A hit is confirmed against the chain.
+
+The set is built when the REST application starts and rescanned every
+refresh seconds on a background thread, so matches made through other
+workers, nodes or the CLI are seen within that interval. Until a scan
+has succeeded, or after one fails, every UTXQ is probed. Matches made
+elsewhere since the last scan are still rejected by the exchange
+transaction processor.
+"""
+import hashlib
+import logging
+import math
+import threading
+
+from shared.rest_client import RestClient
+from shared.rescan import Rescan
+
+from modules.config import sawtooth_rest_host, matched_set_settings
+from modules.decode import utxq_addresser, mtxq_addresser
+
+LOGGER = logging.getLogger(__name__)
+
+_MATCHED_SET = None
+
+
+class BloomFilter(object):
+    """Bit array with k indexes per item by double hashing"""
+
+    def __init__(self, capacity, error_rate):
+        self._bits = max(8, int(math.ceil(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self._hashes = max(1, int(round(
+            self._bits / capacity * math.log(2))))
+        self._array = bytearray((self._bits + 7) // 8)
+
+    def _indexes(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self._hashes):
+            yield (first + i * second) % self._bits
+
+    def add(self, item):
+        for index in self._indexes(item):
+            self._array[index >> 3] |= 1 << (index & 7)
+
+    def __contains__(self, item):
+        return all(
+            self._array[index >> 3] & (1 << (index & 7))
+            for index in self._indexes(item))
+
+    def __len__(self):
+        return len(self._array)
+
+
+class MatchedSet(Rescan):
+    """Matched UTXQ addresses, exact or a Bloom filter"""
+
+    def __init__(self, bloom=False, capacity=100000, error_rate=0.01):
+        super().__init__()
+        self._bloom = bloom
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._lock = threading.Lock()
+        self._members = None
+        self._added = []
+
+    def _empty(self):
+        if self._bloom:
+            return BloomFilter(self._capacity, self._error_rate)
+        return set()
+
+    @property
+    def ready(self):
+        """True once a scan of the chain has succeeded"""
+        return self._members is not None
+
+    def add(self, address):
+        """Records a UTXQ address, in either form, as matched"""
+        matched = mtxq_addresser.set_utxq_matched(address)
+        with self._lock:
+            self._added.append(matched)
+            if self._members is not None:
+                self._members.add(matched)
+
+    def might_contain(self, address):
+        """False when the UTXQ is known not to be matched"""
+        members = self._members
+        return members is None \
+            or mtxq_addresser.set_utxq_matched(address) in members
+
+    def rebuild(self, entries=None):
+        """Replaces the members from a scan of the UTXQ namespace
+
+        Addresses added while the scan runs are kept
+        """
+        with self._lock:
+            self._added = []
+        if entries is None:
+            client = RestClient(sawtooth_rest_host())
+            entries = (
+                entry
+                for prefix in utxq_addresser.mtype_addresses
+                for entry in client.iter_state(prefix))
+        members = self._empty()
+        for entry in entries:
+            if utxq_addresser.is_matched(entry['address']):
+                members.add(entry['address'])
+        with self._lock:
+            for address in self._added:
+                members.add(address)
+            self._added = []
+            self._members = members
+
+    def scan_failed(self):
+        LOGGER.exception('Matched set scan failed, probing every UTXQ')
+        with self._lock:
+            self._members = None
+
+
+def matched_set():
+    """Returns the REST tier matched set
+
+    It probes every UTXQ until start_matched_set has scanned the chain
+    """
+    global _MATCHED_SET
+    if _MATCHED_SET is None:
+        settings = matched_set_settings()
+        _MATCHED_SET = MatchedSet(
+            settings['bloom'], settings['capacity'], settings['error_rate'])
+    return _MATCHED_SET
+
+
+def start_matched_set():
+    """Builds the matched set and keeps it current, at startup"""
+    matched_set().start(matched_set_settings()['refresh'])
@@ -0,0 +1,203 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""order_book - Open UTXQ index for match candidate lookups
+
+Unmatched UTXQs are kept in sorted (quantity, address) lists per
+(agreement, duality namespace, initiate verb, asset prime, unit prime).
+The book is built when the REST application starts and rebuilt from a
+scan of the UTXQ namespace every refresh seconds on a background
+thread. Matches made through this REST instance are removed as they
+are submitted, lookups only read the book.
+"""
+import bisect
+import logging
+import threading
+
+from shared.rescan import Rescan
+
+from modules.config import (
+    agreement_names, agreement_secret, partnership_agreement,
+    key_owner, order_book_refresh)
+from modules.exceptions import AuthException
+from modules.decode import (
+    utxq_addresser, mtxq_addresser, iter_encrypted_state, quantity_ints)
+from modules.query import ExchangeQuery
+from protobuf.exchange_pb2 import UTXQ
+
+LOGGER = logging.getLogger(__name__)
+
+_ORDER_BOOK = None
+
+
+class OrderBook(Rescan):
+    """Sorted open UTXQ quantities by book key"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._books = {}
+        self._entries = {}
+        self._changes = []
+        self._ready = False
+
+    @staticmethod
+    def book_key(agreement, operation, asset, unit):
+        """(agreement, namespace, initiate verb, asset prime, unit prime)"""
+        namespace, verb = operation.split('.')
+        return (agreement, namespace, verb, asset, unit)
+
+    @property
+    def ready(self):
+        """True once a scan of the chain has succeeded"""
+        return self._ready
+
+    def add(self, key, value, address):
+        with self._lock:
+            self._changes.append((address, (key, value)))
+            self._add(key, value, address)
+
+    def _add(self, key, value, address):
+        if address in self._entries:
+            return
+        bisect.insort(self._books.setdefault(key, []), (value, address))
+        self._entries[address] = (key, value)
+
+    def remove(self, address):
+        """Drops an open UTXQ, e.g. once it has been matched"""
+        with self._lock:
+            self._changes.append((address, None))
+            self._remove(address)
+
+    def _remove(self, address):
+        entry = self._entries.pop(address, None)
+        if entry is None:
+            return
+        key, value = entry
+        book = self._books[key]
+        index = bisect.bisect_left(book, (value, address))
+        if index < len(book) and book[index] == (value, address):
+            del book[index]
+        if not book:
+            del self._books[key]
+
+    def _scan(self):
+        """Collects the open UTXQs of every agreement from the chain"""
+        entries = []
+        for agreement in agreement_names():
+            unmatched = {}
+            matched = set()
+            secret = agreement_secret(agreement)
+            for prefix in ExchangeQuery(utxq_addresser, agreement).prefixes:
+                for address, data in iter_encrypted_state(
+                        prefix, secret, resolve=False):
+                    if utxq_addresser.is_matched(address):
+                        matched.add(address)
+                        continue
+                    utxq = UTXQ()
+                    utxq.ParseFromString(data)
+                    try:
+                        owner = partnership_agreement(
+                            key_owner(utxq.plus.decode()),
+                            key_owner(utxq.minus.decode()))
+                    except AuthException:
+                        continue
+                    if owner == agreement:
+                        unmatched[address] = utxq
+            for address, utxq in unmatched.items():
+                if mtxq_addresser.set_utxq_matched(address) in matched:
+                    continue
+                value, unit, asset = quantity_ints(utxq.quantity, agreement)
+                entries.append((
+                    self.book_key(agreement, utxq.operation, asset, unit),
+                    value,
+                    address))
+        return entries
+
+    def rebuild(self, entries=None):
+        """Replaces the books from a scan of the UTXQ namespace
+
+        entries are (book key, quantity, address), each book is sorted
+        once. Adds and removes made while the scan runs are kept
+        """
+        with self._lock:
+            self._changes = []
+        if entries is None:
+            entries = self._scan()
+        books = {}
+        index = {}
+        for key, value, address in entries:
+            if address not in index:
+                books.setdefault(key, []).append((value, address))
+                index[address] = (key, value)
+        for book in books.values():
+            book.sort()
+        with self._lock:
+            self._books = books
+            self._entries = index
+            for address, entry in self._changes:
+                if entry is None:
+                    self._remove(address)
+                else:
+                    self._add(entry[0], entry[1], address)
+            self._changes = []
+            self._ready = True
+
+    def scan_failed(self):
+        LOGGER.exception('Order book scan failed, keeping the last book')
+
+    def candidates(self, key, value, limit=10):
+        """Open UTXQs of a book nearest to value, exact matches first
+
+        Returns up to limit (quantity, address) tuples, found by
+        bisection of the sorted book
+        """
+        with self._lock:
+            book = self._books.get(key, [])
+            low = bisect.bisect_left(book, (value,))
+            high = low
+            result = []
+            while high < len(book) and book[high][0] == value \
+                    and len(result) < limit:
+                result.append(book[high])
+                high += 1
+            low -= 1
+            while len(result) < limit and (low >= 0 or high < len(book)):
+                if high >= len(book) or (
+                        low >= 0 and value - book[low][0] <=
+                        book[high][0] - value):
+                    result.append(book[low])
+                    low -= 1
+                else:
+                    result.append(book[high])
+                    high += 1
+            return result
+
+
+def order_book():
+    """Returns the REST tier order book
+
+    It is empty until start_order_book has scanned the chain
+    """
+    global _ORDER_BOOK
+    if _ORDER_BOOK is None:
+        _ORDER_BOOK = OrderBook()
+    return _ORDER_BOOK
+
+
+def start_order_book():
+    """Builds the order book and keeps it current, at startup"""
+    order_book().start(order_book_refresh())
@@ -0,0 +1,142 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""proof_cache - Reuse of proofs for identical balancing equations
+
+Market making flows reciprocate with the same quantities, ratio, unit
+and asset over and over. Proofs are stored by agreement and by the
+exact equation values, which are the public inputs of the proof, and
+reused within that agreement until they expire.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from modules.config import (
+    keys_path, zksnark_scheme,
+    proof_cache_settings, partnership_agreement)
+from modules.hashblock_zksnark import verify_keyname
+from modules.verify_cache import verifier_key_id
+
+LOGGER = logging.getLogger(__name__)
+
+STATS_LOG_INTERVAL = 1000
+
+_PROOF_CACHE = None
+
+
+def equation_key(agreement, data_str):
+    """Cache key of an equation proven for an agreement
+
+    data_str holds the 12 prover values, values then unit primes then
+    asset primes, each as initiate, numerator, denominator and
+    reciprocate. They are kept exactly as given
+    """
+    scheme = zksnark_scheme()
+    return (
+        agreement,
+        scheme,
+        verifier_key_id(keys_path(), verify_keyname(scheme)),
+        tuple(int(x) for x in data_str.split(',')))
+
+
+class ProofCache(object):
+    """Bounded, expiring map of equation key to compact proof"""
+
+    def __init__(self, ttl, size, clock=time.monotonic):
+        self._ttl = ttl
+        self._size = size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def stats(self):
+        """Returns the hit counters and current size"""
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'size': len(self._entries)}
+
+    def _count(self, hit):
+        if hit:
+            self._hits += 1
+        else:
+            self._misses += 1
+        if (self._hits + self._misses) % STATS_LOG_INTERVAL == 0:
+            LOGGER.info(
+                "Proof cache hits %d misses %d", self._hits, self._misses)
+
+    def get(self, key):
+        """Returns the stored proof or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self._count(True)
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self._count(False)
+            return None
+
+    def put(self, key, proof):
+        """Stores a proof, evicting the least recently used"""
+        if self._size == 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self._ttl, proof)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+
+def proof_cache():
+    """Returns the configured proof cache, None when disabled"""
+    global _PROOF_CACHE
+    settings = proof_cache_settings()
+    if not settings['enabled']:
+        return None
+    if _PROOF_CACHE is None:
+        _PROOF_CACHE = ProofCache(settings['ttl'], settings['size'])
+    return _PROOF_CACHE
+
+
+def cached_proof(plus, minus, data_str, prove):
+    """Proves data_str with prove(data_str), reusing a stored proof
+
+    Nothing is looked up or stored for agreements that opted out
+    """
+    cache = proof_cache()
+    agreement = partnership_agreement(plus, minus)
+    if cache is None or agreement in proof_cache_settings()['opt_out']:
+        return prove(data_str)
+    key = equation_key(agreement, data_str)
+    proof = cache.get(key)
+    if proof is None:
+        proof = prove(data_str)
+        cache.put(key, proof)
+    return proof
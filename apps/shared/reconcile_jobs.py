@@ -0,0 +1,99 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""reconcile_jobs - Reconciliations run off the request path
+
+A reconciliation reads every exchange of an agreement, so the REST tier
+runs it on a daemon thread, at most one per agreement, and keeps the
+last outcome until the next run replaces it.
+"""
+import logging
+import threading
+import time
+
+from modules.config import agreement_secret
+from modules.exceptions import DataException
+from modules.reconcile import reconcile
+
+LOGGER = logging.getLogger(__name__)
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_RECONCILE_JOBS = None
+
+
+class ReconcileJobs(object):
+    """Last reconciliation job by agreement"""
+
+    def __init__(self, run=reconcile):
+        self._run = run
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, agreement):
+        """Starts a reconciliation unless one is running, returns its job
+
+        Raises AuthException for an unknown agreement
+        """
+        agreement_secret(agreement)
+        with self._lock:
+            job = self._jobs.get(agreement)
+            if job and job['status'] == RUNNING:
+                return dict(job)
+            job = {'status': RUNNING, 'started': int(time.time())}
+            self._jobs[agreement] = job
+        thread = threading.Thread(
+            target=self._reconcile, args=(agreement, job['started']),
+            daemon=True)
+        thread.start()
+        return dict(job)
+
+    def status(self, agreement):
+        """Returns the last job of the agreement, with its result when done
+
+        Raises AuthException for an unknown agreement and DataException
+        when no reconciliation was submitted
+        """
+        agreement_secret(agreement)
+        with self._lock:
+            job = self._jobs.get(agreement)
+        if not job:
+            raise DataException(
+                'No reconciliation submitted for {}'.format(agreement))
+        return dict(job)
+
+    def _reconcile(self, agreement, started):
+        job = {'started': started}
+        try:
+            job['result'] = self._run(agreement)
+            job['status'] = DONE
+        except Exception as e:
+            LOGGER.exception('Reconciliation of %s failed', agreement)
+            job['status'] = FAILED
+            job['error'] = '{}: {}'.format(type(e).__name__, e)
+        job['finished'] = int(time.time())
+        with self._lock:
+            self._jobs[agreement] = job
+
+
+def reconcile_jobs():
+    """Returns the REST tier reconciliation jobs"""
+    global _RECONCILE_JOBS
+    if _RECONCILE_JOBS is None:
+        _RECONCILE_JOBS = ReconcileJobs()
+    return _RECONCILE_JOBS
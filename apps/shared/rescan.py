@@ -0,0 +1,60 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""rescan - Periodic rebuild of a local view of the chain
+
+The view is rebuilt when it is started and then every refresh seconds
+on a daemon thread, off the request path.
+"""
+import threading
+
+
+class Rescan(object):
+    """Base of views rebuilt from the chain on a background thread
+
+    Subclasses implement rebuild, which scans the chain when called
+    without entries, and scan_failed, called when it raises
+    """
+
+    def __init__(self):
+        self._stopped = threading.Event()
+
+    def rebuild(self, entries=None):
+        raise NotImplementedError
+
+    def scan_failed(self):
+        raise NotImplementedError
+
+    def _rescan(self):
+        try:
+            self.rebuild()
+        except Exception:
+            self.scan_failed()
+
+    def _run(self, refresh_sec):
+        while not self._stopped.wait(refresh_sec):
+            self._rescan()
+
+    def start(self, refresh_sec):
+        """Scans the chain now and then every refresh_sec seconds"""
+        self._rescan()
+        thread = threading.Thread(
+            target=self._run, args=(refresh_sec,), daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stopped.set()
@@ -60,8 +60,8 @@ class RestClient(object):
     def get_status(self):
         return self._get('/status')['data']
 
-    def list_transactions(self):
-        return self._get_data('/transactions')
+    def list_transactions(self, head=None):
+        return self._get_data('/transactions', head=head)
 
     def get_transaction(self, transaction_id):
         return self._get('/transactions/' + transaction_id)['data']
@@ -69,6 +69,23 @@ class RestClient(object):
     def list_state(self, subtree=None, head=None):
         return self._get('/state', address=subtree, head=head)
 
+    def iter_state(self, subtree=None, head=None, limit=None, start=None):
+        """Return a state entry generator, one page is held at a time
+
+        start is the address to list from
+        """
+        return self._get_data(
+            '/state', address=subtree, head=head, limit=limit, start=start)
+
+    def get_head(self):
+        """Returns the id of the chain head block"""
+        code, json_result = self._submit_request(
+            self._base_url + '/blocks', params={'limit': 1})
+        if code != 200:
+            raise RestException(
+                "{}: {} {}".format(self._base_url, code, json_result))
+        return json_result['head']
+
     def get_leaf(self, address, head=None):
         return self._get('/state/' + address, head=head)
 
@@ -144,7 +161,9 @@ class RestClient(object):
             for item in json_result.get('data', []):
                 yield item
 
+            # the next link carries the queries
             url = json_result['paging'].get('next', None)
+            params = None
 
     def _post(self, path, data, **queries):
         if isinstance(data, bytes):
@@ -0,0 +1,143 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import math
+import unittest
+from unittest import mock
+
+from shared.matched_set import BloomFilter, MatchedSet
+
+from modules.decode import utxq_addresser, mtxq_addresser
+from modules.exceptions import RestException
+
+
+def unmatched(ident, agreement_hash='0123abcd'):
+    return utxq_addresser.utxq_unmatched(
+        ('bags', 'peanuts'), ident, agreement_hash)
+
+
+def matched(ident, agreement_hash='0123abcd'):
+    return mtxq_addresser.set_utxq_matched(unmatched(ident, agreement_hash))
+
+
+def scan(*addresses):
+    return [{'address': address} for address in addresses]
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_sizing(self):
+        bloom = BloomFilter(1000, 0.01)
+        bits = math.ceil(-1000 * math.log(0.01) / math.log(2) ** 2)
+        self.assertEqual(bits, 9586)
+        self.assertEqual(len(bloom), (bits + 7) // 8)
+        self.assertEqual(bloom._hashes, 7)
+
+    def test_sizing_floor(self):
+        # At least 8 bits, with the hash count optimal for them
+        bloom = BloomFilter(1, 0.5)
+        self.assertEqual(len(bloom), 1)
+        self.assertEqual(bloom._hashes, round(8 * math.log(2)))
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = ['item{}'.format(i) for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add('item{}'.format(i))
+        false_positives = sum(
+            1 for i in range(10000) if 'other{}'.format(i) in bloom)
+        self.assertLess(false_positives / 10000, 0.02)
+
+
+class TestMatchedSet(unittest.TestCase):
+
+    def _check_screen(self, screen):
+        screen.rebuild(scan(matched('a'), unmatched('b'), unmatched('c')))
+        self.assertTrue(screen.ready)
+        self.assertTrue(screen.might_contain(unmatched('a')))
+        self.assertTrue(screen.might_contain(matched('a')))
+        self.assertFalse(screen.might_contain(unmatched('b')))
+        screen.add(unmatched('b'))
+        self.assertTrue(screen.might_contain(matched('b')))
+
+    def test_exact(self):
+        self._check_screen(MatchedSet())
+
+    def test_bloom(self):
+        self._check_screen(MatchedSet(True, 100, 0.01))
+
+    def test_probes_until_scanned(self):
+        screen = MatchedSet()
+        self.assertFalse(screen.ready)
+        self.assertTrue(screen.might_contain(unmatched('a')))
+        screen.add(unmatched('a'))
+        screen.rebuild(scan())
+        self.assertFalse(screen.might_contain(unmatched('a')))
+
+    def test_rebuild_replaces_members(self):
+        screen = MatchedSet()
+        screen.rebuild(scan(matched('a')))
+        screen.rebuild(scan(matched('b')))
+        self.assertFalse(screen.might_contain(unmatched('a')))
+        self.assertTrue(screen.might_contain(unmatched('b')))
+
+    def test_add_during_rebuild_is_kept(self):
+        screen = MatchedSet()
+        screen.rebuild(scan())
+
+        def entries():
+            yield {'address': matched('a')}
+            screen.add(unmatched('b'))
+            yield {'address': unmatched('c')}
+        screen.rebuild(entries())
+        self.assertTrue(screen.might_contain(unmatched('a')))
+        self.assertTrue(screen.might_contain(unmatched('b')))
+        self.assertFalse(screen.might_contain(unmatched('c')))
+
+    def test_failed_scan_probes_everything(self):
+        screen = MatchedSet()
+        screen.rebuild(scan(matched('a')))
+        client = mock.Mock()
+        client.iter_state.side_effect = RestException('unreachable')
+        with mock.patch('shared.matched_set.sawtooth_rest_host'), \
+                mock.patch(
+                    'shared.matched_set.RestClient', return_value=client):
+            screen._rescan()
+        self.assertFalse(screen.ready)
+        self.assertTrue(screen.might_contain(unmatched('b')))
+
+    def test_start_scans_the_chain(self):
+        screen = MatchedSet()
+        client = mock.Mock()
+        client.iter_state.side_effect = lambda prefix: iter(
+            scan(matched('a')) if prefix == utxq_addresser.mtype_addresses[0]
+            else scan(matched('b', None)))
+        with mock.patch('shared.matched_set.sawtooth_rest_host'), \
+                mock.patch(
+                    'shared.matched_set.RestClient', return_value=client):
+            thread = screen.start(3600)
+        screen.stop()
+        thread.join()
+        self.assertTrue(screen.ready)
+        self.assertTrue(screen.might_contain(unmatched('a')))
+        self.assertTrue(screen.might_contain(unmatched('b', None)))
+        self.assertFalse(screen.might_contain(unmatched('c')))
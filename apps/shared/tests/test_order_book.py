@@ -0,0 +1,137 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from unittest import mock
+
+from shared.order_book import OrderBook
+
+from modules.exceptions import RestException
+
+KEY = OrderBook.book_key('agreement', 'bags.peanuts', 7, 3)
+OTHER_KEY = OrderBook.book_key('agreement', 'bags.peanuts', 7, 5)
+
+
+class ScannedBook(OrderBook):
+    """OrderBook reading its scan from a list instead of the chain"""
+
+    def __init__(self, entries):
+        super().__init__()
+        self.scans = 0
+        self.scan_entries = entries
+
+    def _scan(self):
+        self.scans += 1
+        return list(self.scan_entries)
+
+
+def book(*quantities):
+    orders = ScannedBook([
+        (KEY, quantity, 'u{}'.format(index))
+        for index, quantity in enumerate(quantities)])
+    orders.rebuild()
+    return orders
+
+
+class TestOrderBook(unittest.TestCase):
+
+    def test_book_key(self):
+        self.assertEqual(KEY, ('agreement', 'bags', 'peanuts', 7, 3))
+
+    def test_exact_matches_come_first(self):
+        result = book(8, 10, 12, 10, 11).candidates(KEY, 10)
+        self.assertEqual(
+            result, [(10, 'u1'), (10, 'u3'), (11, 'u4'), (8, 'u0'),
+                     (12, 'u2')])
+
+    def test_nearest_quantities_prefer_lower_on_ties(self):
+        result = book(8, 12, 9, 11).candidates(KEY, 10)
+        self.assertEqual(
+            result, [(9, 'u2'), (11, 'u3'), (8, 'u0'), (12, 'u1')])
+
+    def test_limit(self):
+        orders = book(10, 10, 10, 9, 11)
+        self.assertEqual(
+            orders.candidates(KEY, 10, limit=2), [(10, 'u0'), (10, 'u1')])
+        self.assertEqual(len(orders.candidates(KEY, 10, limit=4)), 4)
+        self.assertEqual(orders.candidates(KEY, 10, limit=0), [])
+
+    def test_value_beyond_the_book(self):
+        orders = book(3, 1, 2)
+        self.assertEqual(
+            orders.candidates(KEY, 0), [(1, 'u1'), (2, 'u2'), (3, 'u0')])
+        self.assertEqual(
+            orders.candidates(KEY, 9), [(3, 'u0'), (2, 'u2'), (1, 'u1')])
+
+    def test_books_are_separate(self):
+        orders = book(10)
+        self.assertEqual(orders.candidates(KEY, 10), [(10, 'u0')])
+        orders.add(OTHER_KEY, 10, 'other')
+        self.assertEqual(orders.candidates(OTHER_KEY, 10), [(10, 'other')])
+        self.assertEqual(
+            orders.candidates(OrderBook.book_key('x', 'a.b', 1, 1), 10), [])
+
+    def test_add_and_remove(self):
+        orders = book(10, 11)
+        orders.add(KEY, 12, 'u1')
+        orders.remove('u0')
+        orders.remove('missing')
+        self.assertEqual(orders.candidates(KEY, 10), [(11, 'u1')])
+        orders.remove('u1')
+        self.assertEqual(orders.candidates(KEY, 10), [])
+
+    def test_candidates_only_read(self):
+        orders = ScannedBook([(KEY, 10, 'u0')])
+        self.assertFalse(orders.ready)
+        self.assertEqual(orders.candidates(KEY, 10), [])
+        self.assertEqual(orders.scans, 0)
+        orders.rebuild()
+        self.assertTrue(orders.ready)
+        orders.candidates(KEY, 10)
+        self.assertEqual(orders.scans, 1)
+
+    def test_rebuild_replaces_the_book(self):
+        orders = book(10)
+        orders.scan_entries = [(KEY, 11, 'u9'), (KEY, 12, 'u9')]
+        orders.rebuild()
+        self.assertEqual(orders.candidates(KEY, 10), [(11, 'u9')])
+
+    def test_changes_during_rebuild_are_kept(self):
+        orders = book(10, 11)
+
+        def entries():
+            yield (KEY, 10, 'u0')
+            orders.remove('u0')
+            orders.add(KEY, 12, 'u2')
+            yield (KEY, 11, 'u1')
+        orders.rebuild(entries())
+        self.assertEqual(
+            orders.candidates(KEY, 10), [(11, 'u1'), (12, 'u2')])
+
+    def test_failed_scan_keeps_the_book(self):
+        orders = book(10)
+        orders._scan = mock.Mock(side_effect=RestException('unreachable'))
+        orders._rescan()
+        self.assertTrue(orders.ready)
+        self.assertEqual(orders.candidates(KEY, 10), [(10, 'u0')])
+
+    def test_start_scans_the_chain(self):
+        orders = ScannedBook([(KEY, 10, 'u0')])
+        thread = orders.start(3600)
+        orders.stop()
+        thread.join()
+        self.assertEqual(orders.scans, 1)
+        self.assertEqual(orders.candidates(KEY, 10), [(10, 'u0')])
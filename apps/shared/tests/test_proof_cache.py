@@ -0,0 +1,161 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from unittest import mock
+
+from shared.proof_cache import ProofCache, cached_proof, equation_key
+
+UNIT = 2 ** 171 + 133
+ASSET = 2 ** 170 + 81
+
+
+def equation(numerator, denominator):
+    return ','.join(str(x) for x in (
+        10, numerator, denominator, 5,
+        UNIT, 3, 3, UNIT,
+        ASSET, 7, 7, ASSET))
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def patch_config(test, **values):
+    """Patches shared.proof_cache names to return the given values"""
+    for name, value in values.items():
+        patcher = mock.patch(
+            'shared.proof_cache.' + name, return_value=value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+class TestEquationKey(unittest.TestCase):
+
+    def setUp(self):
+        patch_config(
+            self, zksnark_scheme='ppzksnark', verifier_key_id='key',
+            keys_path='keys/')
+
+    def test_values_are_exact(self):
+        self.assertNotEqual(
+            equation_key('agreement', equation(2, 4)),
+            equation_key('agreement', equation(1, 2)))
+        self.assertEqual(
+            equation_key('agreement', equation(2, 4))[3],
+            tuple(int(x) for x in equation(2, 4).split(',')))
+
+    def test_agreements_are_separate(self):
+        self.assertNotEqual(
+            equation_key('agreement', equation(1, 2)),
+            equation_key('other', equation(1, 2)))
+
+    def test_scheme_and_key_are_included(self):
+        self.assertEqual(
+            equation_key('agreement', equation(1, 2))[0:3],
+            ('agreement', 'ppzksnark', 'key'))
+
+
+class TestCachedProof(unittest.TestCase):
+
+    def setUp(self):
+        patch_config(
+            self, zksnark_scheme='ppzksnark', verifier_key_id='key',
+            keys_path='keys/', proof_cache=ProofCache(60, 10),
+            proof_cache_settings={'opt_out': ['opted']})
+        agreement = mock.patch(
+            'shared.proof_cache.partnership_agreement',
+            side_effect=lambda plus, minus: plus + minus)
+        agreement.start()
+        self.addCleanup(agreement.stop)
+        self.proofs = []
+
+    def prove(self, data_str):
+        self.proofs.append(data_str)
+        return 'proof{}'.format(len(self.proofs)).encode()
+
+    def test_same_equation_and_agreement_is_reused(self):
+        first = cached_proof('a', 'b', equation(1, 2), self.prove)
+        self.assertEqual(
+            cached_proof('a', 'b', equation(1, 2), self.prove), first)
+        self.assertEqual(len(self.proofs), 1)
+
+    def test_equal_ratio_is_proven_again(self):
+        cached_proof('a', 'b', equation(1, 2), self.prove)
+        self.assertEqual(
+            cached_proof('a', 'b', equation(2, 4), self.prove), b'proof2')
+
+    def test_other_agreement_is_proven_again(self):
+        cached_proof('a', 'b', equation(1, 2), self.prove)
+        self.assertEqual(
+            cached_proof('c', 'd', equation(1, 2), self.prove), b'proof2')
+
+    def test_opted_out_agreement_is_always_proven(self):
+        cached_proof('opt', 'ed', equation(1, 2), self.prove)
+        cached_proof('opt', 'ed', equation(1, 2), self.prove)
+        self.assertEqual(len(self.proofs), 2)
+
+
+class TestProofCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_get_returns_stored_proof(self):
+        cache = ProofCache(60, 10, self.clock)
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', b'proof')
+        self.assertEqual(cache.get('key'), b'proof')
+        self.assertEqual(
+            cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_entries_expire(self):
+        cache = ProofCache(60, 10, self.clock)
+        cache.put('key', b'proof')
+        self.clock.now = 59.9
+        self.assertEqual(cache.get('key'), b'proof')
+        self.clock.now = 60.0
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ProofCache(60, 2, self.clock)
+        cache.put('first', b'1')
+        cache.put('second', b'2')
+        cache.get('first')
+        cache.put('third', b'3')
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.get('first'), b'1')
+        self.assertEqual(cache.get('third'), b'3')
+
+    def test_put_refreshes_expiry(self):
+        cache = ProofCache(60, 10, self.clock)
+        cache.put('key', b'old')
+        self.clock.now = 50
+        cache.put('key', b'new')
+        self.clock.now = 100
+        self.assertEqual(cache.get('key'), b'new')
+
+    def test_size_zero_stores_nothing(self):
+        cache = ProofCache(60, 0, self.clock)
+        cache.put('key', b'proof')
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['size'], 0)
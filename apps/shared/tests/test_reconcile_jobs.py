@@ -0,0 +1,107 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import threading
+import unittest
+from unittest import mock
+
+from shared.reconcile_jobs import ReconcileJobs, RUNNING, DONE, FAILED
+
+from modules.exceptions import AuthException, DataException, RestException
+
+RESULT = {'rows': 2, 'violation_count': 0, 'violations': [],
+          'positions': []}
+
+
+def known_secret(agreement):
+    if agreement != 'agreement':
+        raise AuthException('unknown agreement')
+    return b'secret'
+
+
+class TestReconcileJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.finished = threading.Event()
+        self.outcome = RESULT
+        self.runs = []
+        secret = mock.patch(
+            'shared.reconcile_jobs.agreement_secret',
+            side_effect=known_secret)
+        secret.start()
+        self.addCleanup(secret.stop)
+        self.jobs = ReconcileJobs(self._run)
+        self.jobs._reconcile = self._wrap(self.jobs._reconcile)
+
+    def _run(self, agreement):
+        self.runs.append(agreement)
+        self.release.wait(5)
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+    def _wrap(self, reconcile):
+        def wrapped(*args):
+            reconcile(*args)
+            self.finished.set()
+        return wrapped
+
+    def _finish(self):
+        self.release.set()
+        self.assertTrue(self.finished.wait(5))
+        self.finished.clear()
+
+    def test_result_once_done(self):
+        job = self.jobs.submit('agreement')
+        self.assertEqual(job['status'], RUNNING)
+        self.assertEqual(self.jobs.status('agreement')['status'], RUNNING)
+        self._finish()
+        job = self.jobs.status('agreement')
+        self.assertEqual(job['status'], DONE)
+        self.assertEqual(job['result'], RESULT)
+        self.assertIn('finished', job)
+
+    def test_one_run_per_agreement(self):
+        first = self.jobs.submit('agreement')
+        self.assertEqual(self.jobs.submit('agreement'), first)
+        self._finish()
+        self.assertEqual(self.runs, ['agreement'])
+        self.jobs.submit('agreement')
+        self._finish()
+        self.assertEqual(self.runs, ['agreement', 'agreement'])
+
+    def test_failure_is_reported(self):
+        self.outcome = RestException('validator unavailable')
+        self.jobs.submit('agreement')
+        with self.assertLogs('shared.reconcile_jobs', 'ERROR'):
+            self._finish()
+        job = self.jobs.status('agreement')
+        self.assertEqual(job['status'], FAILED)
+        self.assertEqual(
+            job['error'], 'RestException: validator unavailable')
+        self.assertNotIn('result', job)
+
+    def test_unknown_agreement(self):
+        with self.assertRaises(AuthException):
+            self.jobs.submit('other')
+        with self.assertRaises(AuthException):
+            self.jobs.status('other')
+        self.assertEqual(self.runs, [])
+
+    def test_nothing_submitted(self):
+        with self.assertRaises(DataException):
+            self.jobs.status('agreement')
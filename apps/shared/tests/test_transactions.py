@@ -0,0 +1,111 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from unittest import mock
+
+from shared.transactions import create_bulk, submit_bulk
+
+from modules.exceptions import DataException, RestException
+
+FAILURES = (DataException, ValueError)
+
+
+def validate(request):
+    """Ingest is the request, the result field its name"""
+    if request.startswith('bad'):
+        raise DataException('{} is invalid'.format(request))
+    if request.startswith('nan'):
+        int(request)
+    return (request, {'name': request})
+
+
+def build(ingest):
+    return ('signer', ingest)
+
+
+class TestCreateBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.posted = []
+        self.failing = set()
+        batch = mock.patch(
+            'shared.transactions.create_batch',
+            side_effect=lambda payload: mock.Mock(
+                header_signature='batch-' + payload[1][0]))
+        batch.start()
+        self.addCleanup(batch.stop)
+        submit = mock.patch(
+            'shared.transactions.submit_batch', side_effect=self._submit)
+        submit.start()
+        self.addCleanup(submit.stop)
+        size = mock.patch(
+            'shared.transactions.bulk_submit_size', return_value=2)
+        size.start()
+        self.addCleanup(size.stop)
+
+    def _submit(self, batches):
+        ids = [batch.header_signature for batch in batches]
+        self.posted.append(ids)
+        if self.failing.intersection(ids):
+            raise RestException('validator unavailable')
+
+    def test_results_are_in_request_order(self):
+        results = create_bulk(
+            ['a', 'bad1', 'b', 'nan', 'c'], validate, build, FAILURES)
+        self.assertEqual(results, [
+            {'status': 'OK', 'name': 'a', 'batch_id': 'batch-a'},
+            {'status': 'error', 'DataException': 'bad1 is invalid'},
+            {'status': 'OK', 'name': 'b', 'batch_id': 'batch-b'},
+            {'status': 'error',
+             'ValueError':
+                "invalid literal for int() with base 10: 'nan'"},
+            {'status': 'OK', 'name': 'c', 'batch_id': 'batch-c'}])
+
+    def test_batches_are_posted_in_chunks(self):
+        create_bulk(['a', 'b', 'bad', 'c', 'd', 'e'], validate, build,
+                    FAILURES)
+        self.assertEqual(self.posted, [
+            ['batch-a', 'batch-b'], ['batch-c', 'batch-d'], ['batch-e']])
+
+    def test_failed_post_fails_its_chunk_only(self):
+        self.failing.add('batch-c')
+        results = create_bulk(
+            ['a', 'b', 'c', 'd', 'e'], validate, build, FAILURES)
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['OK', 'OK', 'error', 'error', 'OK'])
+        self.assertEqual(
+            results[2], {'status': 'error',
+                         'RestException': 'validator unavailable'})
+
+    def test_other_exceptions_propagate(self):
+        with self.assertRaises(AttributeError):
+            create_bulk([None], validate, build, FAILURES)
+
+    def test_nothing_to_submit(self):
+        self.assertEqual(create_bulk([], validate, build, FAILURES), [])
+        self.assertEqual(
+            [result['status'] for result in create_bulk(
+                ['bad'], validate, build, FAILURES)],
+            ['error'])
+        self.assertEqual(self.posted, [])
+
+    def test_submit_bulk_sizes(self):
+        transactions = [('signer', name) for name in 'abc']
+        self.assertEqual(
+            submit_bulk(transactions, 3), ['batch-a', 'batch-b', 'batch-c'])
+        self.assertEqual(self.posted, [['batch-a', 'batch-b', 'batch-c']])
@@ -28,7 +28,9 @@ from sawtooth_sdk.protobuf.batch_pb2 import Batch
 from sawtooth_sdk.protobuf.batch_pb2 import BatchList
 
 from shared.rest_client import RestClient
-from modules.config import sawtooth_rest_host, valid_submitter, valid_signer
+from modules.config import (
+    sawtooth_rest_host, valid_submitter, valid_signer, bulk_submit_size)
+from modules.exceptions import RestException
 
 
 def compose_builder(*functions):
@@ -47,7 +49,8 @@ def create_transaction(ingest):
         nonce=str(datetime.datetime.utcnow().timestamp()),
         signer_public_key=signer,
         family_name=address.family_ns_name,
-        family_version=address.family_current_version,
+        family_version=permissions.get(
+            'family_version', address.family_current_version),
         inputs=permissions.get('inputs', []),
         outputs=permissions.get('outputs', []),
         dependencies=permissions.get('dependencies', []),
@@ -104,3 +107,52 @@ def submit_single_txn(ingest):
     """Wraps transaction for batch creation. Submits"""
     signatore, transaction = ingest
     return submit_batch([create_batch((signatore, [transaction]))])
+
+
+def submit_bulk(transactions, size):
+    """Submits (signatore, transaction) pairs, one batch each
+
+    A batch is atomic, so each transaction gets its own and succeeds or
+    fails on its own. Batches are posted size at a time. Returns the
+    batch id, or the RestException of its request, of each transaction
+    """
+    results = []
+    for start in range(0, len(transactions), size):
+        batches = [
+            create_batch((signatore, [transaction]))
+            for signatore, transaction in transactions[start:start + size]]
+        try:
+            submit_batch(batches)
+            results.extend(batch.header_signature for batch in batches)
+        except RestException as e:
+            results.extend(e for _ in batches)
+    return results
+
+
+def create_bulk(requests, validate, build, failures):
+    """Validates, builds and submits a transaction for each request
+
+    validate(request) returns the ingest of build and the item's result
+    fields, build(ingest) returns (signatore, transaction). An exception
+    in failures is reported for its item and the others carry on.
+    Returns one result per request, in order
+    """
+    results = []
+    transactions = []
+    for index, request in enumerate(requests):
+        try:
+            ingest, fields = validate(request)
+            transactions.append((index, build(ingest)))
+        except failures as e:
+            results.append({"status": "error", type(e).__name__: str(e)})
+            continue
+        results.append(dict(fields, status="OK"))
+    submitted = submit_bulk(
+        [transaction for _, transaction in transactions], bulk_submit_size())
+    for (index, _), batch_id in zip(transactions, submitted):
+        if isinstance(batch_id, RestException):
+            results[index] = {
+                "status": "error", "RestException": str(batch_id)}
+        else:
+            results[index]["batch_id"] = batch_id
+    return results
@@ -17,9 +17,11 @@
 import collections
 import logging
 import os
+import sys
 
 import toml
 
+from sawtooth_sdk.processor.config import get_config_dir
 from sawtooth_sdk.processor.exceptions import LocalConfigurationError
 
 LOGGER = logging.getLogger(__name__)
@@ -30,10 +32,50 @@ def load_default_exchange_config():
     Returns the default UnitConfig
     """
     return ExchangeConfig(
-        connect='tcp://localhost:4004'
+        connect='tcp://localhost:4004',
+        verify_cache=None,
+        verify_cache_size=100000
     )
 
 
+def get_data_dir():
+    """Returns the validator data directory, resolved as sawtooth does"""
+    conf_file = os.path.join(get_config_dir(), 'path.toml')
+    if os.path.exists(conf_file):
+        with open(conf_file) as fd:
+            toml_config = toml.loads(fd.read())
+        if 'data_dir' in toml_config:
+            return toml_config['data_dir']
+    if 'SAWTOOTH_HOME' in os.environ:
+        return os.path.join(os.environ['SAWTOOTH_HOME'], 'data')
+    if os.name == 'nt':
+        base_dir = \
+            os.path.dirname(os.path.dirname(os.path.abspath(sys.argv[0])))
+        return os.path.join(base_dir, 'data')
+    return '/var/lib/sawtooth'
+
+
+def verify_cache_path(config, data_dir=None):
+    """Returns the verification cache file or None when it is off
+
+    A cache hit stands in for the pairing check, so the file must live
+    in the validator's own data directory and not in a shared location.
+    A relative name is taken relative to that directory.
+
+    Raises:
+        LocalConfigurationError
+    """
+    if not config.verify_cache:
+        return None
+    data_dir = os.path.realpath(data_dir or get_data_dir())
+    path = os.path.realpath(os.path.join(data_dir, config.verify_cache))
+    if os.path.commonpath([data_dir, path]) != data_dir or path == data_dir:
+        raise LocalConfigurationError(
+            "Verification cache {} is not in the data directory {}".format(
+                config.verify_cache, data_dir))
+    return path
+
+
 def load_toml_exchange_config(filename):
     """Returns a UnitConfig created by loading a TOML file from the
     filesystem.
@@ -67,14 +109,16 @@ def load_toml_exchange_config(filename):
 
     toml_config = toml.loads(raw_config)
     invalid_keys = set(toml_config.keys()).difference(
-        ['connect'])
+        ['connect', 'verify_cache', 'verify_cache_size'])
     if invalid_keys:
         raise LocalConfigurationError(
             "Invalid keys in transaction processor config: "
             "{}".format(", ".join(sorted(list(invalid_keys)))))
 
     config = ExchangeConfig(
-        connect=toml_config.get("connect", None)
+        connect=toml_config.get("connect", None),
+        verify_cache=toml_config.get("verify_cache", None),
+        verify_cache_size=toml_config.get("verify_cache_size", None)
     )
 
     return config
@@ -95,33 +139,57 @@ def merge_exchange_config(configs):
             passed in configs.
     """
     connect = None
+    verify_cache = None
+    verify_cache_size = None
 
     for config in reversed(configs):
         if config.connect is not None:
             connect = config.connect
+        if config.verify_cache is not None:
+            verify_cache = config.verify_cache
+        if config.verify_cache_size is not None:
+            verify_cache_size = config.verify_cache_size
 
-    return ExchangeConfig(connect=connect)
+    return ExchangeConfig(
+        connect=connect,
+        verify_cache=verify_cache,
+        verify_cache_size=verify_cache_size)
 
 
 class ExchangeConfig:
-    def __init__(self, connect=None):
+    def __init__(self, connect=None, verify_cache=None,
+                 verify_cache_size=None):
         self._connect = connect
+        self._verify_cache = verify_cache
+        self._verify_cache_size = verify_cache_size
 
     @property
     def connect(self):
         return self._connect
 
+    @property
+    def verify_cache(self):
+        return self._verify_cache
+
+    @property
+    def verify_cache_size(self):
+        return self._verify_cache_size
+
     def __repr__(self):
         # not including  password for opentsdb
         return \
-            "{}(connect={})".format(
+            "{}(connect={}, verify_cache={}, verify_cache_size={})".format(
                 self.__class__.__name__,
                 repr(self._connect),
+                repr(self._verify_cache),
+                repr(self._verify_cache_size),
             )
 
     def to_dict(self):
         return collections.OrderedDict([
             ('connect', self._connect),
+            ('verify_cache', self._verify_cache),
+            ('verify_cache_size', self._verify_cache_size),
         ])
 
     def to_toml_string(self):
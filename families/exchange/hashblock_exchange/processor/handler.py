@@ -19,24 +19,27 @@ import logging
 from sawtooth_sdk.processor.handler import TransactionHandler
 
 from modules.address import Address
-from modules.config import load_hashblock_config
 
 from processor.services import Service
 
 
 LOGGER = logging.getLogger(__name__)
-load_hashblock_config()
 
 
 class ExchangeTransactionHandler(TransactionHandler):
 
-    def __init__(self):
+    def __init__(self, verify_cache=None):
         self._addresser = Address.exchange_utxq_addresser()
+        self._verify_cache = verify_cache
 
     @property
     def addresser(self):
         return self._addresser
 
+    @property
+    def verify_cache(self):
+        return self._verify_cache
+
     @property
     def family_name(self):
         return self.addresser.family_ns_name
@@ -54,4 +57,5 @@ class ExchangeTransactionHandler(TransactionHandler):
         Service.factory(
             self.addresser,
             transaction,
-            context).apply()
+            context,
+            self.verify_cache).apply()
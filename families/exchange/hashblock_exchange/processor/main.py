@@ -17,6 +17,7 @@
 import argparse
 import logging
 import os
+import sqlite3
 import sys
 import pkg_resources
 
@@ -30,6 +31,8 @@ from sawtooth_sdk.processor.log import log_configuration
 from sawtooth_sdk.processor.config import get_log_config
 from sawtooth_sdk.processor.config import get_log_dir
 from sawtooth_sdk.processor.config import get_config_dir
+from sawtooth_sdk.processor.exceptions import LocalConfigurationError
+from modules.verify_cache import VerifyCache
 from processor.handler import ExchangeTransactionHandler
 from processor.config.exchange import ExchangeConfig
 from processor.config.exchange import \
@@ -38,6 +41,8 @@ from processor.config.exchange import \
     load_toml_exchange_config
 from processor.config.exchange import \
     merge_exchange_config
+from processor.config.exchange import \
+    verify_cache_path
 
 DISTRIBUTION_NAME = 'hashblock-exchange'
 
@@ -102,6 +107,17 @@ def create_parser(prog_name):
         help='specify the endpoint for the validator connection (default: '
              'tcp://localhost:4004) ')
 
+    parser.add_argument(
+        '--verify-cache',
+        help='enable the zksnark verification cache in this file, '
+             'relative to the validator data directory (default: off)')
+
+    parser.add_argument(
+        '--verify-cache-size',
+        type=int,
+        help='maximum verification cache entries, 0 disables '
+             '(default: 100000)')
+
     parser.add_argument(
         '-v', '--verbose',
         action='count',
@@ -135,7 +151,19 @@ def load_settings_config(first_config):
 
 
 def create_settings_config(args):
-    return ExchangeConfig(connect=args.connect)
+    return ExchangeConfig(
+        connect=args.connect,
+        verify_cache=args.verify_cache,
+        verify_cache_size=args.verify_cache_size)
+
+
+def create_verify_cache(exchange_config):
+    path = verify_cache_path(exchange_config)
+    try:
+        return VerifyCache(path, exchange_config.verify_cache_size)
+    except sqlite3.Error as e:
+        raise LocalConfigurationError(
+            "Unable to open verification cache {}: {}".format(path, e))
 
 
 def main(prog_name=os.path.basename(sys.argv[0]), args=None,
@@ -147,6 +175,11 @@ def main(prog_name=os.path.basename(sys.argv[0]), args=None,
 
     arg_config = create_settings_config(args)
     exchange_config = load_settings_config(arg_config)
+    try:
+        verify_cache = create_verify_cache(exchange_config)
+    except LocalConfigurationError as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        sys.exit(1)
     processor = TransactionProcessor(url=exchange_config.connect)
 
     if with_loggers is True:
@@ -158,7 +191,7 @@ def main(prog_name=os.path.basename(sys.argv[0]), args=None,
 
     my_logger = logging.getLogger(__name__)
     my_logger.debug("Processor loaded")
-    handler = ExchangeTransactionHandler()
+    handler = ExchangeTransactionHandler(verify_cache)
     processor.add_handler(handler)
     my_logger.debug("Handler instantiated, starting processor thread...")
 
@@ -14,31 +14,44 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
-import os
 import logging
 from abc import ABC, abstractmethod
 
 from sawtooth_sdk.processor.exceptions import InvalidTransaction
 
+from modules.address import Address
+from modules.config import keys_path
 from modules.state import State, StateDataNotFound
-from modules.hashblock_zksnark import zksnark_verify
+from modules.hashblock_zksnark import (
+    zksnark_verify, zksnark_verify_compact, compact_header,
+    SCHEME_PPZKSNARK, SCHEME_GG_PPZKSNARK, BATCH_SIZES)
 
 from protobuf.exchange_pb2 import (ExchangePayload)
 
 
 LOGGER = logging.getLogger(__name__)
-KEYS_PATH = os.environ['HASHBLOCK_KEYS'] + '/'
+
+UTXQ_ADDRESSER = Address.exchange_utxq_addresser()
+MTXQ_ADDRESSER = Address.exchange_mtxq_addresser()
+
+PAYLOAD_SCHEMES = {
+    ExchangePayload.PPZKSNARK: SCHEME_PPZKSNARK,
+    ExchangePayload.GG_PPZKSNARK: SCHEME_GG_PPZKSNARK}
 
 
 class Service(ABC):
 
     @classmethod
-    def factory(cls, addresser, txn, context):
+    def factory(cls, addresser, txn, context, verify_cache=None):
         key = txn.header.family_version
         if key not in addresser.family_versions:
             raise InvalidTransaction("Unhandled version {}".format(key))
+        elif key == addresser.TOMBSTONE_VERSION:
+            handler = V050apply(txn, State(context), verify_cache)
+        elif key == addresser.AGREEMENT_VERSION:
+            handler = V040apply(txn, State(context), verify_cache)
         else:
-            handler = V020apply(txn, State(context))
+            handler = V020apply(txn, State(context), verify_cache)
         return handler
 
     @abstractmethod
@@ -53,6 +66,10 @@ class Service(ABC):
     def reciprocate(self):
         pass
 
+    @abstractmethod
+    def reciprocate_batch(self):
+        pass
+
     @property
     @abstractmethod
     def state(self):
@@ -70,9 +87,10 @@ class Service(ABC):
 
 
 class BaseService(Service):
-    def __init__(self, txn, state):
+    def __init__(self, txn, state, verify_cache=None):
         self._txn = txn
         self._state = state
+        self._verify_cache = verify_cache
         self._payload = ExchangePayload()
         self._payload.ParseFromString(txn.payload)
 
@@ -88,21 +106,85 @@ class BaseService(Service):
     def payload(self):
         return self._payload
 
-    def process(self, initiateFn, reciprocateFn):
+    def verify(self, batch_size=0):
+        """Verify the payload proof, using the shared cache when configured
+
+        The compact envelope is used when present, otherwise the text
+        'proof' and 'pairings' of earlier transactions
+        """
+        if self.payload.scheme not in PAYLOAD_SCHEMES:
+            raise InvalidTransaction(
+                "Unhandled proof scheme {}".format(self.payload.scheme))
+        scheme = PAYLOAD_SCHEMES[self.payload.scheme]
+        compact = self.payload.compact_proof
+        if compact:
+            try:
+                scheme_id, compact_batch, _, _ = compact_header(compact)
+            except ValueError as e:
+                raise InvalidTransaction(str(e))
+            if scheme_id != self.payload.scheme or \
+                    compact_batch != batch_size:
+                raise InvalidTransaction(
+                    "Compact proof does not match payload scheme or batch")
+            if self._verify_cache:
+                return self._verify_cache.verify_compact(
+                    keys_path(), compact, scheme)
+            return zksnark_verify_compact(keys_path(), compact, scheme)
+        proof_str = self.payload.proof.decode()
+        pairing_str = self.payload.pairings.decode()
+        if self._verify_cache:
+            return self._verify_cache.verify(
+                keys_path(), proof_str, pairing_str, scheme, batch_size)
+        return zksnark_verify(
+            keys_path(), proof_str, pairing_str, scheme, batch_size)
+
+    def check_batch(self):
+        """Checks the batch size, the match count and that no address
+        is used twice. Returns the matches and the batch size"""
+        matches = self.payload.matches
+        batch_size = self.payload.batch_size
+        if batch_size not in BATCH_SIZES:
+            raise InvalidTransaction(
+                "Batch size must be one of: {}".format(BATCH_SIZES))
+        if not matches or len(matches) > batch_size:
+            raise InvalidTransaction(
+                "Batch requires 1 to {} matches".format(batch_size))
+        ukeys = [match.ukey for match in matches]
+        mkeys = [match.mkey for match in matches]
+        if len(set(ukeys + mkeys)) != len(ukeys) + len(mkeys):
+            raise InvalidTransaction("Batch addresses must be unique")
+        return (matches, batch_size)
+
+    def process(self, initiateFn, reciprocateFn, batchFn):
         if self.payload.type == ExchangePayload.UTXQ:
             initiateFn()
         elif self.payload.type == ExchangePayload.MTXQ:
             reciprocateFn()
+        elif self.payload.type == ExchangePayload.MTXQ_BATCH:
+            batchFn()
         else:
             raise InvalidTransaction(
-                "Payload 'type' must be one of: {} or {}".
-                format([ExchangePayload.UTXQ, ExchangePayload.MTXQ]))
+                "Payload 'type' must be one of: {}".
+                format([
+                    ExchangePayload.UTXQ,
+                    ExchangePayload.MTXQ,
+                    ExchangePayload.MTXQ_BATCH]))
 
 
 class V020apply(BaseService):
 
-    def __init__(self, txn, state):
-        super().__init__(txn, state)
+    def __init__(self, txn, state, verify_cache=None):
+        super().__init__(txn, state, verify_cache)
+
+    def verify(self, batch_size=0):
+        """Version 0.3.0 verifies the text 'proof' and 'pairings' with
+        ppzksnark and accepts on the verifier exit status. Payload
+        schemes and compact proofs are 0.4.0 fields and are ignored"""
+        return zksnark_verify(
+            keys_path(),
+            self.payload.proof.decode(),
+            self.payload.pairings.decode(),
+            strict=False)
 
     def initiate(self):
         """Version 0.2.0 works with enrypted data blobs"""
@@ -118,10 +200,7 @@ class V020apply(BaseService):
         except StateDataNotFound:
             pass
 
-        vres = zksnark_verify(
-            KEYS_PATH,
-            self.payload.proof.decode(),
-            self.payload.pairings.decode())
+        vres = self.verify()
         if vres:
             LOGGER.info("UTXQ and MTXQ Balance!")
             self.state.set(self.payload.udata, self.payload.ukey)
@@ -130,5 +209,132 @@ class V020apply(BaseService):
             raise InvalidTransaction(
                 "Invalid zksnark exchange with reciprocating")
 
+    def reciprocate_batch(self):
+        """Batches were added in version 0.4.0"""
+        raise InvalidTransaction(
+            "Payload 'type' {} requires family version {}".format(
+                ExchangePayload.MTXQ_BATCH,
+                UTXQ_ADDRESSER.AGREEMENT_VERSION))
+
     def apply(self):
-        self.process(self.initiate, self.reciprocate)
+        self.process(
+            self.initiate, self.reciprocate, self.reciprocate_batch)
+
+
+class V040apply(V020apply):
+    """Version 0.4.0 exchanges are addressed within their agreement's
+    partition, see ExchangeAddress for the layout."""
+
+    def __init__(self, txn, state, verify_cache=None):
+        super().__init__(txn, state, verify_cache)
+
+    def verify(self, batch_size=0):
+        """Version 0.4.0 accepts a proof only when it verifies"""
+        return BaseService.verify(self, batch_size)
+
+    @staticmethod
+    def check_utxq(ukey, matched):
+        if not Address.valid_leaf_address(ukey) \
+                or not ukey.startswith(
+                    UTXQ_ADDRESSER.agreement_mtype_address) \
+                or UTXQ_ADDRESSER.is_matched(ukey) != matched:
+            raise InvalidTransaction(
+                "UTXQ address {} is not a {} 0.4.0 address".format(
+                    ukey, "matched" if matched else "unmatched"))
+
+    @classmethod
+    def check_match(cls, ukey, mkey):
+        cls.check_utxq(ukey, True)
+        if not Address.valid_leaf_address(mkey) \
+                or not mkey.startswith(
+                    MTXQ_ADDRESSER.agreement_mtype_address) \
+                or MTXQ_ADDRESSER.agreement_segment(mkey) != \
+                UTXQ_ADDRESSER.agreement_segment(ukey):
+            raise InvalidTransaction(
+                "MTXQ address {} is not in the agreement of {}".format(
+                    mkey, ukey))
+
+    def initiate(self):
+        self.check_utxq(self.payload.ukey, False)
+        super().initiate()
+
+    def reciprocate(self):
+        self.check_match(self.payload.ukey, self.payload.mkey)
+        super().reciprocate()
+
+    def reciprocate_batch(self):
+        """Many matches proven by one proof, all are written together
+        or none are."""
+        matches, batch_size = self.check_batch()
+        for match in matches:
+            self.check_match(match.ukey, match.mkey)
+        exchanged = self.state.get_state_list(
+            [match.ukey for match in matches])
+        if exchanged:
+            raise InvalidTransaction(
+                "UTXQ {} already exchangeed".format(
+                    [entry.address for entry in exchanged]))
+
+        if self.verify(batch_size):
+            LOGGER.info("{} UTXQ and MTXQ Balance!".format(len(matches)))
+            entries = {}
+            for match in matches:
+                entries[match.ukey] = match.udata
+                entries[match.mkey] = match.mdata
+            self.state.set_all(entries)
+        else:
+            raise InvalidTransaction(
+                "Invalid zksnark exchange batch with reciprocating")
+
+
+class V050apply(V040apply):
+    """Version 0.5.0 marks a matched UTXQ with a tombstone referencing
+    the MTXQ, the UTXQ itself stays at its unmatched address."""
+
+    def __init__(self, txn, state, verify_cache=None):
+        super().__init__(txn, state, verify_cache)
+
+    def check_unmatched(self, ukeys):
+        """The matched UTXQs must not exist, their originals must"""
+        exchanged = self.state.get_state_list(ukeys)
+        if exchanged:
+            raise InvalidTransaction(
+                "UTXQ {} already exchangeed".format(
+                    [entry.address for entry in exchanged]))
+        originals = [MTXQ_ADDRESSER.set_utxq_unmatched(u) for u in ukeys]
+        found = set(
+            entry.address for entry in self.state.get_state_list(originals))
+        missing = [u for u in originals if u not in found]
+        if missing:
+            raise InvalidTransaction(
+                "UTXQ {} does not exist".format(missing))
+
+    def reciprocate(self):
+        self.check_match(self.payload.ukey, self.payload.mkey)
+        self.check_unmatched([self.payload.ukey])
+        if self.verify():
+            LOGGER.info("UTXQ and MTXQ Balance!")
+            self.state.set_all({
+                self.payload.ukey: MTXQ_ADDRESSER.tombstone(
+                    self.payload.mkey),
+                self.payload.mkey: self.payload.mdata})
+        else:
+            raise InvalidTransaction(
+                "Invalid zksnark exchange with reciprocating")
+
+    def reciprocate_batch(self):
+        matches, batch_size = self.check_batch()
+        for match in matches:
+            self.check_match(match.ukey, match.mkey)
+        self.check_unmatched([match.ukey for match in matches])
+
+        if self.verify(batch_size):
+            LOGGER.info("{} UTXQ and MTXQ Balance!".format(len(matches)))
+            entries = {}
+            for match in matches:
+                entries[match.ukey] = MTXQ_ADDRESSER.tombstone(match.mkey)
+                entries[match.mkey] = match.mdata
+            self.state.set_all(entries)
+        else:
+            raise InvalidTransaction(
+                "Invalid zksnark exchange batch with reciprocating")
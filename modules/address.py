@@ -290,12 +290,52 @@ class AssetAddress(VotingAddress):
 
 
 class ExchangeAddress(BaseAddress):
-    """MatchAddress is base for UTXQ/MTXQ address support"""
+    """MatchAddress is base for UTXQ/MTXQ address support
+
+    Version 0.3.0 layout
+    0-11  namespace and family
+    12-17 mtype
+    18-20 duality namespace
+    21-23 verb
+    24    matched
+    25-69 ident
+
+    Version 0.4.0 layout, partitioned by agreement
+    0-11  namespace and family
+    12-17 agreement mtype ('utxq.agreement' or 'mtxq.agreement')
+    18-25 agreement, hash of the sorted partner public keys
+    26-28 duality namespace
+    29-31 verb
+    32    matched
+    33-69 ident
+
+    Version 0.5.0 uses the 0.4.0 layout. Matching writes a tombstone,
+    TOMBSTONE_MAGIC and the 35 bytes of the MTXQ address, to the matched
+    UTXQ address instead of a copy of the UTXQ. The UTXQ stays at its
+    unmatched address.
+    """
+    LEGACY_VERSION = "0.3.0"
+    AGREEMENT_VERSION = "0.4.0"
+    TOMBSTONE_VERSION = "0.5.0"
+    TOMBSTONE_MAGIC = b'HBT\x01'
+
+    _agreement_mtypes = frozenset(
+        hashlib.sha512(
+            (mtype + '.agreement').encode("utf-8")).hexdigest()[0:6]
+        for mtype in (Address.MATCH_TYPE_UTXQ, Address.MATCH_TYPE_MTXQ))
+
     def __init__(self, mtype):
-        super().__init__(self.FAMILY_EXCHANGE, ["0.3.0"])
+        super().__init__(
+            self.FAMILY_EXCHANGE,
+            [
+                self.TOMBSTONE_VERSION,
+                self.AGREEMENT_VERSION,
+                self.LEGACY_VERSION])
         self._mtype = mtype
         self._mtype_address = self.family_ns_hash + \
             self.hashup(mtype)[0:6]
+        self._agreement_mtype_address = self.family_ns_hash + \
+            self.hashup(mtype + '.agreement')[0:6]
 
     @property
     def mtype(self):
@@ -305,26 +345,83 @@ class ExchangeAddress(BaseAddress):
     def mtype_address(self):
         return self._mtype_address
 
+    @property
+    def agreement_mtype_address(self):
+        return self._agreement_mtype_address
+
+    @property
+    def mtype_addresses(self):
+        """Prefixes of both layouts, agreement partitioned first"""
+        return [self.agreement_mtype_address, self.mtype_address]
+
     def is_mtype_prefix(self, address):
-        return address[0:18] == self.mtype_address
+        return address[0:18] in self.mtype_addresses
+
+    @classmethod
+    def agreement_hash(cls, plus, minus):
+        """Address segment of the partners' public keys"""
+        return cls.hashup(''.join(sorted([plus, minus])))[0:8]
+
+    @classmethod
+    def is_agreement_layout(cls, address):
+        return address[12:18] in cls._agreement_mtypes
+
+    @classmethod
+    def agreement_segment(cls, address):
+        """The agreement hash of a 0.4.0 address, None for 0.3.0"""
+        return address[18:26] if cls.is_agreement_layout(address) else None
+
+    @classmethod
+    def layout_version(cls, address):
+        """Family version that writes the layout of address"""
+        return cls.TOMBSTONE_VERSION if cls.is_agreement_layout(address) \
+            else cls.LEGACY_VERSION
+
+    @classmethod
+    def tombstone(cls, mkey):
+        """Matched UTXQ marker referencing the MTXQ at mkey"""
+        return cls.TOMBSTONE_MAGIC + bytes.fromhex(mkey)
+
+    @classmethod
+    def is_tombstone(cls, data):
+        return data[0:4] == cls.TOMBSTONE_MAGIC
+
+    @classmethod
+    def tombstone_mtxq(cls, data):
+        """The MTXQ address a tombstone references"""
+        return data[4:].hex()
 
-    def ns_operation_address(self, ns_operation):
-        return self.mtype_address \
+    @classmethod
+    def matched_index(cls, address):
+        return 32 if cls.is_agreement_layout(address) else 24
+
+    def agreement_address(self, agreement_hash):
+        return self.agreement_mtype_address + agreement_hash
+
+    def ns_operation_address(self, ns_operation, agreement_hash=None):
+        prefix = self.mtype_address if agreement_hash is None \
+            else self.agreement_address(agreement_hash)
+        return prefix \
             + self.hashup(ns_operation[0])[0:3] \
             + self.hashup(ns_operation[1])[0:3]
 
+    def exchange_address(self, ns_operation, ident, agreement_hash=None):
+        prefix = self.ns_operation_address(
+            ns_operation, agreement_hash) + '0'
+        return prefix + self.hashup(ident)[0:70 - len(prefix)]
+
 
 class ExchangeUTXQAddress(ExchangeAddress):
     """ExchangeUTXQAddress is concrete for UTXQ address support"""
     def __init__(self):
         super().__init__(self.MATCH_TYPE_UTXQ)
 
-    def utxq_unmatched(self, ns_operation, ident):
-        return self.ns_operation_address(ns_operation) \
-            + '0' + self.hashup(ident)[0:45]
+    def utxq_unmatched(self, ns_operation, ident, agreement_hash=None):
+        return self.exchange_address(ns_operation, ident, agreement_hash)
 
     def is_matched(self, address):
-        return True if address[24] == '1' else False
+        return True if address[self.matched_index(address)] == '1' \
+            else False
 
 
 class ExchangeMTXQAddress(ExchangeAddress):
@@ -332,11 +429,15 @@ class ExchangeMTXQAddress(ExchangeAddress):
     def __init__(self):
         super().__init__(self.MATCH_TYPE_MTXQ)
 
-    def mtxq_address(self, ns_operation, ident):
-        return self.ns_operation_address(ns_operation) \
-            + '0' + self.hashup(ident)[0:45]
+    def mtxq_address(self, ns_operation, ident, agreement_hash=None):
+        return self.exchange_address(ns_operation, ident, agreement_hash)
 
     def set_utxq_matched(self, address):
         laddr = list(address)
-        laddr[24] = '1'
+        laddr[self.matched_index(address)] = '1'
+        return ''.join(laddr)
+
+    def set_utxq_unmatched(self, address):
+        laddr = list(address)
+        laddr[self.matched_index(address)] = '0'
         return ''.join(laddr)
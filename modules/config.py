@@ -21,6 +21,7 @@ from yaml import load
 from modules.state import State
 from modules.dualities import Duality
 from modules.exceptions import CliException, AuthException
+from modules.hashblock_zksnark import SCHEMES, SCHEME_PPZKSNARK
 from sawtooth_signing import create_context
 from sawtooth_signing import CryptoFactory
 from sawtooth_signing import ParseError
@@ -38,9 +39,29 @@ DEFAULT_CFGR_PATH = '/project/configs'
 CFGR_FILE = 'hashblock_config.yaml'
 UNKNOWN_OWNER = '__unknown_key_owner_value__'
 UNKNOWN_AGREEMENT = '__unknown_agreement__'
+DEFAULT_ORDER_BOOK_REFRESH = 5
+DEFAULT_BULK_SUBMIT_SIZE = 100
+DEFAULT_BULK_MAX_ITEMS = 200
+DEFAULT_MATCHED_SET = {
+    'bloom': False,
+    'capacity': 100000,
+    'error_rate': 0.01,
+    'refresh': 5}
+DEFAULT_DECODE_PIPELINE = {
+    'min_entries': 5000,
+    'chunk_size': 1000,
+    'workers': 0}
+DEFAULT_PROOF_CACHE = {
+    'enabled': False,
+    'ttl': 300,
+    'size': 1000,
+    'opt_out': []}
 
 
 def keys_path():
+    """Returns the keys directory, resolving it on first use"""
+    if not KEYS_PATH:
+        load_keys_path()
     return KEYS_PATH
 
 
@@ -106,22 +127,51 @@ def valid_partnership(part1, part2):
     return result
 
 
+def __agreement_secret(agreement):
+    """The agreement secret, State.get_secret keeps recently used ones"""
+    return State.get_secret(
+        REST_CONFIG['rest']['private_keys'][agreement[0]],
+        REST_CONFIG['rest']['public_keys'][agreement[1]])
+
+
 def partnership_secret(part1, part2):
     result = None
     for key, value in REST_CONFIG['rest']['partners'].items():
         if part1 in value and part2 in value:
-            result = value[2]
+            result = __agreement_secret(value)
             break
     if not result:
         raise AuthException
     return result
 
 
+def partnership_agreement(part1, part2):
+    """Returns the name of the agreement between two partners"""
+    for key, value in REST_CONFIG['rest']['partners'].items():
+        if part1 in value and part2 in value:
+            return key
+    raise AuthException
+
+
+def agreement_names():
+    """Returns the names of all configured agreements"""
+    return list(REST_CONFIG['rest']['partners'].keys())
+
+
+def agreement_public_keys(agreement_name):
+    """Returns the public keys of the two partners of an agreement"""
+    partners = REST_CONFIG['rest']['partners'].get(agreement_name)
+    if not partners:
+        raise AuthException(
+            '{} < {}'.format(UNKNOWN_AGREEMENT, agreement_name))
+    return [public_key(partner) for partner in partners[:2]]
+
+
 def agreement_secret(agreement_name):
     result = None
     for key, value in REST_CONFIG['rest']['partners'].items():
         if key == agreement_name:
-            result = value[2]
+            result = __agreement_secret(value)
             break
     if not result:
         raise AuthException(
@@ -140,15 +190,69 @@ def key_owner(key_value):
 
 
 def zksnark_prover_key():
-    """Returns the registered prover key"""
+    """Returns the registered prover key file"""
     return REST_CONFIG['rest']['zksnark_keys']['prover']
 
 
 def zksnark_verifier_key():
-    """Returns the registered verifier key"""
+    """Returns the registered verifier key file"""
     return REST_CONFIG['rest']['zksnark_keys']['verifier']
 
 
+def zksnark_scheme():
+    """Returns the proving scheme used for new proofs"""
+    return REST_CONFIG['rest'].get('zksnark_scheme', SCHEME_PPZKSNARK)
+
+
+def proof_cache_settings():
+    """Returns the proof reuse settings, see DEFAULT_PROOF_CACHE"""
+    return REST_CONFIG['rest']['proof_cache_settings']
+
+
+def order_book_refresh():
+    """Returns the seconds between order book scans of the chain"""
+    return REST_CONFIG['rest'].get(
+        'order_book_refresh', DEFAULT_ORDER_BOOK_REFRESH)
+
+
+def bulk_submit_size():
+    """Returns the most batches a bulk endpoint posts per request"""
+    return REST_CONFIG['rest'].get(
+        'bulk_submit_size', DEFAULT_BULK_SUBMIT_SIZE)
+
+
+def bulk_max_items():
+    """Returns the most items a bulk endpoint accepts in one request"""
+    return REST_CONFIG['rest'].get(
+        'bulk_max_items', DEFAULT_BULK_MAX_ITEMS)
+
+
+def agreement_catalog(agreement_name):
+    """Returns the unit and asset references interned by an agreement"""
+    return REST_CONFIG['rest']['quantity_catalogs'].get(
+        agreement_name, {'units': [], 'assets': []})
+
+
+def matched_set_settings():
+    """Returns the matched UTXQ screen settings, see DEFAULT_MATCHED_SET"""
+    return REST_CONFIG['rest']['matched_set_settings']
+
+
+def decode_pipeline_settings():
+    """Returns the exchange listing pipeline settings
+
+    See DEFAULT_DECODE_PIPELINE, workers 0 is one per core
+    """
+    return REST_CONFIG['rest']['decode_pipeline_settings']
+
+
+def signer_key_owners():
+    """Returns the owner of each signer public key"""
+    return {
+        value: key
+        for key, value in REST_CONFIG['rest']['signer_keys'].items()}
+
+
 def valid_key(key_value):
     """Tests key against known keys"""
     return False if key_owner(key_value) == UNKNOWN_OWNER else True
@@ -237,55 +341,131 @@ def __load_cfg_and_keys(configfile):
     doc['rest']['signer_keys'] = signer_keys
     doc['rest']['submitters'] = submitter_keys
 
-    # iterate through zksnark keys
+    # iterate through zksnark keys, the key content is only
+    # read by hbzksnark so we just resolve the file names
     zksnark_keys = {}
     for key, value in doc['rest']['zksnark'].items():
-        zksnarkkey = __read_keyfile(os.path.join(DEFAULT_KEYS_PATH, value))
-        zksnark_keys[key] = zksnarkkey
-    doc['rest']['zksnark_keys'] = submitter_keys
+        zksnark_keys[key] = os.path.join(DEFAULT_KEYS_PATH, value)
+    doc['rest']['zksnark_keys'] = zksnark_keys
+    if doc['rest'].get('zksnark_scheme', SCHEME_PPZKSNARK) not in SCHEMES:
+        raise CliException(
+            'zksnark_scheme must be one of {}'.format(SCHEMES))
 
     # iterate through agreements
-    # for each agreement get the pair and append a secret
+    # the secret for each pair is derived on use
     agreements = {}
     for key, value in doc['rest']['agreements'].items():
-        if len(value) == 2:
-            value.append(
-                State.get_secret(
-                    doc['rest']['private_keys'][value[0]],
-                    doc['rest']['public_keys'][value[1]]))
+        if len(value) == 2 \
+                and value[0] in private_keys and value[1] in public_keys:
             agreements[key] = value
         else:
             raise AuthException
     doc['rest']['partners'] = agreements
+
+    # proof reuse is opt in, agreements may opt out of it
+    proof_cache = dict(DEFAULT_PROOF_CACHE)
+    proof_cache.update(doc['rest'].get('proof_cache') or {})
+    if not isinstance(proof_cache['ttl'], int) or proof_cache['ttl'] < 0 \
+            or not isinstance(proof_cache['size'], int) \
+            or proof_cache['size'] < 0:
+        raise CliException(
+            'proof_cache ttl and size must be non negative integers')
+    for agreement in proof_cache['opt_out']:
+        if agreement not in agreements:
+            raise CliException(
+                'proof_cache opt_out has unknown agreement {}'.format(
+                    agreement))
+    doc['rest']['proof_cache_settings'] = proof_cache
+    matched_set = dict(DEFAULT_MATCHED_SET)
+    matched_set.update(doc['rest'].get('matched_set') or {})
+    if not isinstance(matched_set['capacity'], int) \
+            or matched_set['capacity'] < 1 \
+            or not 0 < matched_set['error_rate'] < 1 \
+            or not isinstance(matched_set['refresh'], (int, float)) \
+            or matched_set['refresh'] <= 0:
+        raise CliException(
+            'matched_set capacity and refresh must be positive and '
+            'error_rate between 0 and 1')
+    doc['rest']['matched_set_settings'] = matched_set
+    pipeline = dict(DEFAULT_DECODE_PIPELINE)
+    pipeline.update(doc['rest'].get('decode_pipeline') or {})
+    if not all(isinstance(value, int) for value in pipeline.values()) \
+            or pipeline['min_entries'] < 0 \
+            or pipeline['chunk_size'] < 1 \
+            or pipeline['workers'] < 0:
+        raise CliException(
+            'decode_pipeline min_entries and workers must be non negative '
+            'and chunk_size positive integers')
+    doc['rest']['decode_pipeline_settings'] = pipeline
+    bulk_size = doc['rest'].get('bulk_submit_size', DEFAULT_BULK_SUBMIT_SIZE)
+    if not isinstance(bulk_size, int) or bulk_size < 1:
+        raise CliException('bulk_submit_size must be a positive integer')
+    bulk_max = doc['rest'].get('bulk_max_items', DEFAULT_BULK_MAX_ITEMS)
+    if not isinstance(bulk_max, int) or bulk_max < 1:
+        raise CliException('bulk_max_items must be a positive integer')
+
+    # unit and asset references are interned by their catalog position
+    catalogs = {}
+    for agreement, catalog in \
+            (doc['rest'].get('quantity_catalogs') or {}).items():
+        if agreement not in agreements:
+            raise CliException(
+                'quantity_catalogs has unknown agreement {}'.format(
+                    agreement))
+        catalog = {
+            'units': (catalog or {}).get('units') or [],
+            'assets': (catalog or {}).get('assets') or []}
+        for reference in catalog['units'] + catalog['assets']:
+            if not isinstance(reference, dict) \
+                    or 'system' not in reference or 'key' not in reference:
+                raise CliException(
+                    'quantity_catalogs entries require system and key')
+        catalogs[agreement] = catalog
+    doc['rest']['quantity_catalogs'] = catalogs
     return doc
 
 
+def load_keys_path():
+    """Resolve the hashblock keys directory
+
+    This is all the transaction processors require so they do not
+    pay for reading signers, agreements and dualities at startup
+    """
+    global DEFAULT_KEYS_PATH
+    global KEYS_PATH
+
+    if KEYS_PATH:
+        return KEYS_PATH
+
+    if os.environ.get(ENVIRONMENT_KEYS_PATH):
+        DEFAULT_KEYS_PATH = os.environ.get(ENVIRONMENT_KEYS_PATH)
+
+    if not os.path.exists(DEFAULT_KEYS_PATH):
+        raise ValueError("/project/keys directory not found")
+
+    KEYS_PATH = DEFAULT_KEYS_PATH + '/'
+    return KEYS_PATH
+
+
 def load_hashblock_config():
     """Load the hashblock-rest configuration file
 
     Will also check environment var for key resolution
     """
     global REST_CONFIG
-    global DEFAULT_KEYS_PATH
     global DEFAULT_CFGR_PATH
-    global KEYS_PATH
 
     if REST_CONFIG:
         return REST_CONFIG
 
-    if os.environ.get(ENVIRONMENT_KEYS_PATH):
-        DEFAULT_KEYS_PATH = os.environ.get(ENVIRONMENT_KEYS_PATH)
+    load_keys_path()
 
     if os.environ.get(ENVIRONMENT_CFGR_PATH):
         DEFAULT_CFGR_PATH = os.environ.get(ENVIRONMENT_CFGR_PATH)
 
-    if not os.path.exists(DEFAULT_KEYS_PATH):
-        raise ValueError("/project/keys directory not found")
     if not os.path.exists(DEFAULT_CFGR_PATH):
         raise ValueError("/project/config directory not found")
 
-    KEYS_PATH = DEFAULT_KEYS_PATH + '/'
-
     sys.path.append(DEFAULT_CFGR_PATH)
     Duality.load_dualities(ENVIRONMENT_CFGR_PATH, DUALITIES_SPECIFICATIONS)
     REST_CONFIG = __load_cfg_and_keys(CFGR_FILE)
@@ -19,19 +19,26 @@
 This module is referenced when fetching an address to
 decode into it's type data structure
 """
-import binascii
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from base64 import b64decode
 
-from google.protobuf.json_format import MessageToDict
+from google.protobuf.message import DecodeError
 from shared.rest_client import RestClient
 
 from modules.config import sawtooth_rest_host
-from modules.config import key_owner, agreement_secret
+from modules.config import key_owner, agreement_secret, agreement_catalog
+from modules.config import (
+    decode_pipeline_settings, signer_key_owners, UNKNOWN_OWNER)
 from modules.state import State
-from modules.exceptions import AuthException
+from modules.exceptions import AuthException, DataException, RestException
 from modules.address import Address
+from modules.query import ExchangeQuery
+from modules.pipeline import (
+    INITIATE, RECIPROCATE, parse_row, decode_listing, log_timings)
 
+from protobuf.exchange_pb2 import Quantity
 from protobuf.exchange_pb2 import UTXQ
 from protobuf.exchange_pb2 import MTXQ
 from protobuf.setting_pb2 import Settings
@@ -39,6 +46,11 @@ from protobuf.unit_pb2 import Unit
 from protobuf.unit_pb2 import UnitCandidates
 from protobuf.asset_pb2 import Asset
 from protobuf.asset_pb2 import AssetCandidates
+from protobuf.asset_json import (
+    asset_to_dict, asset_candidate_to_dict, property_to_dict)
+from protobuf.exchange_json import utxq_to_dict, mtxq_to_dict
+from protobuf.setting_json import settings_to_dict
+from protobuf.unit_json import unit_to_dict, unit_candidate_to_dict
 
 asset_addresser = Address.asset_addresser()
 unit_addresser = Address.unit_addresser()
@@ -49,6 +61,12 @@ mtxq_addresser = Address.exchange_mtxq_addresser()
 
 STATE_CRYPTO = State()
 
+# Most addresses of a lookup and its concurrent leaf fetches
+LOOKUP_MAX = 1000
+LOOKUP_WORKERS = 16
+LOOKUP_FAILURES = (
+    DataException, AuthException, RestException, DecodeError, ValueError)
+
 
 def get_node(address):
     return RestClient(sawtooth_rest_host()).get_leaf(address)
@@ -61,16 +79,47 @@ def __get_leaf_data(address, partner_secret=None):
     return ddict
 
 
+def __decrypt_state(data, partner_secret):
+    """Decrypts base64 state data, tombstones are returned as is
+
+    Returns None for data sealed with another secret
+    """
+    data = b64decode(data)
+    if utxq_addresser.is_tombstone(data):
+        return data
+    return STATE_CRYPTO.open_with(data, partner_secret)
+
+
 def __get_encrypted_leaf(address, partner_secret=None):
-    """Fetch encrypted leaf data from chain"""
+    """Fetch encrypted leaf data from chain
+
+    A matched UTXQ tombstone resolves to the UTXQ at its original address
+    """
     if partner_secret is None:
         raise AuthException
     ddict = RestClient(sawtooth_rest_host()).get_leaf(address)
-    data = binascii.unhexlify(b64decode(ddict['data']).decode())
-    ddict['data'] = STATE_CRYPTO.decrypt_object_with(data, partner_secret)
+    ddict['data'] = __decrypt_state(ddict['data'], partner_secret)
+    if ddict['data'] is None:
+        raise AuthException
+    if utxq_addresser.is_tombstone(ddict['data']):
+        ddict['data'] = __get_encrypted_leaf(
+            mtxq_addresser.set_utxq_unmatched(address),
+            partner_secret)['data']
     return ddict
 
 
+def __resolve_tombstones(entries, partner_secret):
+    """Replaces tombstones with the data of the UTXQ they matched"""
+    originals = {entry['address']: entry['data'] for entry in entries}
+    for entry in entries:
+        if utxq_addresser.is_tombstone(entry['data']):
+            original = mtxq_addresser.set_utxq_unmatched(entry['address'])
+            if original not in originals:
+                originals[original] = __get_encrypted_leaf(
+                    original, partner_secret)['data']
+            entry['data'] = originals[original]
+
+
 def __get_list_data(address, partner_secret=None):
     """Fetch list data from chain"""
     ddict = RestClient(sawtooth_rest_host()).list_state(address)
@@ -79,17 +128,179 @@ def __get_list_data(address, partner_secret=None):
     return ddict
 
 
-def __get_encrypted_list_data(address, partner_secret=None):
-    """Fetch encrypted list data from chain"""
+def __get_encrypted_list_data(address, partner_secret=None, accepts=None):
+    """Fetch encrypted list data from chain
+
+    Entries whose address fails accepts are dropped before decryption
+    """
     if partner_secret is None:
         raise AuthException
     ddict = RestClient(sawtooth_rest_host()).list_state(address)
-    for entry in ddict['data']:
-        s1 = binascii.unhexlify(b64decode(entry['data']).decode())
-        entry['data'] = STATE_CRYPTO.decrypt_object_with(s1, partner_secret)
+    if accepts:
+        ddict['data'] = [
+            entry for entry in ddict['data'] if accepts(entry['address'])]
+    ddict['data'] = __decrypt_entries(ddict['data'], partner_secret)
     return ddict
 
 
+def __decrypt_entries(entries, partner_secret):
+    """Decrypts listed entries, resolving tombstones
+
+    Entries sealed with another secret are dropped. Listings of at least
+    the decode_pipeline min_entries go to decode_listing instead
+    """
+    for entry in entries:
+        entry['data'] = __decrypt_state(entry['data'], partner_secret)
+    entries = [entry for entry in entries if entry['data'] is not None]
+    __resolve_tombstones(entries, partner_secret)
+    return entries
+
+
+def __get_encrypted_query_data(query, partner_secret):
+    """Fetch encrypted list data of every subtree of an ExchangeQuery"""
+    results = []
+    for prefix in query.prefixes:
+        results.extend(__get_encrypted_list_data(
+            prefix, partner_secret, query.accepts)['data'])
+    return results
+
+
+def __get_query_entries(query):
+    """Listed, still encrypted, entries of every subtree of a query"""
+    client = RestClient(sawtooth_rest_host())
+    entries = []
+    for prefix in query.prefixes:
+        entries.extend(
+            entry for entry in client.list_state(prefix)['data']
+            if query.accepts(entry['address']))
+    return entries
+
+
+def __resolve_tombstone_rows(dimension, rows, partner_secret):
+    """Drops foreign rows and replaces tombstone addresses with rows"""
+    originals = {row['address']: row for row in rows if isinstance(row, dict)}
+    resolved = []
+    for row in rows:
+        if isinstance(row, str):
+            original = mtxq_addresser.set_utxq_unmatched(row)
+            if original in originals:
+                row = dict(originals[original], address=row, matched=True)
+            else:
+                row = parse_row(
+                    dimension,
+                    row,
+                    __get_encrypted_leaf(original, partner_secret)['data'],
+                    key_owner)
+        if row is not None:
+            resolved.append(row)
+    return resolved
+
+
+def __iter_query_entries(query, head=None, cursor=None):
+    """Streams the listed, still encrypted, entries of a query
+
+    Listing is at the head block, or the current one, and resumes after
+    the cursor address
+    """
+    client = RestClient(sawtooth_rest_host())
+    for prefix, start in query.starts(cursor):
+        for entry in client.iter_state(prefix, head=head, start=start):
+            if start is not None and entry['address'] <= start:
+                continue
+            if query.accepts(entry['address']):
+                yield entry
+
+
+def __decode_exchange_entries(dimension, partner_secret, entries, fetched):
+    """Listing rows of listed UTXQ or MTXQ entries
+
+    Entries of at least the decode_pipeline min_entries are decrypted
+    and parsed on the process pool, and the stage timings are logged.
+    fetched is the seconds the entries took to list
+    """
+    settings = decode_pipeline_settings()
+    if len(entries) < settings['min_entries']:
+        return [
+            parse_row(dimension, entry['address'], entry['data'], key_owner)
+            for entry in __decrypt_entries(entries, partner_secret)]
+    rows, timings = decode_listing(
+        dimension,
+        partner_secret,
+        [(entry['address'], entry['data']) for entry in entries],
+        settings,
+        signer_key_owners(),
+        UNKNOWN_OWNER)
+    resolving = time.perf_counter()
+    rows = __resolve_tombstone_rows(dimension, rows, partner_secret)
+    timings['fetch'] = fetched
+    timings['resolve'] = time.perf_counter() - resolving
+    log_timings(dimension, len(entries), timings)
+    return rows
+
+
+def __decode_exchange_list(dimension, agreement, query):
+    """Listing rows of an agreement's UTXQs or MTXQs"""
+    start = time.perf_counter()
+    entries = __get_query_entries(query)
+    return __decode_exchange_entries(
+        dimension,
+        agreement_secret(agreement),
+        entries,
+        time.perf_counter() - start)
+
+
+def __iter_exchange_list(dimension, agreement, query, head, cursor, limit):
+    """Streams listing rows of an agreement's UTXQs or MTXQs
+
+    Entries are decoded a window of decode_pipeline min_entries at a
+    time, which bounds memory, or of one more than the page limit. A
+    tombstone whose UTXQ is listed in another window is resolved with
+    a fetch
+    """
+    size = max(1, decode_pipeline_settings()['min_entries'])
+    if limit:
+        size = min(size, limit + 1)
+    return __iter_exchange_windows(
+        dimension,
+        agreement_secret(agreement),
+        __iter_query_entries(query, head, cursor),
+        size)
+
+
+def __iter_exchange_windows(dimension, sec, entries, size):
+    window = []
+    start = time.perf_counter()
+    for entry in entries:
+        window.append(entry)
+        if len(window) == size:
+            yield from __decode_exchange_entries(
+                dimension, sec, window, time.perf_counter() - start)
+            window = []
+            start = time.perf_counter()
+    if window:
+        yield from __decode_exchange_entries(
+            dimension, sec, window, time.perf_counter() - start)
+
+
+def iter_encrypted_state(address, partner_secret, resolve=True):
+    """Stream (address, decrypted data) for an encrypted subtree
+
+    Tombstones are resolved with a fetch of the original UTXQ, or
+    yielded as is when resolve is False
+    """
+    if partner_secret is None:
+        raise AuthException
+    for entry in RestClient(sawtooth_rest_host()).iter_state(address):
+        data = __decrypt_state(entry['data'], partner_secret)
+        if data is None:
+            continue
+        if resolve and utxq_addresser.is_tombstone(data):
+            data = __get_encrypted_leaf(
+                mtxq_addresser.set_utxq_unmatched(entry['address']),
+                partner_secret)['data']
+        yield (entry['address'], data)
+
+
 @lru_cache(maxsize=128)
 def __asset_cache(prime):
     """Prime (value) lookup for resource asset"""
@@ -141,7 +352,7 @@ def __decode_settings(address, data):
         stype = 'unit'
     else:
         stype = 'asset'
-    data = MessageToDict(settings)
+    data = settings_to_dict(settings)
     data['authList'] = [key_owner(x) for x in data['authList'].split(",")]
     return {
         'family': stype,
@@ -166,9 +377,9 @@ def __decode_asset_proposals(address, data):
     asset = Asset()
     data = []
     for candidate in proposals.candidates:
-        msg = MessageToDict(candidate)
+        msg = asset_candidate_to_dict(candidate)
         asset.ParseFromString(candidate.proposal.asset)
-        msg['proposal']['asset'] = MessageToDict(asset)
+        msg['proposal']['asset'] = asset_to_dict(asset)
         for voter in msg['votes']:
             voter['publicKey'] = key_owner(voter['publicKey'])
         data.append(msg)
@@ -186,9 +397,9 @@ def __decode_unit_proposals(address, data):
     unit = Unit()
     data = []
     for candidate in proposals.candidates:
-        msg = MessageToDict(candidate)
+        msg = unit_candidate_to_dict(candidate)
         unit.ParseFromString(candidate.proposal.unit)
-        msg['proposal']['asset'] = MessageToDict(unit)
+        msg['proposal']['asset'] = unit_to_dict(unit)
         for voter in msg['votes']:
             voter['publicKey'] = key_owner(voter['publicKey'])
         data.append(msg)
@@ -207,69 +418,93 @@ def decode_proposals(address, data=None):
         else __decode_asset_proposals(address, data)
 
 
-def decode_asset(address):
-    """Decode a asset address"""
-    data = __get_leaf_data(address)['data']
+def __decode_asset(address, data):
     asset = Asset()
     asset.ParseFromString(data)
     return {
         'family': 'asset',
-        'data': MessageToDict(asset)
+        'data': asset_to_dict(asset)
     }
 
 
-def decode_unit(address):
-    """Decode a unit or resource asset address"""
-    data = __get_leaf_data(address)['data']
+def decode_asset(address):
+    """Decode a asset address"""
+    return __decode_asset(address, __get_leaf_data(address)['data'])
+
+
+def __decode_unit(address, data):
     unit = Unit()
     unit.ParseFromString(data)
     return {
         'family': 'unit',
-        'data': MessageToDict(unit)
+        'data': unit_to_dict(unit)
     }
 
 
-def decode_asset_list(address=None):
-    """List of assets not including proposals"""
+def decode_unit(address):
+    """Decode a unit or resource asset address"""
+    return __decode_unit(address, __get_leaf_data(address)['data'])
+
+
+def __iter_list_data(address, head=None, cursor=None):
+    """Streams (address, data) of a subtree, a page at a time
+
+    Listing is at the head block, or the current one, and resumes after
+    the cursor address
+    """
+    if cursor is not None and not cursor.startswith(address):
+        raise DataException("Cursor {} is not in the listing".format(cursor))
+    for entry in RestClient(sawtooth_rest_host()).iter_state(
+            address, head=head, start=cursor):
+        if cursor is None or entry['address'] > cursor:
+            yield (entry['address'], b64decode(entry['data']))
+
+
+def iter_asset_list(address=None, head=None, cursor=None):
+    """Streams assets not including proposals"""
     targetadd = address if address else asset_addresser.family_ns_hash
-    results = __get_list_data(targetadd)['data']
-    data = []
-    for element in results:
+    for address, data in __iter_list_data(targetadd, head, cursor):
         asset = Asset()
-        asset.ParseFromString(element['data'])
-        am = MessageToDict(asset)
-        data.append({
-            'link': element['address'],
+        asset.ParseFromString(data)
+        yield {
+            'link': address,
             'type': 'asset',
             'system': asset.system,
             'name': asset.key,
             'value': asset.value,
-            'properties': am["properties"] if "properties" in am else []
-        })
+            'properties': [
+                property_to_dict(prop) for prop in asset.properties]
+        }
+
+
+def decode_asset_list(address=None):
+    """List of assets not including proposals"""
     return {
         'family': 'asset',
-        'data': data
+        'data': list(iter_asset_list(address))
     }
 
 
-def decode_unit_list(address=None):
-    """List of assets not including proposals"""
+def iter_unit_list(address=None, head=None, cursor=None):
+    """Streams units not including proposals"""
     targetadd = address if address else unit_addresser.family_ns_hash
-    results = __get_list_data(targetadd)['data']
-    data = []
-    for element in results:
+    for address, data in __iter_list_data(targetadd, head, cursor):
         unit = Unit()
-        unit.ParseFromString(element['data'])
-        data.append({
-            'link': element['address'],
+        unit.ParseFromString(data)
+        yield {
+            'link': address,
             'type': 'unit',
             'system': unit.system,
             'name': unit.key,
             'value': unit.value
-        })
+        }
+
+
+def decode_unit_list(address=None):
+    """List of assets not including proposals"""
     return {
         'family': 'unit',
-        'data': data
+        'data': list(iter_unit_list(address))
     }
 
 
@@ -284,15 +519,62 @@ def __format_quantity(quantity):
         resource)
 
 
-def __decode_exchange(address, data):
+def __reference_prime(decoder, addresser, reference):
+    """Prime of a unit or asset reference"""
+    for element in decoder(addresser.address_syskey(
+            reference['system'], reference['key']))['data']:
+        if element['system'] == reference['system'] and \
+                element['name'] == reference['key']:
+            return int(element['value'], 16)
+    raise DataException(
+        "Catalog reference {}.{} does not exist".format(
+            reference['system'], reference['key']))
+
+
+@lru_cache(maxsize=32)
+def catalog_primes(agreement):
+    """Unit primes and asset primes interned by an agreement, by index"""
+    catalog = agreement_catalog(agreement)
+    return (
+        tuple(
+            __reference_prime(decode_unit_list, unit_addresser, reference)
+            for reference in catalog['units']),
+        tuple(
+            __reference_prime(decode_asset_list, asset_addresser, reference)
+            for reference in catalog['assets']))
+
+
+def __catalog_prime(primes, index):
+    if index > len(primes):
+        raise DataException(
+            "Catalog index {} is not in the agreement catalog".format(index))
+    return primes[index - 1]
+
+
+def quantity_ints(quantity, agreement=None):
+    """value, unit and asset of a Quantity as integers
+
+    Both encodings are little endian integers. COMPACT unit and asset
+    may instead be indexes into the agreement catalog
+    """
+    value = int.from_bytes(quantity.value, byteorder='little')
+    unit = int.from_bytes(quantity.unit, byteorder='little')
+    asset = int.from_bytes(quantity.asset, byteorder='little')
+    if quantity.encoding == Quantity.COMPACT and \
+            (quantity.unit_index or quantity.asset_index):
+        units, assets = catalog_primes(agreement)
+        if quantity.unit_index:
+            unit = __catalog_prime(units, quantity.unit_index)
+        if quantity.asset_index:
+            asset = __catalog_prime(assets, quantity.asset_index)
+    return (value, unit, asset)
+
+
+def __decode_exchange(address, data, agreement=None):
     """Detail decode a unmatched or matched address"""
-    def quantity_to_prime(quantity, rquant):
-        quantity['value'] = \
-            int.from_bytes(rquant.value, byteorder='little')
-        quantity['unit'] = int.from_bytes(
-            rquant.unit, byteorder='little')
-        quantity['asset'] = int.from_bytes(
-            rquant.asset, byteorder='little')
+    def quantity_to_prime(rquant):
+        value, unit, asset = quantity_ints(rquant, agreement)
+        return {'value': value, 'unit': unit, 'asset': asset}
     if utxq_addresser.is_mtype_prefix(address):
         item = UTXQ()
         mtype = 'utxq'
@@ -302,20 +584,19 @@ def __decode_exchange(address, data):
         mtype = 'mtxq'
         deep = True
     item.ParseFromString(data)
-    match = MessageToDict(item)
+    match = mtxq_to_dict(item) if deep else utxq_to_dict(item)
     match["plus"] = key_owner(item.plus.decode())
     match["minus"] = key_owner(item.minus.decode())
-    quantity_to_prime(match['quantity'], item.quantity)
+    match['quantity'] = quantity_to_prime(item.quantity)
     if deep:
         # Get address of utxq
         match["utxqAddr"] = item.utxq_addr.decode()
-        match["matched"] = utxq_addresser.is_matched(match["utxqAddr"])
-        quantity_to_prime(
-            match['ratio']['numerator'],
-            item.ratio.numerator)
-        quantity_to_prime(
-            match['ratio']['denominator'],
-            item.ratio.denominator)
+        # An MTXQ exists only once its UTXQ is matched. The flag is not
+        # read from utxqAddr, which 0.5.0 keeps at the unmatched address
+        match["matched"] = True
+        match['ratio'] = {
+            'numerator': quantity_to_prime(item.ratio.numerator),
+            'denominator': quantity_to_prime(item.ratio.denominator)}
     return {
         'family': 'match',
         'type': mtype,
@@ -323,16 +604,17 @@ def __decode_exchange(address, data):
     }
 
 
-def get_utxq_obj_json(address, secret):
+def get_utxq_obj_json(address, secret, agreement=None):
     utxq_obj = __get_encrypted_leaf(address, secret)['data']
     utxq = UTXQ()
     utxq.ParseFromString(utxq_obj)
-    return (utxq, __decode_exchange(address, utxq_obj))
+    return (utxq, __decode_exchange(address, utxq_obj, agreement))
 
 
 def decode_exchange_types(addresser, agreement):
     sec = agreement_secret(agreement)
-    results = __get_encrypted_list_data(addresser.mtype_address, sec)['data']
+    results = __get_encrypted_query_data(
+        ExchangeQuery(addresser, agreement), sec)
     data = []
     for element in results:
         data.append((element['address']))
@@ -347,60 +629,140 @@ def decode_exchange_initiate(address, agreement):
     sec = agreement_secret(agreement)
     return __decode_exchange(
         address,
-        __get_encrypted_leaf(address, sec)['data'])
+        __get_encrypted_leaf(address, sec)['data'],
+        agreement)
 
 
-def decode_exchange_initiate_list(agreement):
-    """Decorate initiates with text conversions"""
-    sec = agreement_secret(agreement)
-    results = __get_encrypted_list_data(
-        utxq_addresser.mtype_address, sec)['data']
-    data = []
-    for element in results:
-        ladd = element['address']
-        utxq = UTXQ()
-        utxq.ParseFromString(element['data'])
-        data.append(
-            {
-                "plus": key_owner(utxq.plus.decode("utf-8")),
-                "minus": key_owner(utxq.minus.decode("utf-8")),
-                "operation": utxq.operation,
-                "matched": utxq_addresser.is_matched(ladd),
-                "address": ladd
-            })
+def decode_exchange_initiate_list(agreement, query=None):
+    """Decorate initiates with text conversions
+
+    query is an ExchangeQuery over utxq_addresser, all UTXQs of the
+    agreement if None
+    """
+    query = query or ExchangeQuery(utxq_addresser, agreement)
     return {
         'family': 'match',
-        'dimension': 'utxq',
-        'data': data
+        'dimension': INITIATE,
+        'data': __decode_exchange_list(INITIATE, agreement, query)
     }
 
 
+def iter_exchange_initiate_list(
+        agreement, query=None, head=None, cursor=None, limit=None):
+    """Streams the rows of decode_exchange_initiate_list
+
+    Listing is at the head block, or the current one, and resumes after
+    the cursor address. limit is the rows the caller reads, if known
+    """
+    return __iter_exchange_list(
+        INITIATE,
+        agreement,
+        query or ExchangeQuery(utxq_addresser, agreement),
+        head, cursor, limit)
+
+
 def decode_exchange_reciprocate(address, agreement):
     sec = agreement_secret(agreement)
     return __decode_exchange(
         address,
-        __get_encrypted_leaf(address, sec)['data'])
+        __get_encrypted_leaf(address, sec)['data'],
+        agreement)
 
 
-def decode_exchange_reciprocate_list(agreement):
-    """Decorate reciprocates with text conversions"""
-    sec = agreement_secret(agreement)
-    results = __get_encrypted_list_data(
-        mtxq_addresser.mtype_address, sec)['data']
+def decode_exchange_reciprocate_list(agreement, query=None):
+    """Decorate reciprocates with text conversions
 
-    data = []
-    for element in results:
-        ladd = element['address']
-        mtxq = MTXQ()
-        mtxq.ParseFromString(element['data'])
-        data.append({
-            "plus": key_owner(mtxq.plus.decode("utf-8")),
-            "minus": key_owner(mtxq.minus.decode("utf-8")),
-            "operation": mtxq.operation,
-            "address": ladd
-        })
+    query is an ExchangeQuery over mtxq_addresser, all MTXQs of the
+    agreement if None
+    """
+    query = query or ExchangeQuery(mtxq_addresser, agreement)
     return {
         'family': 'match',
-        'dimension': 'mtxq',
-        'data': data
+        'dimension': RECIPROCATE,
+        'data': __decode_exchange_list(RECIPROCATE, agreement, query)
     }
+
+
+def iter_exchange_reciprocate_list(
+        agreement, query=None, head=None, cursor=None, limit=None):
+    """Streams the rows of decode_exchange_reciprocate_list
+
+    head, cursor and limit are as for iter_exchange_initiate_list
+    """
+    return __iter_exchange_list(
+        RECIPROCATE,
+        agreement,
+        query or ExchangeQuery(mtxq_addresser, agreement),
+        head, cursor, limit)
+
+
+def __lookup_decoder(address):
+    """decoder(address, data) of an address by its prefix, or None"""
+    if address == asset_addresser.candidate_address:
+        return __decode_asset_proposals
+    if address == unit_addresser.candidate_address:
+        return __decode_unit_proposals
+    if address in (
+            asset_addresser.setting_address, unit_addresser.setting_address):
+        return __decode_settings
+    if utxq_addresser.is_mtype_prefix(address) \
+            or mtxq_addresser.is_mtype_prefix(address):
+        return __decode_exchange
+    if asset_addresser.is_family(address):
+        return __decode_asset
+    if unit_addresser.is_family(address):
+        return __decode_unit
+    return None
+
+
+def __lookup_address(client, address, agreement, head):
+    """Fetch and decode one address of a lookup"""
+    decoder = __lookup_decoder(address)
+    if decoder is None:
+        raise DataException("Address {} is not a known type".format(address))
+    data = client.get_leaf(address, head=head)['data']
+    if decoder is not __decode_exchange:
+        return decoder(address, b64decode(data))
+    if agreement is None:
+        raise AuthException(
+            "Exchange address {} requires an agreement".format(address))
+    sec = agreement_secret(agreement)
+    data = __decrypt_state(data, sec)
+    if data is not None and utxq_addresser.is_tombstone(data):
+        data = __decrypt_state(
+            client.get_leaf(
+                mtxq_addresser.set_utxq_unmatched(address),
+                head=head)['data'],
+            sec)
+    if data is None:
+        raise AuthException(
+            "Address {} is not sealed for {}".format(address, agreement))
+    return __decode_exchange(address, data, agreement)
+
+
+def lookup_addresses(addresses, agreement=None, head=None):
+    """Decode many addresses of any type, fetched concurrently
+
+    Exchange addresses are decrypted for the agreement. Reads are at
+    the head block, or the current one. Returns the decoded result of
+    each address, or the name and message of its failure
+    """
+    addresses = list(dict.fromkeys(addresses))
+    if len(addresses) > LOOKUP_MAX:
+        raise DataException(
+            "Lookup of {} addresses exceeds {}".format(
+                len(addresses), LOOKUP_MAX))
+    if not addresses:
+        return {}
+    if agreement is not None:
+        agreement_secret(agreement)
+    client = RestClient(sawtooth_rest_host())
+
+    def lookup(address):
+        try:
+            return __lookup_address(client, address, agreement, head)
+        except LOOKUP_FAILURES as e:
+            return {type(e).__name__: str(e)}
+    with ThreadPoolExecutor(
+            max_workers=min(LOOKUP_WORKERS, len(addresses))) as pool:
+        return dict(zip(addresses, pool.map(lookup, addresses)))
@@ -0,0 +1,132 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""envelope - Binary envelope of encrypted exchange state
+
+    version     1 byte      ENVELOPE_VERSION
+    cipher      1 byte      CIPHER_NONE or CIPHER_AES_GCM
+    key id      8 bytes     sha256 of the agreement secret, truncated
+    nonce       12 bytes
+    ciphertext
+    tag         16 bytes
+
+The header (version to nonce) is the associated data of the cipher.
+Earlier state is the hex text of the encrypted object. Hex digits are
+never ENVELOPE_VERSION, so the first byte tells the two apart.
+"""
+import binascii
+import hashlib
+import os
+import struct
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from modules.exceptions import AuthException, DataException
+
+ENVELOPE_VERSION = 1
+CIPHER_NONE = 0
+CIPHER_AES_GCM = 1
+
+HEADER = struct.Struct('<BB8s12s')
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# Derived keys and ciphers by secret, one per agreement
+CIPHER_CACHE_SIZE = 4096
+KEY_INFO = b'hashblock exchange state'
+
+
+@lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def key_id(secret):
+    """Identifies the secret an envelope was sealed with"""
+    return hashlib.sha256(secret).digest()[0:8]
+
+
+def is_envelope(data):
+    return len(data) >= HEADER.size + TAG_SIZE \
+        and data[0] == ENVELOPE_VERSION
+
+
+def header(cipher, secret, nonce):
+    return HEADER.pack(ENVELOPE_VERSION, cipher, key_id(secret), nonce)
+
+
+def pack(cipher, secret, nonce, ciphertext, tag):
+    """Returns the envelope bytes"""
+    return b''.join((header(cipher, secret, nonce), ciphertext, tag))
+
+
+def unpack(data):
+    """(cipher, key id, nonce, ciphertext, tag) of an envelope
+
+    data is a memoryview, the ciphertext and tag are views into it
+    """
+    _, cipher, kid, nonce = HEADER.unpack_from(data)
+    return (
+        cipher,
+        kid,
+        nonce,
+        data[HEADER.size:len(data) - TAG_SIZE],
+        data[len(data) - TAG_SIZE:])
+
+
+@lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def cipher_for(secret):
+    """AES-256-GCM cipher keyed by HKDF-SHA256 of the secret"""
+    return AESGCM(HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=KEY_INFO).derive(secret))
+
+
+def seal(data, secret):
+    """Encrypts data with AES-GCM into an envelope"""
+    nonce = os.urandom(NONCE_SIZE)
+    associated = header(CIPHER_AES_GCM, secret, nonce)
+    # AESGCM appends the tag to the ciphertext, as the envelope does
+    return associated + cipher_for(secret).encrypt(nonce, data, associated)
+
+
+def open_sealed(blob, secret):
+    """Decrypts an envelope or a hex blob
+
+    Returns None for an envelope sealed with another secret. Hex blobs
+    and CIPHER_NONE envelopes predate encryption and are returned as is,
+    a blob that is neither raises DataException
+    """
+    view = memoryview(blob)
+    if not is_envelope(view):
+        try:
+            return binascii.unhexlify(view)
+        except binascii.Error:
+            raise DataException('Exchange state is not an envelope or hex')
+    cipher, kid, nonce, ciphertext, _ = unpack(view)
+    if kid != key_id(secret):
+        return None
+    if cipher == CIPHER_NONE:
+        return bytes(ciphertext)
+    if cipher != CIPHER_AES_GCM:
+        raise ValueError('Unsupported envelope cipher {}'.format(cipher))
+    try:
+        return cipher_for(secret).decrypt(
+            nonce, view[HEADER.size:], view[0:HEADER.size])
+    except InvalidTag:
+        raise AuthException('Exchange state failed authentication')
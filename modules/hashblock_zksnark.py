@@ -15,8 +15,69 @@
 # ------------------------------------------------------------------------------
 
 import subprocess
+import struct
 from sawtooth_sdk.processor.exceptions import InternalError
 
+# Proving schemes supported by hbzksnark
+SCHEME_PPZKSNARK = 'ppzksnark'
+SCHEME_GG_PPZKSNARK = 'gg'
+SCHEMES = [SCHEME_PPZKSNARK, SCHEME_GG_PPZKSNARK]
+
+# Verifyer key file for each scheme
+VERIFY_KEYNAMES = {
+    SCHEME_PPZKSNARK: 'hashblock_zkSNARK.vk',
+    SCHEME_GG_PPZKSNARK: 'hashblock_zkSNARK_gg.vk'}
+
+# Circuits proving this many balancing equations at once, each size has
+# its own keys (hbzksnark -G). Smaller batches are padded to the next size
+BATCH_SIZES = [8, 32, 128]
+
+
+def batch_size_for(count):
+    """Smallest supported batch size holding count equations"""
+    for size in BATCH_SIZES:
+        if count <= size:
+            return size
+    raise ValueError(
+        "{} equations exceed the largest batch of {}".format(
+            count, BATCH_SIZES[-1]))
+
+
+def verify_keyname(scheme=SCHEME_PPZKSNARK, batch_size=0):
+    """Verifyer key file name for a scheme and batch size"""
+    key_name = VERIFY_KEYNAMES[scheme]
+    if not batch_size:
+        return key_name
+    base, ext = key_name.rsplit('.', 1)
+    return "{}_b{}.{}".format(base, batch_size, ext)
+
+
+def __command(flag, file_path, batch_size):
+    """hbzksnark command prefix, batch commands are upper case"""
+    if batch_size:
+        return ['hbzksnark', flag.upper(), file_path, str(batch_size)]
+    return ['hbzksnark', flag, file_path]
+
+
+# Compact proof envelope written by 'hbzksnark -q', see hbcompact.hpp
+COMPACT_MAGIC = b'HBZ'
+COMPACT_VERSION = 1
+COMPACT_HEADER = struct.Struct('<3sBBxHII')
+
+
+def compact_header(compact):
+    """Returns (scheme id, batch size, proof size, input count)
+
+    Raises ValueError if the envelope is not a supported compact proof
+    """
+    if len(compact) < COMPACT_HEADER.size:
+        raise ValueError("Compact proof is truncated")
+    magic, version, scheme_id, batch_size, proof_size, input_count = \
+        COMPACT_HEADER.unpack_from(compact)
+    if magic != COMPACT_MAGIC or version != COMPACT_VERSION:
+        raise ValueError("Unsupported compact proof")
+    return (scheme_id, batch_size, proof_size, input_count)
+
 
 def prime_gen():
     """Returns prime based on 172 bit range. Results is 44 char"""
@@ -26,10 +87,11 @@ def prime_gen():
     return x.stdout[:-1]
 
 
-def zksnark_genkeys(file_path, secret_str):
+def zksnark_genkeys(
+        file_path, secret_str, scheme=SCHEME_PPZKSNARK, batch_size=0):
     """Generates the proover and verifyer 'keys'"""
     key_gen = subprocess.run(
-        ['hbzksnark', '-g', file_path, secret_str],
+        __command('-g', file_path, batch_size) + [secret_str, scheme],
         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if key_gen.returncode != 0:
         raise InternalError(
@@ -37,14 +99,31 @@ def zksnark_genkeys(file_path, secret_str):
             format(key_gen.returncode))
 
 
-def zksnark_genproof(file_path, data_str):
+def zksnark_process_vk(file_path, scheme=SCHEME_PPZKSNARK):
+    """Preprocesses the verifyer 'key' into the processed key file
+
+    Verification never writes keys. While the processed key is missing
+    or older than the verifyer key, each verification derives it again
+    """
+    key_proc = subprocess.run(
+        ['hbzksnark', '-k', file_path, scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if key_proc.returncode != 0:
+        raise InternalError(
+            "hbzksnark key processing failed with {}".
+            format(key_proc.returncode))
+
+
+def zksnark_genproof(
+        file_path, data_str, scheme=SCHEME_PPZKSNARK, batch_size=0):
     """Generates a proof based on data string
 
     Returns a tuple of ('proof' and 'pairing' base64 encoded strings)
+    When batch_size is given data_str holds 12 integers per equation
 
     """
     prf_gen = subprocess.run(
-        ['hbzksnark', '-p', file_path, data_str],
+        __command('-p', file_path, batch_size) + [data_str, scheme],
         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if prf_gen.returncode == 0:
         return prf_gen.stderr.decode("utf-8").split()
@@ -54,12 +133,45 @@ def zksnark_genproof(file_path, data_str):
             format(prf_gen))
 
 
-def zksnark_verify(file_path, proof_str, pairing_str):
-    """Verifies equation match"""
-    ver_gen = subprocess.run(
-        ['hbzksnark', '-v', file_path, proof_str, pairing_str],
+def zksnark_genproof_compact(
+        file_path, data_str, scheme=SCHEME_PPZKSNARK, batch_size=0):
+    """Generates a proof based on data string
+
+    Returns the compact envelope bytes holding the proof and pairing
+    """
+    prf_gen = subprocess.run(
+        ['hbzksnark', '-q', file_path, str(batch_size), data_str, scheme],
         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if ver_gen.returncode == 0:
-        return True
+    if prf_gen.returncode == 0:
+        return prf_gen.stdout
     else:
+        raise InternalError(
+            "hbzksnark proof generated failed with {}".
+            format(prf_gen))
+
+
+def zksnark_verify_compact(file_path, compact, scheme=SCHEME_PPZKSNARK):
+    """Verifies equation match from a compact envelope"""
+    ver_gen = subprocess.run(
+        ['hbzksnark', '-w', file_path, scheme],
+        input=compact,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return ver_gen.returncode == 0
+
+
+def zksnark_verify(
+        file_path, proof_str, pairing_str, scheme=SCHEME_PPZKSNARK,
+        batch_size=0, strict=True):
+    """Verifies equation match
+
+    hbzksnark -v exits 0 whenever verification ran and writes the
+    result to stdout. Exchange family 0.3.0 accepted on the exit status
+    alone, strict=False keeps that for replaying its transactions
+    """
+    ver_gen = subprocess.run(
+        __command('-v', file_path, batch_size) +
+        [proof_str, pairing_str, scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if ver_gen.returncode != 0:
         return False
+    return not strict or ver_gen.stdout.split()[-1:] == [b'1']
@@ -0,0 +1,164 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""pipeline - Chunked decrypt and parse of large exchange listings
+
+A listing is split into chunks that a process pool decrypts, parses
+and turns into rows. The rows are merged in listing order. Workers are
+given the signer key owners when they start. The agreement secret is
+sent with each chunk, and each worker caches the cipher derived from
+it. Tombstones come back as bare addresses and are resolved by the
+caller, which can fetch from the chain.
+
+Workers are spawned rather than forked, because forking a threaded
+server worker can copy locks that other threads hold.
+"""
+import logging
+import multiprocessing
+import time
+from base64 import b64decode
+from concurrent.futures import ProcessPoolExecutor
+
+from modules import envelope
+from modules.address import Address
+
+from protobuf.exchange_pb2 import UTXQ
+from protobuf.exchange_pb2 import MTXQ
+
+LOGGER = logging.getLogger(__name__)
+
+INITIATE = 'utxq'
+RECIPROCATE = 'mtxq'
+
+utxq_addresser = Address.exchange_utxq_addresser()
+
+_POOL = None
+_OWNERS = {}
+_UNKNOWN_OWNER = None
+
+
+def initiate_row(address, utxq, owner):
+    """Listing row of a UTXQ, owner maps a public key to its owner"""
+    return {
+        "plus": owner(utxq.plus.decode("utf-8")),
+        "minus": owner(utxq.minus.decode("utf-8")),
+        "operation": utxq.operation,
+        "matched": utxq_addresser.is_matched(address),
+        "address": address}
+
+
+def reciprocate_row(address, mtxq, owner):
+    """Listing row of a MTXQ, owner maps a public key to its owner"""
+    return {
+        "plus": owner(mtxq.plus.decode("utf-8")),
+        "minus": owner(mtxq.minus.decode("utf-8")),
+        "operation": mtxq.operation,
+        "address": address}
+
+
+def parse_row(dimension, address, data, owner):
+    """Parses decrypted exchange data into its listing row"""
+    if dimension == INITIATE:
+        item = UTXQ()
+        item.ParseFromString(data)
+        return initiate_row(address, item, owner)
+    item = MTXQ()
+    item.ParseFromString(data)
+    return reciprocate_row(address, item, owner)
+
+
+def _init_worker(owners, unknown_owner):
+    global _OWNERS
+    global _UNKNOWN_OWNER
+    _OWNERS = owners
+    _UNKNOWN_OWNER = unknown_owner
+
+
+def _owner(public_key):
+    return _OWNERS.get(public_key, _UNKNOWN_OWNER)
+
+
+def _decode_chunk(dimension, secret, entries):
+    """Decrypts and parses (address, base64 data) entries
+
+    Returns (rows, decrypt seconds, parse seconds). A row is None for
+    data sealed with another secret and the address of a tombstone
+    """
+    start = time.perf_counter()
+    opened = []
+    for address, data in entries:
+        data = b64decode(data)
+        if not utxq_addresser.is_tombstone(data):
+            data = envelope.open_sealed(data, secret)
+        opened.append((address, data))
+    decrypted = time.perf_counter()
+    rows = []
+    for address, data in opened:
+        if data is None:
+            rows.append(None)
+        elif utxq_addresser.is_tombstone(data):
+            rows.append(address)
+        else:
+            rows.append(parse_row(dimension, address, data, _owner))
+    return (rows, decrypted - start, time.perf_counter() - decrypted)
+
+
+def __pool(workers, owners, unknown_owner):
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(
+            max_workers=workers or None,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(owners, unknown_owner))
+    return _POOL
+
+
+def decode_listing(
+        dimension, secret, entries, settings, owners, unknown_owner):
+    """Rows of (address, base64 data) entries, in listing order
+
+    settings are the decode_pipeline settings. Returns the rows, with
+    None and tombstone addresses as in _decode_chunk, and the decrypt,
+    parse and merge seconds. Decrypt and parse seconds are summed over
+    the workers
+    """
+    size = settings['chunk_size']
+    pool = __pool(settings['workers'], owners, unknown_owner)
+    chunks = [entries[i:i + size] for i in range(0, len(entries), size)]
+    timings = {'decrypt': 0.0, 'parse': 0.0, 'merge': 0.0}
+    rows = []
+    for chunk_rows, decrypt_sec, parse_sec in pool.map(
+            _decode_chunk,
+            [dimension] * len(chunks),
+            [secret] * len(chunks),
+            chunks):
+        start = time.perf_counter()
+        rows.extend(chunk_rows)
+        timings['merge'] += time.perf_counter() - start
+        timings['decrypt'] += decrypt_sec
+        timings['parse'] += parse_sec
+    return (rows, timings)
+
+
+def log_timings(dimension, count, timings):
+    LOGGER.info(
+        "%s listing of %d entries: %s",
+        dimension,
+        count,
+        ', '.join(
+            '{} {:.1f}ms'.format(stage, seconds * 1000)
+            for stage, seconds in timings.items()))
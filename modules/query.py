@@ -0,0 +1,100 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""query - Address prefix planning for exchange listings
+
+A filter fixes some characters of an exchange address, see
+ExchangeAddress for the 0.3.0 and 0.4.0 layouts. Each layout gets a
+plan, the longest known prefix the validator accepts (an even number of
+characters) plus a check of any other known character on the address,
+made before data is decrypted. With an agreement the 0.4.0 plan is
+limited to the agreement's partition.
+"""
+
+from modules.config import agreement_public_keys
+from modules.dualities import Duality
+from modules.exceptions import DataException
+
+WILDCARD = '?'
+
+
+def _plan(pattern):
+    """(prefix, checks) for an address pattern"""
+    known = pattern.find(WILDCARD)
+    if known < 0:
+        known = len(pattern)
+    prefix = pattern[:known - known % 2]
+    return (prefix, [
+        (index, char)
+        for index, char in enumerate(pattern)
+        if char != WILDCARD and index >= len(prefix)])
+
+
+class ExchangeQuery(object):
+    """Listing plans for an exchange addresser and optional filters"""
+
+    def __init__(
+            self, addresser, agreement=None,
+            namespace=None, verb=None, matched=None):
+        if namespace is not None:
+            try:
+                Duality.duality_for_ns(namespace)
+            except KeyError:
+                raise DataException(
+                    "Namespace {} not found in duality configuration".format(
+                        namespace))
+        operation = addresser.hashup(namespace)[0:3] \
+            if namespace else WILDCARD * 3
+        operation += addresser.hashup(verb)[0:3] \
+            if verb else WILDCARD * 3
+        if matched is not None:
+            operation += '1' if matched else '0'
+
+        partition = addresser.agreement_mtype_address
+        if agreement is not None:
+            partition = addresser.agreement_address(
+                addresser.agreement_hash(*agreement_public_keys(agreement)))
+        else:
+            partition += WILDCARD * 8
+        self._plans = [
+            _plan(partition + operation),
+            _plan(addresser.mtype_address + operation)]
+
+    @property
+    def prefixes(self):
+        """The state subtrees to list"""
+        return [prefix for prefix, _ in self._plans]
+
+    def starts(self, cursor=None):
+        """(prefix, start) of the subtrees left to list after cursor
+
+        cursor is the last address of a previous page, start is None or
+        the cursor for the subtree it is in
+        """
+        if cursor is None:
+            return [(prefix, None) for prefix in self.prefixes]
+        for index, (prefix, _) in enumerate(self._plans):
+            if cursor.startswith(prefix):
+                return [(prefix, cursor)] + [
+                    (later, None) for later in self.prefixes[index + 1:]]
+        raise DataException("Cursor {} is not in the listing".format(cursor))
+
+    def accepts(self, address):
+        """True if address satisfies the filters outside of its prefix"""
+        for prefix, checks in self._plans:
+            if address.startswith(prefix):
+                return all(address[index] == char for index, char in checks)
+        return False
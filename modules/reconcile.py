@@ -0,0 +1,202 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""reconcile - Bulk re-check of the committed exchanges of an agreement
+
+Every MTXQ is joined with the UTXQ it matched and the 12 equation values
+are laid out as columns (object arrays, the primes are 172 bits) so the
+quantity, unit and asset equations are checked a chunk at a time.
+
+Memory is bounded by memory_budget. Half of it holds the UTXQ join
+table, the MTXQ stream is hash partitioned by matched UTXQ address so
+each pass only keeps its share of UTXQs. The other half holds a column
+chunk.
+"""
+import math
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from shared.rest_client import RestClient
+
+from modules.config import sawtooth_rest_host, key_owner, agreement_secret
+from modules.decode import (
+    utxq_addresser, mtxq_addresser, iter_encrypted_state, quantity_ints)
+from modules.query import ExchangeQuery
+
+from protobuf.exchange_pb2 import UTXQ, MTXQ
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+MAX_VIOLATIONS = 1000
+
+# Approximate resident bytes of one joined UTXQ and one chunk row,
+# Python ints of up to 172 bits and their references
+UTXQ_BYTES = 512
+ROW_BYTES = 1024
+
+EQUATIONS = ('quantity', 'unit', 'asset')
+COLUMNS = 12
+
+
+def __partition(address, partitions):
+    return zlib.crc32(address.encode()) % partitions
+
+
+class Reconciliation(object):
+    """Accumulates violations and net positions over column chunks
+
+    Net positions are keyed by party, asset prime and unit prime. Each
+    match debits the quantity a party committed and credits it with the
+    quantity its counterparty committed
+    """
+
+    def __init__(self, max_violations=MAX_VIOLATIONS):
+        self.rows = 0
+        self.violation_count = 0
+        self.violations = []
+        self.positions = defaultdict(int)
+        self._max_violations = max_violations
+
+    def violation(self, address, reasons):
+        self.violation_count += 1
+        if len(self.violations) < self._max_violations:
+            self.violations.append(
+                {'address': address, 'violations': reasons})
+
+    def add_chunk(self, columns, size, parties, addresses):
+        """Checks the first size rows of the 12 x n object columns"""
+        self.rows += size
+        failed = np.zeros(size, dtype=bool)
+        failures = []
+        for index, _ in enumerate(EQUATIONS):
+            i, n, d, r = columns[index * 4:index * 4 + 4, :size]
+            bad = ((d == 0) | (i * n != d * r)).astype(bool)
+            failures.append(bad)
+            failed |= bad
+        for row in np.flatnonzero(failed):
+            self.violation(addresses[row], [
+                name for name, bad in zip(EQUATIONS, failures) if bad[row]])
+
+        # value, unit and asset of the initiate (0, 4, 8) and the
+        # reciprocate (3, 7, 11) columns
+        for row in range(size):
+            initiator, reciprocator = parties[row]
+            value_i, unit_i, asset_i = columns[0::4, row]
+            value_r, unit_r, asset_r = columns[3::4, row]
+            self.positions[(initiator, asset_i, unit_i)] -= value_i
+            self.positions[(reciprocator, asset_i, unit_i)] += value_i
+            self.positions[(reciprocator, asset_r, unit_r)] -= value_r
+            self.positions[(initiator, asset_r, unit_r)] += value_r
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'violation_count': self.violation_count,
+            'violations': self.violations,
+            'positions': [
+                {
+                    'party': party,
+                    'asset': str(asset),
+                    'unit': str(unit),
+                    'net': str(net)}
+                for (party, asset, unit), net in sorted(
+                    self.positions.items(), key=lambda x: x[0])
+                if net != 0]}
+
+
+def __iter_exchanges(addresser, agreement, secret):
+    """Decrypted (address, data) of the agreement in both layouts"""
+    for prefix in ExchangeQuery(addresser, agreement).prefixes:
+        for entry in iter_encrypted_state(prefix, secret, resolve=False):
+            yield entry
+
+
+def __matched_utxqs(agreement, secret, partition, partitions):
+    """Join table of matched UTXQ address to (party, value, unit, asset)
+
+    A 0.5.0 match leaves a tombstone at the matched address, so UTXQs
+    are taken from their unmatched address and keyed by the matched one
+    """
+    utxqs = {}
+    for address, data in __iter_exchanges(
+            utxq_addresser, agreement, secret):
+        if utxq_addresser.is_tombstone(data):
+            continue
+        key = mtxq_addresser.set_utxq_matched(address)
+        if __partition(key, partitions) != partition:
+            continue
+        utxq = UTXQ()
+        utxq.ParseFromString(data)
+        utxqs[key] = (key_owner(utxq.plus.decode()),) + \
+            quantity_ints(utxq.quantity, agreement)
+    return utxqs
+
+
+def reconcile(
+        agreement,
+        memory_budget=DEFAULT_MEMORY_BUDGET,
+        max_violations=MAX_VIOLATIONS):
+    """Re-checks every committed match of an agreement
+
+    Returns rows checked, violations (bounded by max_violations) and
+    the non zero net positions
+    """
+    secret = agreement_secret(agreement)
+    client = RestClient(sawtooth_rest_host())
+    utxq_count = sum(
+        1 for prefix in ExchangeQuery(utxq_addresser, agreement).prefixes
+        for entry in client.iter_state(prefix))
+    partitions = max(
+        1, math.ceil(utxq_count * UTXQ_BYTES * 2 / memory_budget))
+    chunk_rows = max(1, memory_budget // (2 * ROW_BYTES))
+
+    result = Reconciliation(max_violations)
+    columns = np.empty((COLUMNS, chunk_rows), dtype=object)
+    for partition in range(partitions):
+        utxqs = __matched_utxqs(agreement, secret, partition, partitions)
+        size = 0
+        parties = []
+        addresses = []
+        for address, data in __iter_exchanges(
+                mtxq_addresser, agreement, secret):
+            mtxq = MTXQ()
+            mtxq.ParseFromString(data)
+            uaddr = mtxq_addresser.set_utxq_matched(mtxq.utxq_addr.decode())
+            if __partition(uaddr, partitions) != partition:
+                continue
+            if uaddr not in utxqs:
+                result.violation(address, ['missing utxq'])
+                continue
+            initiator, value, unit, asset = utxqs[uaddr]
+            numerator = quantity_ints(mtxq.ratio.numerator, agreement)
+            denominator = quantity_ints(mtxq.ratio.denominator, agreement)
+            reciprocate = quantity_ints(mtxq.quantity, agreement)
+            columns[:, size] = (
+                value, numerator[0], denominator[0], reciprocate[0],
+                unit, numerator[1], denominator[1], reciprocate[1],
+                asset, numerator[2], denominator[2], reciprocate[2])
+            parties.append((initiator, key_owner(mtxq.plus.decode())))
+            addresses.append(address)
+            size += 1
+            if size == chunk_rows:
+                result.add_chunk(columns, size, parties, addresses)
+                size = 0
+                parties = []
+                addresses = []
+        if size:
+            result.add_chunk(columns, size, parties, addresses)
+    return result.to_dict()
@@ -15,15 +15,19 @@
 # ------------------------------------------------------------------------------
 
 import logging
-
-# from ecies import aes_encrypt, aes_decrypt
+from functools import lru_cache
 
 from sawtooth_sdk.messaging.future import FutureTimeoutError
 from sawtooth_sdk.processor.exceptions import InternalError
 from sawtooth_signing.secp256k1 import (
     Secp256k1PrivateKey, Secp256k1PublicKey)
 
+from modules import envelope
+
 STATE_TIMEOUT_SEC = 10
+
+# ECDH secrets by key pair, one per agreement
+SECRET_CACHE_SIZE = 4096
 LOGGER = logging.getLogger(__name__)
 
 
@@ -52,6 +56,18 @@ class State():
                 'Data does not exists for {}'.format(address))
         return exchange_list
 
+    def get_state_list(self, addresses):
+        """Merkle trie get_state for many addresses in one request
+
+        Returns the entries that exist, absent addresses are omitted
+        """
+        try:
+            return self.context.get_state(
+                addresses, timeout=STATE_TIMEOUT_SEC)
+        except FutureTimeoutError:
+            raise InternalError(
+                'Timeout on getting {} addresses'.format(len(addresses)))
+
     def get(self, returnObject, address):
         """Simple get and deserialize"""
         returnObject.ParseFromString(
@@ -71,6 +87,20 @@ class State():
                 'Unable to save exchange for address {}'.
                 format(address))
 
+    def set_all(self, entries):
+        """Sets a dict of address: data in one request"""
+        try:
+            addresses = self.context.set_state(
+                entries,
+                timeout=STATE_TIMEOUT_SEC)
+        except FutureTimeoutError:
+            raise InternalError(
+                'Unable to set {} addresses'.format(len(entries)))
+        if len(addresses) != len(entries):
+            raise StateDataNotFound(
+                'Unable to save exchange for addresses {}'.
+                format(list(entries)))
+
     @staticmethod
     def get_private_secp256k1(private_hex_string):
         """Return and instance of a sawtooth private key"""
@@ -82,28 +112,40 @@ class State():
         return Secp256k1PublicKey.from_hex(public_hex_string)
 
     @staticmethod
+    @lru_cache(maxsize=SECRET_CACHE_SIZE)
     def get_secret(private_str, public_str):
-        """Creates a diffe-hellman secret"""
+        """Creates a diffe-hellman secret, recently used pairs are kept"""
         priv = State.get_private_secp256k1(private_str)
         pub = State.get_public_hex_secp256k1(public_str)
         return pub.secp256k1_public_key.ecdh(priv.as_bytes())
 
     @staticmethod
     def encrypt_object_with(object, secret):
-        # return aes_encrypt(secret, object)
-        return object
+        return envelope.seal(object, secret)
 
     @staticmethod
     def decrypt_object_with(object, secret):
-        # return aes_decrypt(secret, object)
-        return object
+        return envelope.open_sealed(object, secret)
+
+    @staticmethod
+    def seal_with(object, secret):
+        """Encrypts a blob into a binary envelope"""
+        return envelope.seal(object, secret)
+
+    @staticmethod
+    def open_with(blob, secret):
+        """Decrypts an envelope or a hex blob
+
+        Returns None for an envelope sealed with another secret
+        """
+        return envelope.open_sealed(blob, secret)
 
     def encrypt_from(self, object, private_str, public_str):
         """Encrypts a blob"""
-        return object
-        # return aes_encrypt(State.get_secret(private_str, public_str), object)
+        return State.seal_with(
+            object, State.get_secret(private_str, public_str))
 
     def decrypt_for(self, object, private_str, public_str):
         """Decryptes a byte string blob"""
-        return object
-        # return aes_decrypt(State.get_secret(private_str, public_str), object)
+        return State.open_with(
+            object, State.get_secret(private_str, public_str))
@@ -0,0 +1,124 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+
+from modules.address import Address, ExchangeAddress
+from modules.envelope import seal
+
+from protobuf.exchange_pb2 import UTXQ as UTXQMessage
+
+UTXQ = Address.exchange_utxq_addresser()
+MTXQ = Address.exchange_mtxq_addresser()
+OPERATION = ('bags', 'peanuts')
+PARTNERS = ['02' + 'aa' * 32, '03' + 'bb' * 32]
+AGREEMENT_HASH = ExchangeAddress.agreement_hash(*PARTNERS)
+
+
+class TestExchangeLayouts(unittest.TestCase):
+
+    def test_legacy_layout(self):
+        address = UTXQ.utxq_unmatched(OPERATION, 'ident')
+        self.assertEqual(len(address), 70)
+        self.assertTrue(Address.valid_leaf_address(address))
+        self.assertEqual(address[0:18], UTXQ.mtype_address)
+        self.assertEqual(address[18:21], UTXQ.hashup('bags')[0:3])
+        self.assertEqual(address[21:24], UTXQ.hashup('peanuts')[0:3])
+        self.assertEqual(address[24], '0')
+        self.assertFalse(ExchangeAddress.is_agreement_layout(address))
+        self.assertIsNone(ExchangeAddress.agreement_segment(address))
+        self.assertEqual(ExchangeAddress.layout_version(address), '0.3.0')
+        self.assertEqual(ExchangeAddress.matched_index(address), 24)
+
+    def test_agreement_layout(self):
+        address = UTXQ.utxq_unmatched(OPERATION, 'ident', AGREEMENT_HASH)
+        self.assertEqual(len(address), 70)
+        self.assertTrue(Address.valid_leaf_address(address))
+        self.assertEqual(address[0:18], UTXQ.agreement_mtype_address)
+        self.assertEqual(address[18:26], AGREEMENT_HASH)
+        self.assertEqual(address[26:29], UTXQ.hashup('bags')[0:3])
+        self.assertEqual(address[29:32], UTXQ.hashup('peanuts')[0:3])
+        self.assertEqual(address[32], '0')
+        self.assertTrue(ExchangeAddress.is_agreement_layout(address))
+        self.assertEqual(
+            ExchangeAddress.agreement_segment(address), AGREEMENT_HASH)
+        self.assertEqual(ExchangeAddress.layout_version(address), '0.5.0')
+        self.assertEqual(ExchangeAddress.matched_index(address), 32)
+
+    def test_agreement_hash_ignores_partner_order(self):
+        self.assertEqual(
+            ExchangeAddress.agreement_hash(*reversed(PARTNERS)),
+            AGREEMENT_HASH)
+        self.assertEqual(len(AGREEMENT_HASH), 8)
+
+    def test_mtype_prefixes(self):
+        self.assertEqual(
+            UTXQ.mtype_addresses,
+            [UTXQ.agreement_mtype_address, UTXQ.mtype_address])
+        self.assertNotEqual(
+            UTXQ.agreement_mtype_address, MTXQ.agreement_mtype_address)
+        for agreement_hash in (None, AGREEMENT_HASH):
+            utxq = UTXQ.utxq_unmatched(OPERATION, 'ident', agreement_hash)
+            mtxq = MTXQ.mtxq_address(OPERATION, 'ident', agreement_hash)
+            self.assertTrue(UTXQ.is_mtype_prefix(utxq))
+            self.assertFalse(UTXQ.is_mtype_prefix(mtxq))
+            self.assertTrue(MTXQ.is_mtype_prefix(mtxq))
+            self.assertEqual(
+                ExchangeAddress.is_agreement_layout(mtxq),
+                agreement_hash is not None)
+
+    def test_matched_flag(self):
+        for agreement_hash in (None, AGREEMENT_HASH):
+            unmatched = UTXQ.utxq_unmatched(
+                OPERATION, 'ident', agreement_hash)
+            matched = MTXQ.set_utxq_matched(unmatched)
+            self.assertFalse(UTXQ.is_matched(unmatched))
+            self.assertTrue(UTXQ.is_matched(matched))
+            self.assertEqual(
+                [i for i, (a, b) in enumerate(zip(unmatched, matched))
+                 if a != b],
+                [ExchangeAddress.matched_index(unmatched)])
+            self.assertEqual(MTXQ.set_utxq_unmatched(matched), unmatched)
+            self.assertEqual(MTXQ.set_utxq_matched(matched), matched)
+
+    def test_partitions_do_not_collide(self):
+        self.assertNotEqual(
+            UTXQ.utxq_unmatched(OPERATION, 'ident', AGREEMENT_HASH),
+            UTXQ.utxq_unmatched(OPERATION, 'ident', '0' * 8))
+
+
+class TestTombstones(unittest.TestCase):
+
+    def test_versions(self):
+        self.assertEqual(UTXQ.family_versions, ['0.5.0', '0.4.0', '0.3.0'])
+        self.assertEqual(UTXQ.family_current_version, '0.5.0')
+
+    def test_tombstone_references_the_mtxq(self):
+        mtxq = MTXQ.mtxq_address(OPERATION, 'ident', AGREEMENT_HASH)
+        tombstone = ExchangeAddress.tombstone(mtxq)
+        self.assertEqual(len(tombstone), 4 + 35)
+        self.assertTrue(ExchangeAddress.is_tombstone(tombstone))
+        self.assertEqual(ExchangeAddress.tombstone_mtxq(tombstone), mtxq)
+
+    def test_state_is_not_a_tombstone(self):
+        utxq = UTXQMessage(
+            plus=b'alice', minus=b'bob', operation='bags.peanuts')
+        for data in (
+                b'',
+                utxq.SerializeToString(),
+                seal(utxq.SerializeToString(), b'secret'),
+                utxq.SerializeToString().hex().encode()):
+            self.assertFalse(ExchangeAddress.is_tombstone(data))
@@ -0,0 +1,92 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from base64 import b64encode
+from unittest import mock
+
+import modules.decode as decode
+from modules.decode import utxq_addresser, mtxq_addresser
+from modules.envelope import seal
+from modules.exceptions import AuthException
+
+SECRET = b'partner secret'
+OPERATION = ('bags', 'peanuts')
+AGREEMENT_HASH = '0123abcd'
+
+
+def unmatched(ident):
+    return utxq_addresser.utxq_unmatched(OPERATION, ident, AGREEMENT_HASH)
+
+
+def tombstone(ident):
+    return utxq_addresser.tombstone(
+        mtxq_addresser.mtxq_address(OPERATION, ident, AGREEMENT_HASH))
+
+
+def entry(address, data, secret=SECRET):
+    blob = data if utxq_addresser.is_tombstone(data) else seal(data, secret)
+    return {'address': address, 'data': b64encode(blob)}
+
+
+class TestTombstoneResolution(unittest.TestCase):
+
+    def setUp(self):
+        self.leaves = {}
+        client = mock.Mock()
+        client.get_leaf.side_effect = lambda address: {
+            'address': address, 'data': self.leaves[address]}
+        for name, value in (
+                ('RestClient', mock.Mock(return_value=client)),
+                ('sawtooth_rest_host', mock.Mock())):
+            patcher = mock.patch.object(decode, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = client
+
+    def _decrypt_entries(self, entries):
+        return getattr(decode, '__decrypt_entries')(entries, SECRET)
+
+    def test_listed_original_is_used(self):
+        matched = mtxq_addresser.set_utxq_matched(unmatched('a'))
+        result = self._decrypt_entries([
+            entry(unmatched('a'), b'utxq a'),
+            entry(matched, tombstone('a'))])
+        self.assertEqual(
+            [(e['address'], e['data']) for e in result],
+            [(unmatched('a'), b'utxq a'), (matched, b'utxq a')])
+        self.client.get_leaf.assert_not_called()
+
+    def test_unlisted_original_is_fetched(self):
+        matched = mtxq_addresser.set_utxq_matched(unmatched('a'))
+        self.leaves[unmatched('a')] = entry(unmatched('a'), b'utxq a')['data']
+        result = self._decrypt_entries([entry(matched, tombstone('a'))])
+        self.assertEqual(result[0]['data'], b'utxq a')
+        self.client.get_leaf.assert_called_once_with(unmatched('a'))
+
+    def test_foreign_entries_are_dropped(self):
+        result = self._decrypt_entries([
+            entry(unmatched('a'), b'utxq a', b'other secret'),
+            entry(unmatched('b'), b'utxq b')])
+        self.assertEqual(
+            [e['address'] for e in result], [unmatched('b')])
+
+    def test_foreign_original_is_refused(self):
+        matched = mtxq_addresser.set_utxq_matched(unmatched('a'))
+        self.leaves[unmatched('a')] = entry(
+            unmatched('a'), b'utxq a', b'other secret')['data']
+        with self.assertRaises(AuthException):
+            self._decrypt_entries([entry(matched, tombstone('a'))])
@@ -0,0 +1,106 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import binascii
+import unittest
+
+from modules import envelope
+from modules.envelope import (
+    seal, open_sealed, pack, unpack, is_envelope, key_id,
+    HEADER, NONCE_SIZE, TAG_SIZE,
+    ENVELOPE_VERSION, CIPHER_NONE, CIPHER_AES_GCM)
+from modules.exceptions import AuthException, DataException
+
+SECRET = b'agreement secret'
+PAYLOAD = b'serialized exchange state'
+
+
+def flip(blob, index):
+    tampered = bytearray(blob)
+    tampered[index] ^= 1
+    return bytes(tampered)
+
+
+class TestEnvelope(unittest.TestCase):
+
+    def test_round_trip(self):
+        blob = seal(PAYLOAD, SECRET)
+        self.assertEqual(open_sealed(blob, SECRET), PAYLOAD)
+        self.assertEqual(open_sealed(seal(b'', SECRET), SECRET), b'')
+
+    def test_layout(self):
+        blob = seal(PAYLOAD, SECRET)
+        self.assertEqual(
+            len(blob), HEADER.size + len(PAYLOAD) + TAG_SIZE)
+        self.assertTrue(is_envelope(blob))
+        cipher, kid, nonce, ciphertext, tag = unpack(memoryview(blob))
+        self.assertEqual(blob[0], ENVELOPE_VERSION)
+        self.assertEqual(cipher, CIPHER_AES_GCM)
+        self.assertEqual(kid, key_id(SECRET))
+        self.assertEqual(len(nonce), NONCE_SIZE)
+        self.assertNotEqual(bytes(ciphertext), PAYLOAD)
+        self.assertEqual(len(tag), TAG_SIZE)
+
+    def test_nonces_differ(self):
+        self.assertNotEqual(seal(PAYLOAD, SECRET), seal(PAYLOAD, SECRET))
+
+    def test_other_secret_is_none(self):
+        self.assertIsNone(open_sealed(seal(PAYLOAD, SECRET), b'other'))
+
+    def test_tampering_fails_authentication(self):
+        blob = seal(PAYLOAD, SECRET)
+        # Last nonce byte, first ciphertext byte and last tag byte
+        for index in (HEADER.size - 1, HEADER.size, len(blob) - 1):
+            with self.assertRaises(AuthException):
+                open_sealed(flip(blob, index), SECRET)
+
+    def test_truncated_tag_fails_authentication(self):
+        blob = seal(PAYLOAD, SECRET)
+        with self.assertRaises(AuthException):
+            open_sealed(blob[:-1], SECRET)
+
+    def test_unsupported_cipher(self):
+        blob = bytearray(seal(PAYLOAD, SECRET))
+        blob[1] = 9
+        with self.assertRaises(ValueError):
+            open_sealed(bytes(blob), SECRET)
+
+    def test_cipher_none_is_returned_as_is(self):
+        blob = pack(
+            CIPHER_NONE, SECRET, bytes(NONCE_SIZE), PAYLOAD, bytes(TAG_SIZE))
+        self.assertEqual(open_sealed(blob, SECRET), PAYLOAD)
+        self.assertIsInstance(open_sealed(blob, SECRET), bytes)
+
+    def test_legacy_hex_state(self):
+        blob = binascii.hexlify(PAYLOAD)
+        self.assertFalse(is_envelope(blob))
+        self.assertEqual(bytes(open_sealed(blob, SECRET)), PAYLOAD)
+
+    def test_neither_envelope_nor_hex(self):
+        for blob in (b'not hex', b'abc'):
+            with self.assertRaises(DataException):
+                open_sealed(blob, SECRET)
+
+    def test_hex_is_never_an_envelope(self):
+        self.assertTrue(all(
+            digit != ENVELOPE_VERSION for digit in b'0123456789abcdefABCDEF'))
+        self.assertFalse(is_envelope(bytes(HEADER.size + TAG_SIZE - 1)))
+
+    def test_ciphers_are_cached_per_secret(self):
+        self.assertIs(
+            envelope.cipher_for(SECRET), envelope.cipher_for(SECRET))
+        self.assertIsNot(
+            envelope.cipher_for(SECRET), envelope.cipher_for(b'other'))
@@ -0,0 +1,44 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import subprocess
+import unittest
+from unittest import mock
+
+from modules.hashblock_zksnark import zksnark_verify
+
+
+def completed(returncode, stdout):
+    return subprocess.CompletedProcess([], returncode, stdout, b'')
+
+
+class TestZksnarkVerify(unittest.TestCase):
+
+    def _verify(self, returncode, stdout, **kwargs):
+        with mock.patch(
+                'modules.hashblock_zksnark.subprocess.run',
+                return_value=completed(returncode, stdout)):
+            return zksnark_verify('keys/', 'proof', 'pairing', **kwargs)
+
+    def test_strict_reads_the_result(self):
+        self.assertTrue(self._verify(0, b'1\n'))
+        self.assertFalse(self._verify(0, b'0\n'))
+        self.assertFalse(self._verify(0, b''))
+        self.assertFalse(self._verify(1, b'0\n'))
+
+    def test_lenient_follows_the_exit_status(self):
+        self.assertTrue(self._verify(0, b'0\n', strict=False))
+        self.assertFalse(self._verify(255, b'', strict=False))
@@ -0,0 +1,128 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from unittest import mock
+
+from modules.address import Address
+from modules.exceptions import DataException
+from modules.query import ExchangeQuery, WILDCARD
+
+UTXQ = Address.exchange_utxq_addresser()
+MTXQ = Address.exchange_mtxq_addresser()
+PARTNERS = ['02' + 'aa' * 32, '03' + 'bb' * 32]
+AGREEMENT_HASH = UTXQ.agreement_hash(*PARTNERS)
+DUALITIES = {'bags': object(), 'boxes': object()}
+
+
+def address(namespace='bags', verb='peanuts', agreement_hash=None,
+            matched=False, ident='ident'):
+    result = UTXQ.utxq_unmatched((namespace, verb), ident, agreement_hash)
+    return MTXQ.set_utxq_matched(result) if matched else result
+
+
+class TestExchangeQuery(unittest.TestCase):
+
+    def setUp(self):
+        duality = mock.patch('modules.query.Duality')
+        duality.start().duality_for_ns.side_effect = DUALITIES.__getitem__
+        self.addCleanup(duality.stop)
+        keys = mock.patch(
+            'modules.query.agreement_public_keys', return_value=PARTNERS)
+        keys.start()
+        self.addCleanup(keys.stop)
+
+    def test_unfiltered_lists_both_layouts(self):
+        query = ExchangeQuery(UTXQ)
+        self.assertEqual(
+            query.prefixes,
+            [UTXQ.agreement_mtype_address, UTXQ.mtype_address])
+        self.assertTrue(query.accepts(address()))
+        self.assertTrue(query.accepts(address(agreement_hash='0' * 8)))
+        self.assertFalse(query.accepts(MTXQ.mtype_address + '0' * 52))
+
+    def test_agreement_limits_the_partition(self):
+        query = ExchangeQuery(UTXQ, 'agreement')
+        self.assertEqual(
+            query.prefixes,
+            [UTXQ.agreement_address(AGREEMENT_HASH), UTXQ.mtype_address])
+        self.assertTrue(query.accepts(address(agreement_hash=AGREEMENT_HASH)))
+        self.assertFalse(query.accepts(address(agreement_hash='0' * 8)))
+
+    def test_prefixes_are_even(self):
+        for matched in (None, True, False):
+            for agreement in (None, 'agreement'):
+                query = ExchangeQuery(
+                    UTXQ, agreement, namespace='bags', matched=matched)
+                self.assertTrue(
+                    all(len(prefix) % 2 == 0 for prefix in query.prefixes))
+
+    def test_namespace_after_wildcard_is_checked(self):
+        query = ExchangeQuery(UTXQ, namespace='bags')
+        self.assertEqual(
+            query.prefixes,
+            [UTXQ.agreement_mtype_address,
+             UTXQ.mtype_address + UTXQ.hashup('bags')[0:2]])
+        self.assertTrue(query.accepts(address()))
+        self.assertTrue(query.accepts(address(agreement_hash='0' * 8)))
+        self.assertFalse(query.accepts(address(namespace='boxes')))
+        self.assertFalse(query.accepts(
+            address(namespace='boxes', agreement_hash='0' * 8)))
+
+    def test_all_filters(self):
+        query = ExchangeQuery(
+            UTXQ, 'agreement', namespace='bags', verb='peanuts',
+            matched=True)
+        unmatched = address(agreement_hash=AGREEMENT_HASH)
+        self.assertEqual(
+            query.prefixes,
+            [unmatched[0:32], address()[0:24]])
+        self.assertTrue(query.accepts(
+            address(agreement_hash=AGREEMENT_HASH, matched=True)))
+        self.assertTrue(query.accepts(address(matched=True)))
+        self.assertFalse(query.accepts(unmatched))
+        self.assertFalse(query.accepts(address()))
+        self.assertFalse(query.accepts(address(
+            verb='grapes', agreement_hash=AGREEMENT_HASH, matched=True)))
+
+    def test_verb_without_namespace(self):
+        query = ExchangeQuery(UTXQ, verb='peanuts')
+        self.assertEqual(query.prefixes[1], UTXQ.mtype_address)
+        self.assertTrue(query.accepts(address()))
+        self.assertTrue(query.accepts(address(namespace='boxes')))
+        self.assertFalse(query.accepts(address(verb='grapes')))
+
+    def test_unknown_namespace(self):
+        with self.assertRaises(DataException):
+            ExchangeQuery(UTXQ, namespace='crates')
+
+    def test_starts(self):
+        query = ExchangeQuery(UTXQ, 'agreement')
+        first, second = query.prefixes
+        self.assertEqual(query.starts(), [(first, None), (second, None)])
+        cursor = address(agreement_hash=AGREEMENT_HASH)
+        self.assertEqual(
+            query.starts(cursor), [(first, cursor), (second, None)])
+        cursor = address()
+        self.assertEqual(query.starts(cursor), [(second, cursor)])
+        with self.assertRaises(DataException):
+            query.starts(address(agreement_hash='0' * 8))
+
+    def test_wildcards_are_not_checked(self):
+        query = ExchangeQuery(UTXQ, namespace='bags')
+        checks = [checks for _, checks in query._plans]
+        self.assertTrue(all(
+            char != WILDCARD for plan in checks for _, char in plan))
@@ -0,0 +1,185 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import modules.reconcile as reconcile
+from modules.reconcile import Reconciliation, COLUMNS
+from modules.decode import utxq_addresser, mtxq_addresser
+
+from protobuf.exchange_pb2 import UTXQ, MTXQ
+
+UNIT = 2 ** 171 + 133
+ASSET = 2 ** 170 + 81
+OTHER_UNIT = 2 ** 171 + 297
+OTHER_ASSET = 2 ** 170 + 163
+AGREEMENT_HASH = '0123abcd'
+
+
+def column_chunk(rows):
+    columns = np.empty((COLUMNS, len(rows)), dtype=object)
+    for index, row in enumerate(rows):
+        columns[:, index] = row
+    return columns
+
+
+def row(value, numerator, denominator, reciprocate):
+    """Quantity equation over fixed units and assets"""
+    return (
+        value, numerator, denominator, reciprocate,
+        UNIT, OTHER_UNIT, UNIT, OTHER_UNIT,
+        ASSET, OTHER_ASSET, ASSET, OTHER_ASSET)
+
+
+def quantity(message, value, unit, asset):
+    message.value = value.to_bytes(4, 'little')
+    message.unit = unit.to_bytes(22, 'little')
+    message.asset = asset.to_bytes(22, 'little')
+
+
+def utxq_address(ident):
+    return utxq_addresser.utxq_unmatched(
+        ('bags', 'peanuts'), ident, AGREEMENT_HASH)
+
+
+def exchanges(count, missing=0):
+    """count UTXQs, their MTXQs and MTXQs of missing UTXQs"""
+    utxqs = []
+    mtxqs = []
+    for index in range(count + missing):
+        uaddr = utxq_address(str(index))
+        if index < count:
+            utxq = UTXQ(plus=b'alice', minus=b'bob', operation='bags.peanuts')
+            quantity(utxq.quantity, 10 + index, UNIT, ASSET)
+            utxqs.append((uaddr, utxq.SerializeToString()))
+            utxqs.append((
+                mtxq_addresser.set_utxq_matched(uaddr),
+                utxq_addresser.tombstone('ab' * 35)))
+        mtxq = MTXQ(
+            plus=b'bob', minus=b'alice', operation='bags.give',
+            utxq_addr=uaddr.encode())
+        # Every other MTXQ does not balance its quantity equation
+        quantity(mtxq.quantity, 2 * (10 + index) + index % 2,
+                 OTHER_UNIT, OTHER_ASSET)
+        quantity(mtxq.ratio.numerator, 2, OTHER_UNIT, OTHER_ASSET)
+        quantity(mtxq.ratio.denominator, 1, UNIT, ASSET)
+        mtxqs.append(('mtxq{}'.format(index), mtxq.SerializeToString()))
+    return utxqs, mtxqs
+
+
+class TestReconciliation(unittest.TestCase):
+
+    def test_balanced_rows_have_no_violations(self):
+        result = Reconciliation()
+        result.add_chunk(
+            column_chunk([row(10, 3, 2, 15), row(4, 1, 4, 1)]),
+            2, [('alice', 'bob')] * 2, ['a0', 'a1'])
+        self.assertEqual(result.violation_count, 0)
+        self.assertEqual(result.rows, 2)
+
+    def test_violations_name_each_equation(self):
+        result = Reconciliation()
+        bad_unit = list(row(10, 3, 2, 15))
+        bad_unit[7] = UNIT
+        result.add_chunk(
+            column_chunk([row(10, 3, 2, 16), bad_unit, row(10, 3, 0, 0)]),
+            3, [('alice', 'bob')] * 3, ['a0', 'a1', 'a2'])
+        self.assertEqual(result.to_dict()['violations'], [
+            {'address': 'a0', 'violations': ['quantity']},
+            {'address': 'a1', 'violations': ['unit']},
+            {'address': 'a2', 'violations': ['quantity']}])
+
+    def test_only_size_rows_are_checked(self):
+        result = Reconciliation()
+        columns = column_chunk([row(10, 3, 2, 15), row(10, 3, 2, 16)])
+        result.add_chunk(columns, 1, [('alice', 'bob')], ['a0'])
+        self.assertEqual(result.violation_count, 0)
+        self.assertEqual(result.rows, 1)
+
+    def test_violations_are_bounded(self):
+        result = Reconciliation(max_violations=1)
+        result.add_chunk(
+            column_chunk([row(10, 3, 2, 16)] * 3),
+            3, [('alice', 'bob')] * 3, ['a0', 'a1', 'a2'])
+        self.assertEqual(result.violation_count, 3)
+        self.assertEqual(len(result.violations), 1)
+
+    def test_net_positions(self):
+        result = Reconciliation()
+        result.add_chunk(
+            column_chunk([row(10, 3, 2, 15)]),
+            1, [('alice', 'bob')], ['a0'])
+        positions = {
+            (p['party'], p['asset'], p['unit']): p['net']
+            for p in result.to_dict()['positions']}
+        self.assertEqual(positions, {
+            ('alice', str(ASSET), str(UNIT)): '-10',
+            ('bob', str(ASSET), str(UNIT)): '10',
+            ('bob', str(OTHER_ASSET), str(OTHER_UNIT)): '-15',
+            ('alice', str(OTHER_ASSET), str(OTHER_UNIT)): '15'})
+
+    def test_partition_is_stable(self):
+        partition = getattr(reconcile, '__partition')
+        self.assertEqual(partition('address', 7), partition('address', 7))
+        self.assertTrue(
+            all(0 <= partition(str(i), 3) < 3 for i in range(100)))
+
+
+class TestReconcile(unittest.TestCase):
+
+    def setUp(self):
+        self.utxqs, self.mtxqs = exchanges(6, missing=1)
+        query = mock.Mock(prefixes=['prefix'])
+        client = mock.Mock()
+        client.iter_state.side_effect = lambda prefix: iter(self.utxqs)
+        for name, value in (
+                ('__iter_exchanges', self._iter_exchanges),
+                ('ExchangeQuery', mock.Mock(return_value=query)),
+                ('RestClient', mock.Mock(return_value=client)),
+                ('sawtooth_rest_host', mock.Mock()),
+                ('agreement_secret', mock.Mock(return_value=b'secret')),
+                ('key_owner', lambda key: key)):
+            patcher = mock.patch.object(reconcile, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _iter_exchanges(self, addresser, agreement, secret):
+        return iter(self.utxqs if addresser is utxq_addresser
+                    else self.mtxqs)
+
+    def test_matches_are_checked(self):
+        result = reconcile.reconcile('agreement')
+        self.assertEqual(result['rows'], 6)
+        self.assertEqual(result['violation_count'], 4)
+        self.assertEqual(
+            sorted(v['address'] for v in result['violations']),
+            ['mtxq1', 'mtxq3', 'mtxq5', 'mtxq6'])
+        self.assertIn(
+            {'address': 'mtxq6', 'violations': ['missing utxq']},
+            result['violations'])
+
+    def test_partitions_and_chunks_agree(self):
+        expected = reconcile.reconcile('agreement')
+        # Several partitions of the join table and one row chunks
+        result = reconcile.reconcile('agreement', memory_budget=1024)
+
+        def by_address(result):
+            return dict(result, violations=sorted(
+                result['violations'], key=lambda v: v['address']))
+        self.assertEqual(by_address(result), by_address(expected))
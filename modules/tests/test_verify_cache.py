@@ -0,0 +1,124 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from modules.hashblock_zksnark import verify_keyname
+from modules.verify_cache import VerifyCache, verifier_key_id
+
+
+class TestVerifyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.key_path = tempfile.mkdtemp()
+        self.key_file = os.path.join(self.key_path, verify_keyname())
+        self._write_key(b'verifier key')
+        patcher = mock.patch(
+            'modules.verify_cache.zksnark_verify', return_value=True)
+        self.verifier = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.key_path)
+
+    def _write_key(self, content, mtime_ns=None):
+        with open(self.key_file, 'wb') as vk:
+            vk.write(content)
+        if mtime_ns is not None:
+            os.utime(self.key_file, ns=(mtime_ns, mtime_ns))
+
+    def _cache(self, size=100):
+        return VerifyCache(os.path.join(self.key_path, 'verified.db'), size)
+
+    def test_digest_separates_parts(self):
+        self.assertNotEqual(
+            VerifyCache.digest('key', 'ab', 'c'),
+            VerifyCache.digest('key', 'a', 'bc'))
+        self.assertEqual(
+            VerifyCache.digest('key', 'proof', b'pairing'),
+            VerifyCache.digest('key', b'proof', 'pairing'))
+
+    def test_digest_includes_scheme_and_key(self):
+        digest = VerifyCache.digest('key', 'proof', 'pairing')
+        self.assertNotEqual(
+            digest, VerifyCache.digest('key', 'proof', 'pairing', 'gg'))
+        self.assertNotEqual(
+            digest, VerifyCache.digest('other', 'proof', 'pairing'))
+
+    def test_key_id_follows_file_content(self):
+        first = verifier_key_id(self.key_path, verify_keyname())
+        self._write_key(b'rotated key', mtime_ns=1)
+        self.assertNotEqual(
+            first, verifier_key_id(self.key_path, verify_keyname()))
+
+    def test_second_verify_is_a_hit(self):
+        cache = self._cache()
+        self.assertTrue(cache.verify(self.key_path, 'proof', 'pairing'))
+        self.assertTrue(cache.verify(self.key_path, 'proof', 'pairing'))
+        self.assertEqual(self.verifier.call_count, 1)
+        self.assertEqual(
+            cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_failure_is_not_remembered(self):
+        cache = self._cache()
+        self.verifier.return_value = False
+        self.assertFalse(cache.verify(self.key_path, 'proof', 'pairing'))
+        self.verifier.return_value = True
+        self.assertTrue(cache.verify(self.key_path, 'proof', 'pairing'))
+        self.assertEqual(self.verifier.call_count, 2)
+        self.assertEqual(cache.hits, 0)
+
+    def test_key_rotation_misses(self):
+        cache = self._cache()
+        cache.verify(self.key_path, 'proof', 'pairing')
+        self._write_key(b'rotated key', mtime_ns=1)
+        cache.verify(self.key_path, 'proof', 'pairing')
+        self.assertEqual(self.verifier.call_count, 2)
+
+    def test_oldest_entries_are_evicted(self):
+        cache = self._cache(size=2)
+        for proof in ('one', 'two', 'three'):
+            cache.verify(self.key_path, proof, 'pairing')
+        cache.verify(self.key_path, 'three', 'pairing')
+        cache.verify(self.key_path, 'one', 'pairing')
+        self.assertEqual(self.verifier.call_count, 4)
+        self.assertEqual(cache.hits, 1)
+
+    def test_size_zero_disables(self):
+        cache = self._cache(size=0)
+        self.assertFalse(cache.enabled)
+        cache.verify(self.key_path, 'proof', 'pairing')
+        cache.verify(self.key_path, 'proof', 'pairing')
+        self.assertEqual(self.verifier.call_count, 2)
+
+    def test_no_path_disables(self):
+        cache = VerifyCache(None)
+        self.assertFalse(cache.enabled)
+        cache.verify(self.key_path, 'proof', 'pairing')
+        cache.verify(self.key_path, 'proof', 'pairing')
+        self.assertEqual(self.verifier.call_count, 2)
+
+    def test_lenient_results_are_not_cached(self):
+        cache = self._cache()
+        cache.verify(self.key_path, 'proof', 'pairing', strict=False)
+        cache.verify(self.key_path, 'proof', 'pairing')
+        self.assertEqual(self.verifier.call_count, 2)
+        self.assertFalse(self.verifier.call_args_list[0][0][5])
+        self.assertEqual(cache.hits, 0)
@@ -0,0 +1,192 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""verify_cache - Shared zksnark verification result cache
+
+A transaction is applied at least twice on every node (publish and
+validate), and again on forks. Successful verifications are recorded
+in a bounded sqlite table so that any process on the node can skip the
+pairing check for a proof it has already seen. A hit is trusted like a
+passed check, the table must only be writable by the validator.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+from modules.hashblock_zksnark import (
+    zksnark_verify, zksnark_verify_compact, compact_header,
+    verify_keyname, SCHEME_PPZKSNARK)
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_VERIFY_CACHE_SIZE = 100000
+STATS_LOG_INTERVAL = 1000
+SQLITE_TIMEOUT_SEC = 5
+
+_KEY_IDS = {}
+
+
+def verifier_key_id(file_path, key_name):
+    """Digest of the verifier key file content
+
+    The digest is part of every cache key so that rotating the key
+    invalidates everything verified with the old one
+    """
+    key_file = os.path.join(file_path, key_name)
+    mtime = os.stat(key_file).st_mtime_ns
+    cached = _KEY_IDS.get(key_file)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(key_file, 'rb') as vk:
+        key_id = hashlib.sha256(vk.read()).hexdigest()
+    _KEY_IDS[key_file] = (mtime, key_id)
+    return key_id
+
+
+class VerifyCache(object):
+    """Bounded table of successful verification digests
+
+    Only successful verifications are recorded, a failure may come from
+    hbzksnark itself and must not be remembered.
+    """
+
+    def __init__(self, path, size=DEFAULT_VERIFY_CACHE_SIZE):
+        self._path = path
+        self._size = size
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path and size > 0:
+            self._db = sqlite3.connect(
+                path, timeout=SQLITE_TIMEOUT_SEC, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS verified '
+                '(digest BLOB PRIMARY KEY)')
+            self._db.commit()
+
+    @property
+    def enabled(self):
+        return self._db is not None
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def hit_rate(self):
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Returns the hit rate counters for this process"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate}
+
+    @staticmethod
+    def digest(key_id, proof_str, pairing_str, scheme=SCHEME_PPZKSNARK):
+        """Cache key for a verification request"""
+        hasher = hashlib.sha256()
+        for part in (scheme, key_id, proof_str, pairing_str):
+            encoded = part if isinstance(part, bytes) else part.encode()
+            hasher.update(len(encoded).to_bytes(4, byteorder='little'))
+            hasher.update(encoded)
+        return hasher.digest()
+
+    def _contains(self, digest):
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    'SELECT 1 FROM verified WHERE digest = ?',
+                    (digest,)).fetchone()
+        except sqlite3.Error as e:
+            LOGGER.warning("Verification cache lookup failed: %s", e)
+            row = None
+        return row is not None
+
+    def _add(self, digest):
+        try:
+            with self._lock:
+                self._db.execute(
+                    'INSERT OR IGNORE INTO verified (digest) VALUES (?)',
+                    (digest,))
+                self._db.execute(
+                    'DELETE FROM verified WHERE rowid <= '
+                    '(SELECT MAX(rowid) FROM verified) - ?',
+                    (self._size,))
+                self._db.commit()
+        except sqlite3.Error as e:
+            LOGGER.warning("Verification cache update failed: %s", e)
+
+    def _count(self, hit):
+        if hit:
+            self._hits += 1
+        else:
+            self._misses += 1
+        if (self._hits + self._misses) % STATS_LOG_INTERVAL == 0:
+            LOGGER.info(
+                "Verification cache hits %d misses %d hit rate %.1f%%",
+                self._hits, self._misses, self.hit_rate * 100)
+
+    def verify(
+            self, file_path, proof_str, pairing_str,
+            scheme=SCHEME_PPZKSNARK, batch_size=0, strict=True):
+        """Verifies equation match, consulting the cache first
+
+        Results that are not strict are never cached, see zksnark_verify
+        """
+        if not self.enabled or not strict:
+            return zksnark_verify(
+                file_path, proof_str, pairing_str, scheme, batch_size,
+                strict)
+        digest = self.digest(
+            verifier_key_id(file_path, verify_keyname(scheme, batch_size)),
+            proof_str, pairing_str, scheme)
+        if self._contains(digest):
+            self._count(True)
+            return True
+        self._count(False)
+        vres = zksnark_verify(
+            file_path, proof_str, pairing_str, scheme, batch_size)
+        if vres:
+            self._add(digest)
+        return vres
+
+    def verify_compact(self, file_path, compact, scheme=SCHEME_PPZKSNARK):
+        """Verifies a compact proof envelope, consulting the cache first"""
+        if not self.enabled:
+            return zksnark_verify_compact(file_path, compact, scheme)
+        batch_size = compact_header(compact)[1]
+        digest = self.digest(
+            verifier_key_id(file_path, verify_keyname(scheme, batch_size)),
+            compact, b'', scheme)
+        if self._contains(digest):
+            self._count(True)
+            return True
+        self._count(False)
+        vres = zksnark_verify_compact(file_path, compact, scheme)
+        if vres:
+            self._add(digest)
+        return vres
@@ -0,0 +1,113 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Side by side proving and verification figures for each scheme
+
+Reports proof size, proving time and verifications per second with the
+raw and the processed verifyer key, then the amortized cost per match
+of the batched circuits and the size and parse time of the text and
+compact proof encodings. Run from this directory after building
+hbzksnark into build/
+"""
+
+import subprocess
+import sys
+
+secret_str = "5,2,1,10,2,5,2,5,3,7,3,7"
+data_str = "10,4,2,20,11,13,11,13,17,19,17,19"
+iterations = sys.argv[1] if len(sys.argv) > 1 else "100"
+schemes = ['ppzksnark', 'gg']
+batch_sizes = [8, 32, 128]
+
+results = {}
+for scheme in schemes:
+    key_gen = subprocess.run(
+        ['build/hbzksnark', '-g', 'build/', secret_str, scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if key_gen.returncode != 0:
+        sys.exit("{} genkey fault {}".format(scheme, key_gen))
+
+    bench = subprocess.run(
+        ['build/hbzksnark', '-b', 'build/', data_str, iterations, scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if bench.returncode != 0:
+        sys.exit("{} benchmark fault {}".format(scheme, bench))
+    results[scheme] = [
+        float(x) for x in bench.stderr.decode("utf-8").split()[-5:]]
+
+rows = [
+    ("proof size (base64 bytes)", 0, "{:>14.0f}"),
+    ("proving time (ms)", 1, "{:>14.2f}"),
+    ("raw key verify (/s)", 2, "{:>14.1f}"),
+    ("processed key verify (/s)", 3, "{:>14.1f}"),
+    ("key preprocessing (ms)", 4, "{:>14.2f}")]
+
+print("{} iterations".format(iterations))
+print("{:<28}".format("") + "".join("{:>14}".format(s) for s in schemes))
+for label, index, fmt in rows:
+    print("{:<28}".format(label) + "".join(
+        fmt.format(results[s][index]) for s in schemes))
+
+# Batched circuits, full batches of the same equation. Per match figures
+# divide the batch proving time and multiply the verification rate
+print()
+print("{:<12}{:>8}{:>14}{:>18}{:>20}".format(
+    "scheme", "batch", "proof bytes", "prove ms/match", "verify matches/s"))
+for scheme in schemes:
+    print("{:<12}{:>8}{:>14.0f}{:>18.2f}{:>20.1f}".format(
+        scheme, 1, results[scheme][0], results[scheme][1],
+        results[scheme][3]))
+    for batch_size in batch_sizes:
+        size = str(batch_size)
+        key_gen = subprocess.run(
+            ['build/hbzksnark', '-G', 'build/', size, secret_str, scheme],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if key_gen.returncode != 0:
+            sys.exit("{} batch {} genkey fault {}".format(
+                scheme, size, key_gen))
+        bench = subprocess.run(
+            ['build/hbzksnark', '-B', 'build/', size,
+             ",".join([data_str] * batch_size), iterations, scheme],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if bench.returncode != 0:
+            sys.exit("{} batch {} benchmark fault {}".format(
+                scheme, size, bench))
+        proof_bytes, prove_ms, _, verify_per_sec, _ = [
+            float(x) for x in bench.stderr.decode("utf-8").split()[-5:]]
+        print("{:<12}{:>8}{:>14.0f}{:>18.2f}{:>20.1f}".format(
+            scheme, batch_size, proof_bytes, prove_ms / batch_size,
+            verify_per_sec * batch_size))
+
+# Proof and pairing bytes carried per MTXQ and verifier parse time
+print()
+print("{:<12}{:>12}{:>15}{:>16}{:>19}".format(
+    "scheme", "text bytes", "compact bytes", "text parse us",
+    "compact parse us"))
+for scheme in schemes:
+    key_gen = subprocess.run(
+        ['build/hbzksnark', '-g', 'build/', secret_str, scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if key_gen.returncode != 0:
+        sys.exit("{} genkey fault {}".format(scheme, key_gen))
+    bench = subprocess.run(
+        ['build/hbzksnark', '-e', 'build/', data_str, iterations, scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if bench.returncode != 0:
+        sys.exit("{} encoding fault {}".format(scheme, bench))
+    text_bytes, compact_bytes, text_us, compact_us = [
+        float(x) for x in bench.stderr.decode("utf-8").split()[-4:]]
+    print("{:<12}{:>12.0f}{:>15.0f}{:>16.1f}{:>19.1f}".format(
+        scheme, text_bytes, compact_bytes, text_us, compact_us))
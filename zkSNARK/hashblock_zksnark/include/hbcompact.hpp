@@ -0,0 +1,82 @@
+/*
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+*/
+
+#ifndef _HBCOMPACT_HPP
+#define _HBCOMPACT_HPP
+
+#include <cstdint>
+#include <string>
+
+#include <gmp.h>
+
+//  Compact proof envelope
+//
+//  Carries a proof and its primary input as bytes, little endian
+//     0  'HBZ'                    4  scheme id (ExchangePayload.Scheme)
+//     3  format version           5  reserved
+//     6  batch size, 0 if single  8  proof size
+//    12  primary input count
+//    16  proof stream (compressed points), then the primary input as
+//        fixed width field elements
+
+namespace hbcompact {
+
+    const char MAGIC[3] = {'H', 'B', 'Z'};
+    const uint8_t VERSION = 1;
+    const size_t HEADER_SIZE = 16;
+
+    struct header {
+        uint8_t scheme_id;
+        uint16_t batch_size;
+        uint32_t proof_size;
+        uint32_t input_count;
+    };
+
+    void put_uint(std::string&, uint64_t, size_t);
+    uint64_t get_uint(const char *, size_t);
+
+    std::string header_bytes(header const&);
+
+    //  Validates magic and version and returns the header
+    header read_header(std::string const&);
+
+    template<class FieldT>
+    size_t field_width()
+    {
+        return decltype(FieldT().as_bigint())::N * sizeof(mp_limb_t);
+    }
+
+    template<class FieldT>
+    void put_field(std::string& out, FieldT const& field)
+    {
+        auto value = field.as_bigint();
+        for (size_t i = 0; i < decltype(value)::N; ++i)
+            put_uint(out, value.data[i], sizeof(mp_limb_t));
+    }
+
+    template<class FieldT>
+    FieldT get_field(const char * in)
+    {
+        decltype(FieldT().as_bigint()) value;
+        for (size_t i = 0; i < decltype(value)::N; ++i)
+            value.data[i] = get_uint(
+                in + i * sizeof(mp_limb_t), sizeof(mp_limb_t));
+        return FieldT(value);
+    }
+
+} // hbcompact
+
+#endif /* _HBCOMPACT_HPP */
@@ -0,0 +1,110 @@
+/*
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+*/
+
+#ifndef _HBKEYFILE_HPP
+#define _HBKEYFILE_HPP
+
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+#include <istream>
+#include <sstream>
+#include <stdexcept>
+#include <streambuf>
+#include <string>
+
+//  Binary key files
+//
+//  A 16 byte header (magic 'HBK', format version, payload size) followed
+//  by the libsnark stream of the key. hbzksnark is built with
+//  BINARY_OUTPUT and MONTGOMERY_OUTPUT and without NO_PT_COMPRESSION, so
+//  the stream is fixed width field elements and compressed points.
+//  Files are memory mapped and parsed in place
+
+namespace hbkeyfile {
+
+    const char MAGIC[3] = {'H', 'B', 'K'};
+    const uint8_t VERSION = 1;
+    const size_t HEADER_SIZE = 16;
+
+    //  Binary companion of a base64 key file, 'name.pk' -> 'name.pkb'
+    std::string binary_keyname(std::string const&);
+
+    //  Read only mapping of a whole file
+    class mapped_file {
+    public:
+        explicit mapped_file(std::string const&);
+        ~mapped_file();
+        mapped_file(mapped_file const&) = delete;
+        mapped_file& operator=(mapped_file const&) = delete;
+
+        const char * data() const { return data_; }
+        size_t size() const { return size_; }
+
+    private:
+        const char * data_;
+        size_t size_;
+    };
+
+    //  Input stream buffer over a memory range, no copy is made
+    class memory_buffer : public std::streambuf {
+    public:
+        memory_buffer(const char * begin, size_t size) {
+            char * start = const_cast<char *>(begin);
+            setg(start, start, start + size);
+        }
+    };
+
+    //  Validates the header and returns the payload size
+    size_t check_header(mapped_file const&, std::string const&);
+
+    void write_header(std::ostream&, uint64_t);
+
+    //  Writes content to a temporary file and renames it to file_name,
+    //  readers see the old or the new file and never a partial one.
+    //  When source_name is given the file is dated after it, so that
+    //  is_newer_file holds for a key derived from the source
+    void replace_file(std::string const& file_name,
+        std::string const& content, std::string const& source_name = "");
+
+    template<class T>
+    T read_key(std::string const& file_name)
+    {
+        mapped_file mapped(file_name);
+        size_t payload_size = check_header(mapped, file_name);
+        memory_buffer buffer(mapped.data() + HEADER_SIZE, payload_size);
+        std::istream key_stream(&buffer);
+        T key;
+        key_stream >> key;
+        return key;
+    }
+
+    template<class T>
+    void write_key(std::string const& file_name, T const& key,
+        std::string const& source_name = "")
+    {
+        std::stringstream key_stream;
+        key_stream << key;
+        std::string payload = key_stream.str();
+        std::ostringstream key_file;
+        write_header(key_file, payload.size());
+        key_file.write(payload.data(), payload.size());
+        replace_file(file_name, key_file.str(), source_name);
+    }
+
+} // hbkeyfile
+
+#endif /* _HBKEYFILE_HPP */
@@ -0,0 +1,146 @@
+/*
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+*/
+
+#ifndef _HBSCHEMES_HPP
+#define _HBSCHEMES_HPP
+
+#include <cstdint>
+#include <string>
+
+#include <libsnark/common/default_types/r1cs_ppzksnark_pp.hpp>
+#include <libsnark/common/default_types/r1cs_gg_ppzksnark_pp.hpp>
+#include <libsnark/zk_proof_systems/ppzksnark/r1cs_ppzksnark/r1cs_ppzksnark.hpp>
+#include <libsnark/zk_proof_systems/ppzksnark/r1cs_gg_ppzksnark/r1cs_gg_ppzksnark.hpp>
+#include <hbutils.hpp>
+
+//  Proving scheme traits
+//  Each scheme names its key files, has the id used in compact proofs
+//  (matching ExchangePayload.Scheme) and forwards to the libsnark
+//  generator, prover and verifiers so hbzksnark can be written once
+
+namespace hbscheme {
+
+    using namespace libsnark;
+
+    //  PGHR13, the original hashblock scheme
+    struct ppzksnark {
+        typedef default_r1cs_ppzksnark_pp pp;
+        typedef libff::Fr<pp> field_type;
+        typedef r1cs_ppzksnark_keypair<pp> keypair_type;
+        typedef r1cs_ppzksnark_proving_key<pp> proving_key_type;
+        typedef r1cs_ppzksnark_verification_key<pp> verification_key_type;
+        typedef r1cs_ppzksnark_processed_verification_key<pp>
+            processed_verification_key_type;
+        typedef r1cs_ppzksnark_proof<pp> proof_type;
+
+        static const std::string name;
+        static const uint8_t id;
+
+        static std::string const& proove_keyname() {
+            return hbutil::PROOVE_KEYNAME;
+        }
+        static std::string const& verify_keyname() {
+            return hbutil::VERIFY_KEYNAME;
+        }
+        static std::string const& processed_verify_keyname() {
+            return hbutil::PROCESSED_VERIFY_KEYNAME;
+        }
+
+        static keypair_type generator(
+            r1cs_constraint_system<field_type> const& cs) {
+            return r1cs_ppzksnark_generator<pp>(cs);
+        }
+        static proof_type prover(proving_key_type const& pk,
+            r1cs_primary_input<field_type> const& primary_input,
+            r1cs_auxiliary_input<field_type> const& auxiliary_input) {
+            return r1cs_ppzksnark_prover<pp>(
+                pk, primary_input, auxiliary_input);
+        }
+        static processed_verification_key_type process_vk(
+            verification_key_type const& vk) {
+            return r1cs_ppzksnark_verifier_process_vk<pp>(vk);
+        }
+        static bool verifier(verification_key_type const& vk,
+            r1cs_primary_input<field_type> const& primary_input,
+            proof_type const& proof) {
+            return r1cs_ppzksnark_verifier_strong_IC<pp>(
+                vk, primary_input, proof);
+        }
+        static bool online_verifier(
+            processed_verification_key_type const& pvk,
+            r1cs_primary_input<field_type> const& primary_input,
+            proof_type const& proof) {
+            return r1cs_ppzksnark_online_verifier_strong_IC<pp>(
+                pvk, primary_input, proof);
+        }
+    };
+
+    //  Groth16, three element proofs and fewer pairings to verify
+    struct gg_ppzksnark {
+        typedef default_r1cs_gg_ppzksnark_pp pp;
+        typedef libff::Fr<pp> field_type;
+        typedef r1cs_gg_ppzksnark_keypair<pp> keypair_type;
+        typedef r1cs_gg_ppzksnark_proving_key<pp> proving_key_type;
+        typedef r1cs_gg_ppzksnark_verification_key<pp> verification_key_type;
+        typedef r1cs_gg_ppzksnark_processed_verification_key<pp>
+            processed_verification_key_type;
+        typedef r1cs_gg_ppzksnark_proof<pp> proof_type;
+
+        static const std::string name;
+        static const uint8_t id;
+
+        static std::string const& proove_keyname() {
+            return hbutil::GG_PROOVE_KEYNAME;
+        }
+        static std::string const& verify_keyname() {
+            return hbutil::GG_VERIFY_KEYNAME;
+        }
+        static std::string const& processed_verify_keyname() {
+            return hbutil::GG_PROCESSED_VERIFY_KEYNAME;
+        }
+
+        static keypair_type generator(
+            r1cs_constraint_system<field_type> const& cs) {
+            return r1cs_gg_ppzksnark_generator<pp>(cs);
+        }
+        static proof_type prover(proving_key_type const& pk,
+            r1cs_primary_input<field_type> const& primary_input,
+            r1cs_auxiliary_input<field_type> const& auxiliary_input) {
+            return r1cs_gg_ppzksnark_prover<pp>(
+                pk, primary_input, auxiliary_input);
+        }
+        static processed_verification_key_type process_vk(
+            verification_key_type const& vk) {
+            return r1cs_gg_ppzksnark_verifier_process_vk<pp>(vk);
+        }
+        static bool verifier(verification_key_type const& vk,
+            r1cs_primary_input<field_type> const& primary_input,
+            proof_type const& proof) {
+            return r1cs_gg_ppzksnark_verifier_strong_IC<pp>(
+                vk, primary_input, proof);
+        }
+        static bool online_verifier(
+            processed_verification_key_type const& pvk,
+            r1cs_primary_input<field_type> const& primary_input,
+            proof_type const& proof) {
+            return r1cs_gg_ppzksnark_online_verifier_strong_IC<pp>(
+                pvk, primary_input, proof);
+        }
+    };
+
+} // hbscheme
+
+#endif /* _HBSCHEMES_HPP */
@@ -25,8 +25,21 @@
 namespace hbutil {
 	extern const std::string VERIFY_KEYNAME;
 	extern const std::string PROOVE_KEYNAME;
+	extern const std::string PROCESSED_VERIFY_KEYNAME;
+	extern const std::string GG_VERIFY_KEYNAME;
+	extern const std::string GG_PROOVE_KEYNAME;
+	extern const std::string GG_PROCESSED_VERIFY_KEYNAME;
 }
 
+int toInt(const std::string&);
 std::vector<int> extract_ints(std::string const&);
+std::vector<int> extract_batch_ints(std::string const&, size_t);
+
+// Key file name for a batched circuit, 'name_b<size>.ext'
+std::string batch_keyname(std::string const&, size_t);
+
+// True if file_name exists and was modified after other_name, or
+// other_name is missing. Ties count as older
+bool is_newer_file(std::string const&, std::string const&);
 
 #endif /* _HBUTILS_HPP */
\ No newline at end of file
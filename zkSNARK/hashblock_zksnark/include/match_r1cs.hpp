@@ -1,6 +1,7 @@
 #ifndef MATCH_R1CS_HPP_
 #define MATCH_R1CS_HPP_
 
+#include <vector>
 #include <libsnark/relations/constraint_satisfaction_problems/r1cs/r1cs.hpp>
 
 namespace libsnark {
@@ -45,6 +46,15 @@ namespace libsnark {
         const int _r_2
     );
 
+    //  Batched variant, proves batch_size balancing equations at once.
+    //  values holds 12 integers per equation in generate_match_r1cs order,
+    //  equations beyond values.size() / 12 are padded with 1 * (1/1) = 1
+    template<typename FieldT>
+    match_r1cs<FieldT> generate_batch_match_r1cs(
+        const std::vector<int> &values,
+        const size_t batch_size
+    );
+
 } // libsnark
 
 #include "match_r1cs.tcc"
@@ -260,6 +260,117 @@ match_r1cs<FieldT> generate_match_r1cs(
 
 }
 
+template<typename FieldT>
+match_r1cs<FieldT> generate_batch_match_r1cs(
+    // Each equation k contributes the same 14 constraints as
+    // generate_match_r1cs. The primary input is the 12 values and the
+    // 'out' of every equation, in order, followed by 13 auxiliary
+    // variables per equation
+    const std::vector<int> &values,
+    const size_t batch_size)
+{
+    const size_t equation_values = 12;
+    const size_t equation_inputs = 13;
+    const size_t equation_constraints = 14;
+    const size_t equation_count = values.size() / equation_values;
+
+    if (batch_size == 0
+        || values.size() % equation_values != 0
+        || equation_count > batch_size)
+        throw std::invalid_argument(
+            "Batch requires up to batch size groups of 12 integers");
+
+    const size_t num_inputs = equation_inputs * batch_size;
+    const size_t num_constraints = equation_constraints * batch_size;
+
+    r1cs_constraint_system<FieldT> cs;
+    cs.primary_input_size = num_inputs;
+    cs.auxiliary_input_size = equation_inputs * batch_size;
+
+    r1cs_primary_input<FieldT> primary_input;
+    r1cs_auxiliary_input<FieldT> auxiliary_input;
+
+    for (size_t k = 0; k < batch_size; ++k) {
+        for (size_t j = 0; j < equation_values; ++j)
+            primary_input.push_back(FieldT(
+                k < equation_count ? values[k * equation_values + j] : 1));
+        primary_input.push_back(FieldT::one());
+    }
+
+    // Variable index 0 is the constant 1, primary inputs start at 1
+    size_t next_i = num_inputs + 1;
+    auto value_of = [&](size_t index) -> FieldT {
+        return index <= num_inputs
+            ? primary_input[index - 1]
+            : auxiliary_input[index - num_inputs - 1];
+    };
+    auto add_product = [&](size_t a_i, size_t b_i) -> size_t {
+        linear_combination<FieldT> A, B, C;
+        A.add_term(a_i, 1);
+        B.add_term(b_i, 1);
+        size_t c_i = next_i++;
+        C.add_term(c_i, 1);
+        auxiliary_input.push_back(value_of(a_i) * value_of(b_i));
+        cs.add_constraint(r1cs_constraint<FieldT>(A, B, C));
+        return c_i;
+    };
+
+    for (size_t k = 0; k < batch_size; ++k) {
+        const size_t base_i = equation_inputs * k + 1;
+        size_t s_i[3];
+
+        for (size_t e = 0; e < 3; ++e) {
+            const size_t i_i = base_i + 4 * e;
+
+            // i * n = in, d * r = dr
+            size_t in_i = add_product(i_i, i_i + 1);
+            size_t dr_i = add_product(i_i + 2, i_i + 3);
+
+            // in - dr = indr
+            linear_combination<FieldT> A_s, B_s, C_s;
+            B_s.add_term(0, 1);
+            A_s.add_term(in_i, 1);
+            A_s.add_term(dr_i, -1);
+            size_t indr_i = next_i++;
+            C_s.add_term(indr_i, 1);
+            FieldT indr = value_of(in_i) - value_of(dr_i);
+            auxiliary_input.push_back(indr);
+            cs.add_constraint(r1cs_constraint<FieldT>(A_s, B_s, C_s));
+
+            // indr + 1 = s
+            linear_combination<FieldT> A_o, B_o, C_o;
+            B_o.add_term(0, 1);
+            A_o.add_term(indr_i, 1);
+            A_o.add_term(0, 1);
+            s_i[e] = next_i++;
+            C_o.add_term(s_i[e], 1);
+            auxiliary_input.push_back(indr + FieldT::one());
+            cs.add_constraint(r1cs_constraint<FieldT>(A_o, B_o, C_o));
+        }
+
+        // s_0 * s_1 = ss
+        size_t ss_i = add_product(s_i[0], s_i[1]);
+
+        // s_2 * ss = out
+        linear_combination<FieldT> A_out, B_out, C_out;
+        A_out.add_term(s_i[2], 1);
+        B_out.add_term(ss_i, 1);
+        C_out.add_term(base_i + equation_values, 1);
+        cs.add_constraint(r1cs_constraint<FieldT>(A_out, B_out, C_out));
+    }
+
+    /* sanity checks */
+    assert(cs.num_variables() == num_inputs + auxiliary_input.size());
+    assert(cs.num_inputs() == num_inputs);
+    assert(cs.num_constraints() == num_constraints);
+    (void) num_constraints;
+    if (cs.is_satisfied(primary_input, auxiliary_input))
+        return match_r1cs<FieldT>(std::move(cs), std::move(primary_input), std::move(auxiliary_input));
+    else {
+        throw std::invalid_argument("CS not valid");
+    }
+}
+
 } // libsnark
 
 #endif // MATCH_R1CS_TCC_
\ No newline at end of file
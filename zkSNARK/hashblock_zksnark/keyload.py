@@ -0,0 +1,63 @@
+# ------------------------------------------------------------------------------
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Key file size, load time and peak resident memory, base64 vs binary
+
+Run from this directory after building hbzksnark into build/
+"""
+
+import os
+import subprocess
+import sys
+
+secret_str = "5,2,1,10,2,5,2,5,3,7,3,7"
+iterations = sys.argv[1] if len(sys.argv) > 1 else "20"
+schemes = {
+    'ppzksnark': 'hashblock_zkSNARK',
+    'gg': 'hashblock_zkSNARK_gg'}
+formats = ['b64', 'bin']
+
+
+def load(scheme, fmt, count):
+    """Run a key load, returns (pk_ms, vk_ms, peak rss kb)"""
+    proc = subprocess.Popen(
+        ['build/hbzksnark', '-l', 'build/', fmt, str(count), scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    err = proc.stderr.read().decode("utf-8")
+    if status != 0:
+        sys.exit("{} {} load fault {}".format(scheme, fmt, err))
+    pk_ms, vk_ms = [float(x) for x in err.split()[-2:]]
+    return pk_ms, vk_ms, rusage.ru_maxrss
+
+
+print("{} iterations".format(iterations))
+print("{:<10}{:>6}{:>12}{:>12}{:>10}{:>10}{:>12}".format(
+    "scheme", "fmt", "pk bytes", "vk bytes", "pk ms", "vk ms", "rss kb"))
+for scheme, base in schemes.items():
+    key_gen = subprocess.run(
+        ['build/hbzksnark', '-g', 'build/', secret_str, scheme],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if key_gen.returncode != 0:
+        sys.exit("{} genkey fault {}".format(scheme, key_gen))
+    for fmt in formats:
+        suffix = 'b' if fmt == 'bin' else ''
+        pk_bytes = os.path.getsize('build/' + base + '.pk' + suffix)
+        vk_bytes = os.path.getsize('build/' + base + '.vk' + suffix)
+        pk_ms, vk_ms, _ = load(scheme, fmt, iterations)
+        _, _, rss = load(scheme, fmt, 1)
+        print("{:<10}{:>6}{:>12}{:>12}{:>10.2f}{:>10.2f}{:>12}".format(
+            scheme, fmt, pk_bytes, vk_bytes, pk_ms, vk_ms, rss))
@@ -0,0 +1,68 @@
+/*
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+*/
+
+#include <cstring>
+#include <stdexcept>
+
+#include <hbcompact.hpp>
+
+using namespace std;
+
+namespace hbcompact {
+
+    void put_uint(string& out, uint64_t value, size_t width)
+    {
+        for (size_t i = 0; i < width; ++i)
+            out.push_back(static_cast<char>((value >> (8 * i)) & 0xff));
+    }
+
+    uint64_t get_uint(const char * in, size_t width)
+    {
+        uint64_t value = 0;
+        for (size_t i = 0; i < width; ++i)
+            value |= static_cast<uint64_t>(
+                static_cast<uint8_t>(in[i])) << (8 * i);
+        return value;
+    }
+
+    string header_bytes(header const& head)
+    {
+        string out(MAGIC, sizeof(MAGIC));
+        put_uint(out, VERSION, 1);
+        put_uint(out, head.scheme_id, 1);
+        put_uint(out, 0, 1);
+        put_uint(out, head.batch_size, 2);
+        put_uint(out, head.proof_size, 4);
+        put_uint(out, head.input_count, 4);
+        return out;
+    }
+
+    header read_header(string const& envelope)
+    {
+        if (envelope.size() < HEADER_SIZE
+            || memcmp(envelope.data(), MAGIC, sizeof(MAGIC)) != 0)
+            throw invalid_argument("Not a compact proof");
+        if (get_uint(envelope.data() + 3, 1) != VERSION)
+            throw invalid_argument("Unsupported compact proof version");
+        header head;
+        head.scheme_id = get_uint(envelope.data() + 4, 1);
+        head.batch_size = get_uint(envelope.data() + 6, 2);
+        head.proof_size = get_uint(envelope.data() + 8, 4);
+        head.input_count = get_uint(envelope.data() + 12, 4);
+        return head;
+    }
+
+} // hbcompact
@@ -0,0 +1,131 @@
+/*
+# Copyright 2018 Frank V. Castellucci and Arthur Greef
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+*/
+
+#include <cstdio>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <hbkeyfile.hpp>
+
+using namespace std;
+
+namespace hbkeyfile {
+
+    string binary_keyname(string const& key_name) {
+        return key_name + "b";
+    }
+
+    mapped_file::mapped_file(string const& file_name)
+        : data_(nullptr), size_(0)
+    {
+        int fd = open(file_name.c_str(), O_RDONLY);
+        if (fd < 0)
+            throw invalid_argument("Unable to open key " + file_name);
+        struct stat file_stat;
+        if (fstat(fd, &file_stat) != 0) {
+            close(fd);
+            throw invalid_argument("Unable to stat key " + file_name);
+        }
+        size_ = file_stat.st_size;
+        void * mapped = mmap(nullptr, size_, PROT_READ, MAP_PRIVATE, fd, 0);
+        close(fd);
+        if (mapped == MAP_FAILED)
+            throw invalid_argument("Unable to map key " + file_name);
+        data_ = static_cast<const char *>(mapped);
+    }
+
+    mapped_file::~mapped_file()
+    {
+        if (data_)
+            munmap(const_cast<char *>(data_), size_);
+    }
+
+    // Header: magic[3], version, reserved[4], payload size (little endian)
+    size_t check_header(mapped_file const& mapped, string const& file_name)
+    {
+        if (mapped.size() < HEADER_SIZE
+            || memcmp(mapped.data(), MAGIC, sizeof(MAGIC)) != 0)
+            throw invalid_argument("Not a binary key " + file_name);
+        if (static_cast<uint8_t>(mapped.data()[3]) != VERSION)
+            throw invalid_argument("Unsupported key version " + file_name);
+        uint64_t payload_size = 0;
+        for (size_t i = 0; i < 8; ++i)
+            payload_size |= static_cast<uint64_t>(
+                static_cast<uint8_t>(mapped.data()[8 + i])) << (8 * i);
+        if (payload_size > mapped.size() - HEADER_SIZE)
+            throw invalid_argument("Truncated binary key " + file_name);
+        return payload_size;
+    }
+
+    void write_header(ostream& out, uint64_t payload_size)
+    {
+        char header[HEADER_SIZE] = {0};
+        memcpy(header, MAGIC, sizeof(MAGIC));
+        header[3] = static_cast<char>(VERSION);
+        for (size_t i = 0; i < 8; ++i)
+            header[8 + i] = static_cast<char>((payload_size >> (8 * i)) & 0xff);
+        out.write(header, HEADER_SIZE);
+    }
+
+    //  Moves the modification time of file_name one nanosecond past
+    //  source_name when the clock has not advanced between the two
+    static void date_after(string const& file_name, string const& source_name)
+    {
+        struct stat file_stat;
+        struct stat source_stat;
+        if (stat(file_name.c_str(), &file_stat) != 0
+            || stat(source_name.c_str(), &source_stat) != 0)
+            return;
+        struct timespec source_time = source_stat.st_mtim;
+        if (file_stat.st_mtim.tv_sec > source_time.tv_sec
+            || (file_stat.st_mtim.tv_sec == source_time.tv_sec
+                && file_stat.st_mtim.tv_nsec > source_time.tv_nsec))
+            return;
+        struct timespec times[2];
+        times[0].tv_sec = 0;
+        times[0].tv_nsec = UTIME_OMIT;
+        times[1] = source_time;
+        if (++times[1].tv_nsec == 1000000000) {
+            times[1].tv_sec += 1;
+            times[1].tv_nsec = 0;
+        }
+        utimensat(AT_FDCWD, file_name.c_str(), times, 0);
+    }
+
+    void replace_file(string const& file_name, string const& content,
+        string const& source_name)
+    {
+        string temp_name = file_name + ".tmp" + to_string(getpid());
+        {
+            ofstream temp_file(temp_name, ios::binary);
+            temp_file.write(content.data(), content.size());
+            temp_file.close();
+            if (temp_file.fail()) {
+                remove(temp_name.c_str());
+                throw invalid_argument("Unable to write key " + file_name);
+            }
+        }
+        if (!source_name.empty())
+            date_after(temp_name, source_name);
+        if (rename(temp_name.c_str(), file_name.c_str()) != 0) {
+            remove(temp_name.c_str());
+            throw invalid_argument("Unable to replace key " + file_name);
+        }
+    }
+
+} // hbkeyfile
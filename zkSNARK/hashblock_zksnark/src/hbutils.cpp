@@ -17,6 +17,7 @@
 #include <fstream>
 #include <vector>
 #include <regex>
+#include <sys/stat.h>
 
 
 using namespace std;
@@ -24,6 +25,10 @@ using namespace std;
 namespace hbutil {
 	extern const string VERIFY_KEYNAME("hashblock_zkSNARK.vk");
 	extern const string PROOVE_KEYNAME("hashblock_zkSNARK.pk");
+	extern const string PROCESSED_VERIFY_KEYNAME("hashblock_zkSNARK.pvk");
+	extern const string GG_VERIFY_KEYNAME("hashblock_zkSNARK_gg.vk");
+	extern const string GG_PROOVE_KEYNAME("hashblock_zkSNARK_gg.pk");
+	extern const string GG_PROCESSED_VERIFY_KEYNAME("hashblock_zkSNARK_gg.pvk");
 }
 
 static const regex INT_TYPE("[+-]?[0-9]+");
@@ -54,4 +59,44 @@ vector<int> extract_ints(string const& input_str)  {
     return ints;
 }
 
+vector<int> extract_batch_ints(string const& input_str, size_t batch_size)  {
+    size_t num_inputs = 12;
+    vector<int> ints;
+    istringstream input(input_str);
+
+    string number;
+    while (getline(input, number, ',')) {
+        int i = toInt(number);
+        ints.push_back(i);
+    }
+    if(ints.empty() || ints.size() % num_inputs != 0
+        || ints.size() > num_inputs * batch_size)
+        throw invalid_argument(
+            "1 to " + to_string(batch_size)
+            + " groups of 12 comma separated integers required, got: "
+            + input_str);
 
+    return ints;
+}
+
+string batch_keyname(string const& key_name, size_t batch_size) {
+    if (batch_size == 0)
+        return key_name;
+    size_t dot = key_name.rfind('.');
+    return key_name.substr(0, dot) + "_b" + to_string(batch_size)
+        + key_name.substr(dot);
+}
+
+
+
+bool is_newer_file(string const& file_name, string const& other_name) {
+    struct stat file_stat;
+    struct stat other_stat;
+    if (stat(file_name.c_str(), &file_stat) != 0)
+        return false;
+    if (stat(other_name.c_str(), &other_stat) != 0)
+        return true;
+    if (file_stat.st_mtim.tv_sec != other_stat.st_mtim.tv_sec)
+        return file_stat.st_mtim.tv_sec > other_stat.st_mtim.tv_sec;
+    return file_stat.st_mtim.tv_nsec > other_stat.st_mtim.tv_nsec;
+}
@@ -16,25 +16,50 @@
 
 #include <algorithm>
 #include <cassert>
+#include <chrono>
 #include <cstdio>
 #include <cstring>
 #include <vector>
 #include <fstream>
 #include <iostream>
+#include <iterator>
 #include <sstream>
 #include <stdexcept>
 
 
 #include <libff/common/profiling.hpp>
-#include <libsnark/common/default_types/r1cs_ppzksnark_pp.hpp>
-#include <libsnark/zk_proof_systems/ppzksnark/r1cs_ppzksnark/r1cs_ppzksnark.hpp>
 #include <hbutils.hpp>
+#include <hbschemes.hpp>
+#include <hbkeyfile.hpp>
+#include <hbcompact.hpp>
 #include <match_r1cs.hpp>
 #include <base64.h>
 
 using namespace libsnark;
 using namespace std;
 
+const string hbscheme::ppzksnark::name("ppzksnark");
+const string hbscheme::gg_ppzksnark::name("gg");
+const uint8_t hbscheme::ppzksnark::id = 0;
+const uint8_t hbscheme::gg_ppzksnark::id = 1;
+
+// Key file names for a scheme, each batch size has its own circuit
+// and therefore its own keys
+struct key_names {
+    string proove;
+    string verify;
+    string processed_verify;
+};
+
+template<class Scheme>
+key_names scheme_key_names(size_t batch_size = 0)
+{
+    return key_names {
+        batch_keyname(Scheme::proove_keyname(), batch_size),
+        batch_keyname(Scheme::verify_keyname(), batch_size),
+        batch_keyname(Scheme::processed_verify_keyname(), batch_size)};
+}
+
 // Loads a key from file and decodes from base64
 template<class T>
 T get_constraint_key(string const& file_path, string const& file_name)
@@ -50,12 +75,108 @@ T get_constraint_key(string const& file_path, string const& file_name)
     return the_pk;
 }
 
+// Encodes a key, or any libsnark streamable, to base64
+template<class T>
+string encode_streamable(T const& item)
+{
+    stringstream itemss;
+    itemss << item;
+    string sitem = itemss.str();
+    return base64_encode(
+        reinterpret_cast<const unsigned char*>(sitem.c_str()), sitem.length());
+}
+
+// Encodes a key to base64 and writes it to file, along with the binary
+// key file. Both are renamed into place once written, a key derived
+// from another names it as source_name
+template<class T>
+void put_constraint_key(
+    string const& file_path, string const& file_name, T const& key,
+    string const& source_name = "")
+{
+    hbkeyfile::replace_file(file_path + file_name, encode_streamable(key),
+        source_name.empty() ? source_name : file_path + source_name);
+    hbkeyfile::write_key(
+        file_path + hbkeyfile::binary_keyname(file_name), key,
+        file_path + file_name);
+}
 
-r1cs_ppzksnark_proof<default_r1cs_ppzksnark_pp>
-    decode_proof_string(string const& proof_str)
+// Loads a key from the memory mapped binary key file, falling back to
+// the base64 file when the binary one is missing or older
+template<class T>
+T load_constraint_key(string const& file_path, string const& file_name)
 {
-    default_r1cs_ppzksnark_pp::init_public_params();
-    r1cs_ppzksnark_proof<default_r1cs_ppzksnark_pp> proof;
+    string binary_name = hbkeyfile::binary_keyname(file_name);
+    if (is_newer_file(file_path + binary_name, file_path + file_name))
+        return hbkeyfile::read_key<T>(file_path + binary_name);
+    return get_constraint_key<T>(file_path, file_name);
+}
+
+// Writes the binary key file of an existing base64 key file
+template<class T>
+bool convert_constraint_key(string const& file_path, string const& file_name)
+{
+    ifstream key_file(file_path + file_name);
+    if (!key_file.good())
+        return false;
+    hbkeyfile::write_key(
+        file_path + hbkeyfile::binary_keyname(file_name),
+        get_constraint_key<T>(file_path, file_name),
+        file_path + file_name);
+    return true;
+}
+
+// Preprocesses the verification key and persists the result
+template<class Scheme>
+typename Scheme::processed_verification_key_type
+    process_verification_key(string const& file_path, key_names const& names)
+{
+    Scheme::pp::init_public_params();
+    typename Scheme::processed_verification_key_type pvk =
+        Scheme::process_vk(
+            load_constraint_key<typename Scheme::verification_key_type>
+            (file_path, names.verify));
+    put_constraint_key(file_path, names.processed_verify, pvk, names.verify);
+    return pvk;
+}
+
+// Loads the processed verification key. When it is missing or older
+// than the verification key it is derived in memory only, keys are
+// written by -g, -G and -k and never while verifying
+template<class Scheme>
+typename Scheme::processed_verification_key_type
+    get_processed_key(string const& file_path, key_names const& names)
+{
+    Scheme::pp::init_public_params();
+    if (is_newer_file(file_path + names.processed_verify,
+            file_path + names.verify))
+        return load_constraint_key<
+            typename Scheme::processed_verification_key_type>
+            (file_path, names.processed_verify);
+    return Scheme::process_vk(
+        load_constraint_key<typename Scheme::verification_key_type>
+        (file_path, names.verify));
+}
+
+template<class Scheme>
+r1cs_primary_input<typename Scheme::field_type>
+    decode_primary_input(string const& encoded_pi)
+{
+    typename Scheme::field_type field;
+    r1cs_primary_input<typename Scheme::field_type> new_primary_input;
+
+    stringstream dec_strm(base64_decode(encoded_pi));
+
+    while (dec_strm >> field)
+        new_primary_input.push_back(field);
+    return new_primary_input;
+}
+
+template<class Scheme>
+typename Scheme::proof_type decode_proof_string(string const& proof_str)
+{
+    Scheme::pp::init_public_params();
+    typename Scheme::proof_type proof;
     try
     {
         stringstream encoded_proof;
@@ -72,84 +193,93 @@ r1cs_ppzksnark_proof<default_r1cs_ppzksnark_pp>
     return proof;
 }
 
-match_r1cs<libff::Fr<default_r1cs_ppzksnark_pp>>
+template<class Scheme>
+match_r1cs<typename Scheme::field_type>
     generate_constraint(vector<int> const& ints)
 {
-    default_r1cs_ppzksnark_pp::init_public_params();
+    Scheme::pp::init_public_params();
     return
-        generate_match_r1cs<libff::Fr<default_r1cs_ppzksnark_pp>>(
+        generate_match_r1cs<typename Scheme::field_type>(
             ints[0], ints[1],ints[2], ints[3],
             ints[4], ints[5],ints[6], ints[7],
             ints[8], ints[9],ints[10], ints[11]);
 }
 
-match_r1cs<libff::Fr<default_r1cs_ppzksnark_pp>>
+template<class Scheme>
+match_r1cs<typename Scheme::field_type>
     generate_constraint(string const& intake_string)
 {
-    return generate_constraint(extract_ints(intake_string));
+    return generate_constraint<Scheme>(extract_ints(intake_string));
+}
+
+size_t batch_size_arg(const char * arg)
+{
+    int batch_size = toInt(arg);
+    if (batch_size < 1)
+        throw std::invalid_argument(
+            "Batch size must be positive, got: " + string(arg));
+    return batch_size;
 }
 
+template<class Scheme>
+match_r1cs<typename Scheme::field_type>
+    generate_batch_constraint(string const& intake_string, size_t batch_size)
+{
+    Scheme::pp::init_public_params();
+    return generate_batch_match_r1cs<typename Scheme::field_type>(
+        extract_batch_ints(intake_string, batch_size), batch_size);
+}
+
+template<class Scheme>
 int generate_constraint_keys(
     string const& file_path,
-    match_r1cs<libff::Fr<default_r1cs_ppzksnark_pp>> const& r1cs)
-{
-    default_r1cs_ppzksnark_pp::init_public_params();
-    r1cs_ppzksnark_keypair<default_r1cs_ppzksnark_pp> keypair =
-        r1cs_ppzksnark_generator<default_r1cs_ppzksnark_pp>(r1cs.constraint_system);
-
-    stringstream pkss;
-    stringstream vkss;
-    pkss << keypair.pk ;
-    string spk = pkss.str();
-    string encoded_spk = base64_encode(
-        reinterpret_cast<const unsigned char*>(spk.c_str()), spk.length());
-    vkss << keypair.vk;
-    string svk = vkss.str();
-    string encoded_svk = base64_encode(
-        reinterpret_cast<const unsigned char*>(svk.c_str()), svk.length());
-    ofstream file_pk(file_path + hbutil::PROOVE_KEYNAME);
-    ofstream file_vk(file_path + hbutil::VERIFY_KEYNAME);
-    file_pk << encoded_spk;
-    file_vk << encoded_svk;
+    key_names const& names,
+    match_r1cs<typename Scheme::field_type> const& r1cs)
+{
+    Scheme::pp::init_public_params();
+    typename Scheme::keypair_type keypair =
+        Scheme::generator(r1cs.constraint_system);
+
+    put_constraint_key(file_path, names.proove, keypair.pk);
+    put_constraint_key(file_path, names.verify, keypair.vk);
+    put_constraint_key(file_path, names.processed_verify,
+        Scheme::process_vk(keypair.vk), names.verify);
     return 0;
 }
 
+//  Verifies with the processed key and the online verifier, writes
+//  1 or 0 to stdout and returns 0 if the proof is valid, 1 if not
+template<class Scheme>
 int verify(string const& file_path,
-    r1cs_ppzksnark_proof<default_r1cs_ppzksnark_pp> proof,
+    key_names const& names,
+    typename Scheme::proof_type const& proof,
     string const& encoded_pi)
 {
-    default_r1cs_ppzksnark_pp::init_public_params();
-    r1cs_ppzksnark_verification_key<default_r1cs_ppzksnark_pp> verkey =
-        get_constraint_key<r1cs_ppzksnark_verification_key<default_r1cs_ppzksnark_pp>>
-        (file_path, hbutil::VERIFY_KEYNAME);
-
-    libff::Fr<default_r1cs_ppzksnark_pp> field;
-    r1cs_primary_input<libff::Fr<default_r1cs_ppzksnark_pp>>
-        new_primary_input;
-
-    stringstream dec_strm(base64_decode(encoded_pi));
-
-    while (dec_strm >> field)
-        new_primary_input.push_back(field);
+    Scheme::pp::init_public_params();
+    libff::inhibit_profiling_info = true;
+    libff::inhibit_profiling_counters = true;
+    typename Scheme::processed_verification_key_type pvk =
+        get_processed_key<Scheme>(file_path, names);
 
-    const bool ans = r1cs_ppzksnark_verifier_strong_IC<default_r1cs_ppzksnark_pp>(
-        verkey, new_primary_input, proof);
+    const bool ans = Scheme::online_verifier(
+        pvk, decode_primary_input<Scheme>(encoded_pi), proof);
     cout << ans << endl;
 
-    return 0;
+    return ans ? 0 : 1;
 }
 
-r1cs_ppzksnark_proof<default_r1cs_ppzksnark_pp>
+template<class Scheme>
+typename Scheme::proof_type
     proove(string const& file_path,
-        match_r1cs<libff::Fr<default_r1cs_ppzksnark_pp>> const& r1cs)
+        key_names const& names,
+        match_r1cs<typename Scheme::field_type> const& r1cs)
 {
-    default_r1cs_ppzksnark_pp::init_public_params();
-    r1cs_ppzksnark_proving_key<default_r1cs_ppzksnark_pp> prvkey =
-         get_constraint_key<r1cs_ppzksnark_proving_key<default_r1cs_ppzksnark_pp>>
-            (file_path, hbutil::PROOVE_KEYNAME);
-    r1cs_ppzksnark_proof<default_r1cs_ppzksnark_pp> proof =
-        r1cs_ppzksnark_prover<default_r1cs_ppzksnark_pp>(prvkey,
-            r1cs.primary_input, r1cs.auxiliary_input);
+    Scheme::pp::init_public_params();
+    typename Scheme::proving_key_type prvkey =
+         load_constraint_key<typename Scheme::proving_key_type>
+            (file_path, names.proove);
+    typename Scheme::proof_type proof =
+        Scheme::prover(prvkey, r1cs.primary_input, r1cs.auxiliary_input);
 
     // Get the primary input and encode
     stringstream pairing_stream;
@@ -162,35 +292,280 @@ r1cs_ppzksnark_proof<default_r1cs_ppzksnark_pp>
         reinterpret_cast<const unsigned char*>(
             pairing_str.c_str()),pairing_str.length());
 
-    stringstream proofstr;
-    proofstr << proof;
-    string spk = proofstr.str();
-    string encoded_spk = base64_encode(
-        reinterpret_cast<const unsigned char*>(spk.c_str()), spk.length());
-
-    cerr << encoded_spk << ' ' << encoded_pairing;
+    cerr << encode_streamable(proof) << ' ' << encoded_pairing;
     return proof;
 }
 
-int main(int argc, const char * argv[]) {
+//  Times proving and verification, the latter with the raw key against
+//  the processed key. Writes
+//  'proof_bytes prove_ms raw_per_sec processed_per_sec process_vk_ms'
+//  to stderr
+template<class Scheme>
+int benchmark(string const& file_path,
+    key_names const& names,
+    match_r1cs<typename Scheme::field_type> const& r1cs,
+    size_t iterations)
+{
+    Scheme::pp::init_public_params();
+    libff::inhibit_profiling_info = true;
+    libff::inhibit_profiling_counters = true;
+    typename Scheme::proving_key_type prvkey =
+         load_constraint_key<typename Scheme::proving_key_type>
+            (file_path, names.proove);
+    typename Scheme::verification_key_type verkey =
+        load_constraint_key<typename Scheme::verification_key_type>
+        (file_path, names.verify);
+    typename Scheme::proof_type proof;
+    bool ans = true;
 
-    if (argc < 3) {
-        cerr <<  "Invalid call. hbzksnark [-g, -p, -v] [options]" << endl;
-        return -1;
+    auto start = chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; ++i)
+        proof = Scheme::prover(
+            prvkey, r1cs.primary_input, r1cs.auxiliary_input);
+    chrono::duration<double> prove = chrono::steady_clock::now() - start;
+
+    start = chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; ++i)
+        ans &= Scheme::verifier(verkey, r1cs.primary_input, proof);
+    chrono::duration<double> raw = chrono::steady_clock::now() - start;
+
+    start = chrono::steady_clock::now();
+    typename Scheme::processed_verification_key_type pvk =
+        Scheme::process_vk(verkey);
+    chrono::duration<double> process = chrono::steady_clock::now() - start;
+
+    start = chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; ++i)
+        ans &= Scheme::online_verifier(pvk, r1cs.primary_input, proof);
+    chrono::duration<double> online = chrono::steady_clock::now() - start;
+
+    cerr << encode_streamable(proof).length() << ' '
+        << prove.count() * 1000.0 / iterations << ' '
+        << iterations / raw.count() << ' '
+        << iterations / online.count() << ' '
+        << process.count() * 1000.0;
+    return ans ? 0 : 1;
+}
+
+// Compact envelope of a proof and its primary input
+template<class Scheme>
+string encode_compact(typename Scheme::proof_type const& proof,
+    r1cs_primary_input<typename Scheme::field_type> const& primary_input,
+    size_t batch_size)
+{
+    stringstream proof_stream;
+    proof_stream << proof;
+    string proof_bytes = proof_stream.str();
+
+    hbcompact::header head;
+    head.scheme_id = Scheme::id;
+    head.batch_size = batch_size;
+    head.proof_size = proof_bytes.size();
+    head.input_count = primary_input.size();
+
+    string envelope = hbcompact::header_bytes(head);
+    envelope.reserve(envelope.size() + proof_bytes.size()
+        + primary_input.size()
+            * hbcompact::field_width<typename Scheme::field_type>());
+    envelope += proof_bytes;
+    for (auto const& field : primary_input)
+        hbcompact::put_field(envelope, field);
+    return envelope;
+}
+
+// Decodes a compact envelope in place, returns its header
+template<class Scheme>
+hbcompact::header decode_compact(string const& envelope,
+    typename Scheme::proof_type & proof,
+    r1cs_primary_input<typename Scheme::field_type> & primary_input)
+{
+    typedef typename Scheme::field_type field_type;
+    hbcompact::header head = hbcompact::read_header(envelope);
+    const size_t width = hbcompact::field_width<field_type>();
+    if (head.scheme_id != Scheme::id)
+        throw std::invalid_argument("Compact proof is for another scheme");
+    if (envelope.size() != hbcompact::HEADER_SIZE + head.proof_size
+            + static_cast<size_t>(head.input_count) * width)
+        throw std::invalid_argument("Compact proof size mismatch");
+
+    const char * proof_begin = envelope.data() + hbcompact::HEADER_SIZE;
+    hbkeyfile::memory_buffer buffer(proof_begin, head.proof_size);
+    istream proof_stream(&buffer);
+    proof_stream >> proof;
+
+    const char * inputs = proof_begin + head.proof_size;
+    primary_input.clear();
+    primary_input.reserve(head.input_count);
+    for (size_t i = 0; i < head.input_count; ++i)
+        primary_input.push_back(
+            hbcompact::get_field<field_type>(inputs + i * width));
+    return head;
+}
+
+//  Proves and writes the compact envelope to stdout
+template<class Scheme>
+int proove_compact(string const& file_path, size_t batch_size,
+    match_r1cs<typename Scheme::field_type> const& r1cs)
+{
+    Scheme::pp::init_public_params();
+    libff::inhibit_profiling_info = true;
+    libff::inhibit_profiling_counters = true;
+    typename Scheme::proving_key_type prvkey =
+         load_constraint_key<typename Scheme::proving_key_type>
+            (file_path, scheme_key_names<Scheme>(batch_size).proove);
+    typename Scheme::proof_type proof =
+        Scheme::prover(prvkey, r1cs.primary_input, r1cs.auxiliary_input);
+    string envelope = encode_compact<Scheme>(
+        proof, r1cs.primary_input, batch_size);
+    cout.write(envelope.data(), envelope.size());
+    cout.flush();
+    return 0;
+}
+
+//  Verifies the compact envelope read from stdin, the batch size it
+//  records selects the keys. Returns 0 if the proof is valid, 1 if not
+template<class Scheme>
+int verify_compact(string const& file_path)
+{
+    Scheme::pp::init_public_params();
+    libff::inhibit_profiling_info = true;
+    libff::inhibit_profiling_counters = true;
+    string envelope(
+        (istreambuf_iterator<char>(cin)), istreambuf_iterator<char>());
+    typename Scheme::proof_type proof;
+    r1cs_primary_input<typename Scheme::field_type> primary_input;
+    hbcompact::header head =
+        decode_compact<Scheme>(envelope, proof, primary_input);
+
+    typename Scheme::processed_verification_key_type pvk =
+        get_processed_key<Scheme>(
+            file_path, scheme_key_names<Scheme>(head.batch_size));
+    const bool ans = Scheme::online_verifier(pvk, primary_input, proof);
+    cout << ans << endl;
+    return ans ? 0 : 1;
+}
+
+//  Compares the base64 text encoding with the compact envelope. Writes
+//  'text_bytes compact_bytes text_parse_us compact_parse_us' to stderr
+template<class Scheme>
+int benchmark_encoding(string const& file_path,
+    match_r1cs<typename Scheme::field_type> const& r1cs,
+    size_t iterations)
+{
+    Scheme::pp::init_public_params();
+    libff::inhibit_profiling_info = true;
+    libff::inhibit_profiling_counters = true;
+    typename Scheme::proving_key_type prvkey =
+         load_constraint_key<typename Scheme::proving_key_type>
+            (file_path, scheme_key_names<Scheme>().proove);
+    typename Scheme::proof_type proof =
+        Scheme::prover(prvkey, r1cs.primary_input, r1cs.auxiliary_input);
+
+    stringstream pairing_stream;
+    for (auto const& field : r1cs.primary_input)
+        pairing_stream << field;
+    string pairing_str = pairing_stream.str();
+    string text_proof = encode_streamable(proof);
+    string text_pairing = base64_encode(
+        reinterpret_cast<const unsigned char*>(
+            pairing_str.c_str()), pairing_str.length());
+    string envelope = encode_compact<Scheme>(proof, r1cs.primary_input, 0);
+
+    size_t inputs = 0;
+    auto start = chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; ++i) {
+        decode_proof_string<Scheme>(text_proof);
+        inputs += decode_primary_input<Scheme>(text_pairing).size();
     }
-    else if (strcmp(argv[1], "-g") == 0) {
+    chrono::duration<double> text = chrono::steady_clock::now() - start;
+
+    typename Scheme::proof_type compact_proof;
+    r1cs_primary_input<typename Scheme::field_type> compact_input;
+    start = chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; ++i) {
+        decode_compact<Scheme>(envelope, compact_proof, compact_input);
+        inputs += compact_input.size();
+    }
+    chrono::duration<double> compact = chrono::steady_clock::now() - start;
+
+    cerr << text_proof.size() + text_pairing.size() << ' '
+        << envelope.size() << ' '
+        << text.count() * 1e6 / iterations << ' '
+        << compact.count() * 1e6 / iterations;
+    return inputs == 2 * iterations * r1cs.primary_input.size() ? 0 : 1;
+}
+
+//  Writes the binary key file of each base64 key present, returns 1 if
+//  none were found
+template<class Scheme>
+int convert_keys(string const& file_path, key_names const& names)
+{
+    Scheme::pp::init_public_params();
+    bool converted = convert_constraint_key<
+        typename Scheme::proving_key_type>(file_path, names.proove);
+    converted |= convert_constraint_key<
+        typename Scheme::verification_key_type>(file_path, names.verify);
+    converted |= convert_constraint_key<
+        typename Scheme::processed_verification_key_type>(
+            file_path, names.processed_verify);
+    return converted ? 0 : 1;
+}
+
+//  Times loading the proving and verification keys from the base64
+//  ('b64') or binary ('bin') files. Writes 'pk_ms vk_ms' to stderr
+template<class Scheme>
+int benchmark_load(string const& file_path, key_names const& names,
+    string const& format, size_t iterations)
+{
+    Scheme::pp::init_public_params();
+    libff::inhibit_profiling_info = true;
+    libff::inhibit_profiling_counters = true;
+    bool binary = format == "bin";
+    if (!binary && format != "b64")
+        throw std::invalid_argument("Key format is b64 or bin: " + format);
+
+    auto start = chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; ++i)
+        if (binary)
+            hbkeyfile::read_key<typename Scheme::proving_key_type>(
+                file_path + hbkeyfile::binary_keyname(names.proove));
+        else
+            get_constraint_key<typename Scheme::proving_key_type>(
+                file_path, names.proove);
+    chrono::duration<double> pk = chrono::steady_clock::now() - start;
+
+    start = chrono::steady_clock::now();
+    for (size_t i = 0; i < iterations; ++i)
+        if (binary)
+            hbkeyfile::read_key<typename Scheme::verification_key_type>(
+                file_path + hbkeyfile::binary_keyname(names.verify));
+        else
+            get_constraint_key<typename Scheme::verification_key_type>(
+                file_path, names.verify);
+    chrono::duration<double> vk = chrono::steady_clock::now() - start;
+
+    cerr << pk.count() * 1000.0 / iterations << ' '
+        << vk.count() * 1000.0 / iterations;
+    return 0;
+}
+
+template<class Scheme>
+int run(int argc, const char * argv[]) {
+
+    if (strcmp(argv[1], "-g") == 0) {
         //  Generate keys returns 0 for successful generation else
         //  exception in secret key given. If exception, return -1 and stderr has reason
-        if (argc > 4) {
-            cerr << "Invalid call. hbzksnark -g file_path secret_string" << endl;
+        if (argc != 4) {
+            cerr << "Invalid call. hbzksnark -g file_path secret_string [scheme]" << endl;
             return -1;
         }
         else {
             try {
                 string file_path(argv[2]);
                 string keyvars(argv[3]);
-                return generate_constraint_keys(file_path,
-                    generate_constraint(keyvars));
+                return generate_constraint_keys<Scheme>(file_path,
+                    scheme_key_names<Scheme>(),
+                    generate_constraint<Scheme>(keyvars));
             }
             catch(std::invalid_argument & e) {
                 cerr << e.what() << endl;
@@ -198,18 +573,32 @@ int main(int argc, const char * argv[]) {
             }
         }
     }
+    else if (strcmp(argv[1], "-k") == 0) {
+        //  Preprocess the verification key into the processed key file
+        if (argc != 3) {
+            cerr << "Invalid call. hbzksnark -k file_path [scheme]" << endl;
+            return -1;
+        }
+        else {
+            string file_path(argv[2]);
+            process_verification_key<Scheme>(
+                file_path, scheme_key_names<Scheme>());
+            return 0;
+        }
+    }
     else if (strcmp(argv[1], "-p") == 0) {
         //  Generate proof returns 0 for successful generation else
         //  exception in secret key given. If exception, return -1 and stderr has reason
         if (argc != 4) {
-            cerr << "Invalid call. hbzksnark -p file_path data_str" << endl;
+            cerr << "Invalid call. hbzksnark -p file_path data_str [scheme]" << endl;
             return -1;
         }
         else {
             try {
                 string file_path(argv[2]);
                 string keyvars(argv[3]);
-                proove(file_path,generate_constraint(keyvars));
+                proove<Scheme>(file_path, scheme_key_names<Scheme>(),
+                    generate_constraint<Scheme>(keyvars));
                 return 0;
             }
             catch(std::invalid_argument & e) {
@@ -219,10 +608,12 @@ int main(int argc, const char * argv[]) {
         }
     }
     else if (strcmp(argv[1], "-v") == 0) {
-        //  Verify proof returns 0 for successful generation else
-        //  exception in secret key given. If exception, return -1 and stderr has reason
+        //  Verify proof returns 0 once verification ran, the result is
+        //  on stdout. Exchange family 0.3.0 accepted every proof that
+        //  -v returned 0 for, so the exit status stays as it was.
+        //  If exception, return -1 and stderr has reason
         if (argc != 5) {
-            cerr << "Invalid call. hbzksnark -v file_path proof_str pairing_str" << endl;
+            cerr << "Invalid call. hbzksnark -v file_path proof_str pairing_str [scheme]" << endl;
             return -1;
         }
         else {
@@ -230,7 +621,72 @@ int main(int argc, const char * argv[]) {
                 string file_path(argv[2]);
                 string proofstr(argv[3]);
                 string pairing(argv[4]);
-                verify(file_path, decode_proof_string(proofstr), pairing);
+                verify<Scheme>(file_path, scheme_key_names<Scheme>(),
+                    decode_proof_string<Scheme>(proofstr), pairing);
+                return 0;
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-b") == 0) {
+        //  Benchmark proving and verification with and without the processed key
+        if (argc != 5) {
+            cerr << "Invalid call. hbzksnark -b file_path data_str iterations [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                string keyvars(argv[3]);
+                size_t iterations = toInt(argv[4]);
+                return benchmark<Scheme>(file_path,
+                    scheme_key_names<Scheme>(),
+                    generate_constraint<Scheme>(keyvars), iterations);
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-G") == 0) {
+        //  Generate keys for the circuit of batch_size equations
+        if (argc != 5) {
+            cerr << "Invalid call. hbzksnark -G file_path batch_size secret_str [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                size_t batch_size = batch_size_arg(argv[3]);
+                string keyvars(argv[4]);
+                return generate_constraint_keys<Scheme>(file_path,
+                    scheme_key_names<Scheme>(batch_size),
+                    generate_batch_constraint<Scheme>(keyvars, batch_size));
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-P") == 0) {
+        //  Generate one proof for up to batch_size equations, the data
+        //  string holds 12 integers per equation
+        if (argc != 5) {
+            cerr << "Invalid call. hbzksnark -P file_path batch_size data_str [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                size_t batch_size = batch_size_arg(argv[3]);
+                string keyvars(argv[4]);
+                proove<Scheme>(file_path, scheme_key_names<Scheme>(batch_size),
+                    generate_batch_constraint<Scheme>(keyvars, batch_size));
                 return 0;
             }
             catch(std::invalid_argument & e) {
@@ -239,6 +695,152 @@ int main(int argc, const char * argv[]) {
             }
         }
     }
+    else if (strcmp(argv[1], "-V") == 0) {
+        //  Verify a batch proof
+        if (argc != 6) {
+            cerr << "Invalid call. hbzksnark -V file_path batch_size proof_str pairing_str [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                size_t batch_size = batch_size_arg(argv[3]);
+                string proofstr(argv[4]);
+                string pairing(argv[5]);
+                return verify<Scheme>(file_path,
+                    scheme_key_names<Scheme>(batch_size),
+                    decode_proof_string<Scheme>(proofstr), pairing);
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-B") == 0) {
+        //  Benchmark a batch proof, figures are for the whole batch
+        if (argc != 6) {
+            cerr << "Invalid call. hbzksnark -B file_path batch_size data_str iterations [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                size_t batch_size = batch_size_arg(argv[3]);
+                string keyvars(argv[4]);
+                size_t iterations = toInt(argv[5]);
+                return benchmark<Scheme>(file_path,
+                    scheme_key_names<Scheme>(batch_size),
+                    generate_batch_constraint<Scheme>(keyvars, batch_size),
+                    iterations);
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-c") == 0) {
+        //  Convert base64 keys to binary key files
+        if (argc != 3 && argc != 4) {
+            cerr << "Invalid call. hbzksnark -c file_path [batch_size] [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                size_t batch_size = argc == 4 ? batch_size_arg(argv[3]) : 0;
+                return convert_keys<Scheme>(
+                    file_path, scheme_key_names<Scheme>(batch_size));
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-l") == 0) {
+        //  Benchmark key loading from base64 or binary key files
+        if (argc != 5) {
+            cerr << "Invalid call. hbzksnark -l file_path b64|bin iterations [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                string format(argv[3]);
+                size_t iterations = toInt(argv[4]);
+                return benchmark_load<Scheme>(file_path,
+                    scheme_key_names<Scheme>(), format, iterations);
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-q") == 0) {
+        //  Generate a proof as a compact envelope on stdout, batch_size
+        //  0 proves a single equation
+        if (argc != 5) {
+            cerr << "Invalid call. hbzksnark -q file_path batch_size data_str [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                int batch_size = toInt(argv[3]);
+                string keyvars(argv[4]);
+                if (batch_size == 0)
+                    return proove_compact<Scheme>(file_path, 0,
+                        generate_constraint<Scheme>(keyvars));
+                size_t size = batch_size_arg(argv[3]);
+                return proove_compact<Scheme>(file_path, size,
+                    generate_batch_constraint<Scheme>(keyvars, size));
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-w") == 0) {
+        //  Verify a compact envelope read from stdin
+        if (argc != 3) {
+            cerr << "Invalid call. hbzksnark -w file_path [scheme] < envelope" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                return verify_compact<Scheme>(file_path);
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
+    else if (strcmp(argv[1], "-e") == 0) {
+        //  Benchmark proof encoding size and parse time, text vs compact
+        if (argc != 5) {
+            cerr << "Invalid call. hbzksnark -e file_path data_str iterations [scheme]" << endl;
+            return -1;
+        }
+        else {
+            try {
+                string file_path(argv[2]);
+                string keyvars(argv[3]);
+                size_t iterations = toInt(argv[4]);
+                return benchmark_encoding<Scheme>(file_path,
+                    generate_constraint<Scheme>(keyvars), iterations);
+            }
+            catch(std::invalid_argument & e) {
+                cerr << e.what() << endl;
+                return -1;
+            }
+        }
+    }
     else {
         cerr <<  "No command match. Correct input and try again" << endl;
         return -1;
@@ -247,3 +849,20 @@ int main(int argc, const char * argv[]) {
     return 0;
 }
 
+int main(int argc, const char * argv[]) {
+
+    if (argc < 3) {
+        cerr <<  "Invalid call. hbzksnark [-g, -k, -p, -v, -b, -G, -P, -V, -B, -c, -l, -q, -w, -e] [options] [scheme]" << endl;
+        return -1;
+    }
+
+    //  An optional trailing argument selects the proving scheme,
+    //  'ppzksnark' (PGHR13, the default) or 'gg' (Groth16)
+    string scheme(argv[argc - 1]);
+    if (scheme == hbscheme::gg_ppzksnark::name)
+        return run<hbscheme::gg_ppzksnark>(argc - 1, argv);
+    else if (scheme == hbscheme::ppzksnark::name)
+        return run<hbscheme::ppzksnark>(argc - 1, argv);
+    else
+        return run<hbscheme::ppzksnark>(argc, argv);
+}